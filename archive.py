@@ -0,0 +1,203 @@
+# archive.py
+# Dauerhaftes Archiv aller Generierungen, Versionen und Templates (SQLite, WAL)
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import dedup
+from fulltext import analyze, match_query
+from llm_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_ARCHIVE_PATH = Path(os.getenv("NEWSLETTER_ARCHIVE", DEFAULT_CACHE_DIR / "archive.sqlite3"))
+
+KINDS = ("version", "template")
+
+# Spalten für Listen – ohne raw/body, damit Seiten klein bleiben
+LIST_COLUMNS = ("id", "kind", "session", "version", "created_at", "action", "topic", "reader_state", "model", "subject")
+
+# Volltext: gestemmte Kopie (fulltext.analyze) in einer contentless FTS5-Tabelle, rowid = generations.id
+FTS_COLUMNS = ("subject", "preheader", "body", "ctas")
+FTS_WEIGHTS = (4.0, 2.0, 1.0, 1.0)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL DEFAULT 'version',
+    session TEXT NOT NULL DEFAULT '',
+    version INTEGER,
+    created_at REAL NOT NULL,
+    action TEXT NOT NULL DEFAULT '',
+    topic TEXT NOT NULL DEFAULT '',
+    reader_state TEXT NOT NULL DEFAULT '',
+    briefing TEXT NOT NULL DEFAULT '{}',
+    model TEXT,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    raw TEXT NOT NULL DEFAULT '',
+    subject TEXT NOT NULL DEFAULT '',
+    preheader TEXT NOT NULL DEFAULT '',
+    body TEXT NOT NULL DEFAULT '',
+    ctas TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_generations_created ON generations(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_generations_topic ON generations(topic, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_generations_reader_state ON generations(reader_state, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_generations_session ON generations(session, created_at, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5(
+    subject, preheader, body, ctas, content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+
+def _columns(table: str = "") -> str:
+    return ", ".join(f"{table}{c}" for c in LIST_COLUMNS)
+
+
+def _where(filters: dict, table: str = "") -> tuple[str, list]:
+    clauses, params = [], []
+    for column in ("kind", "session", "topic", "reader_state"):
+        value = filters.get(column)
+        if value:
+            clauses.append(f"{table}{column} = ?")
+            params.append(value)
+    if filters.get("since"):
+        clauses.append(f"{table}created_at >= ?")
+        params.append(filters["since"])
+    return (" AND ".join(clauses) or "1"), params
+
+
+class Archive:
+    """Ein Eintrag pro Version/Template; Listen werden seitenweise per Keyset (created_at, id) gelesen."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        # WAL: Leser blockieren Schreiber anderer Sessions nicht
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.executescript(dedup.SCHEMA)
+        self._backfill_fts()
+        self._backfill_dedup()
+        self._conn.commit()
+
+    def add(self, entry: dict, kind: str = "version", session: str = "") -> int:
+        briefing = entry.get("briefing") or {}
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO generations (kind, session, version, created_at, action, topic, reader_state, briefing, "
+                "model, prompt_tokens, completion_tokens, raw, subject, preheader, body, ctas) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    kind,
+                    session,
+                    entry.get("version"),
+                    time.time(),
+                    entry.get("action", ""),
+                    entry.get("topic") or briefing.get("topic", ""),
+                    briefing.get("reader_state", ""),
+                    json.dumps(briefing, ensure_ascii=False),
+                    entry.get("model"),
+                    entry.get("prompt_tokens", 0),
+                    entry.get("completion_tokens", 0),
+                    entry.get("raw") or "",
+                    entry.get("subject") or "",
+                    entry.get("preheader") or "",
+                    entry.get("body") or "",
+                    json.dumps(list(entry.get("ctas") or []), ensure_ascii=False),
+                ),
+            )
+            self._index(cur.lastrowid, entry)
+            dedup.index(self._conn, cur.lastrowid, entry)
+            self._conn.commit()
+            return cur.lastrowid
+
+    def _index(self, entry_id: int, entry: dict) -> None:
+        ctas = entry.get("ctas") or []
+        if isinstance(ctas, str):
+            ctas = json.loads(ctas)
+        values = [entry.get("subject"), entry.get("preheader"), entry.get("body"), "\n".join(ctas)]
+        self._conn.execute(
+            f"INSERT INTO generations_fts (rowid, {', '.join(FTS_COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+            (entry_id, *(analyze(v) for v in values)),
+        )
+
+    def _backfill_fts(self) -> None:
+        # Einträge aus der Zeit vor dem Volltextindex nachziehen (rowids sind aufsteigend)
+        indexed = self._conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM generations_fts").fetchone()[0]
+        for row in self._conn.execute("SELECT * FROM generations WHERE id > ? ORDER BY id", (indexed,)).fetchall():
+            self._index(row["id"], dict(row))
+
+    def _backfill_dedup(self) -> None:
+        indexed = self._conn.execute("SELECT COALESCE(MAX(generation_id), 0) FROM dedup_items").fetchone()[0]
+        for row in self._conn.execute("SELECT id, subject, body FROM generations WHERE id > ? ORDER BY id", (indexed,)).fetchall():
+            dedup.index(self._conn, row["id"], dict(row))
+
+    def near_duplicates(self, entry: dict, exclude_session: str | None = None) -> list[dict]:
+        """Betreff und Absätze von entry, die früheren Ausgaben (anderer Sitzungen) stark ähneln."""
+        with self._lock:
+            return dedup.find(self._conn, entry, exclude_session=exclude_session)
+
+    def page(self, limit: int = 5, after: tuple[float, int] | None = None, **filters) -> list[dict]:
+        """Neueste zuerst; after = (created_at, id) des letzten Eintrags der vorigen Seite."""
+        where, params = _where(filters)
+        if after is not None:
+            where += " AND (created_at, id) < (?, ?)"
+            params += list(after)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_columns()} FROM generations WHERE {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def search(self, query: str, limit: int = 10, **filters) -> list[dict]:
+        """Volltextsuche über Betreff, Preheader, Text und CTAs, gerankt mit BM25 (Betreff zählt am meisten)."""
+        expr = match_query(query)
+        if not expr:
+            return []
+        where, params = _where(filters, "g.")
+        weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_columns('g.')}, bm25(generations_fts, {weights}) AS rank "
+                f"FROM generations_fts JOIN generations g ON g.id = generations_fts.rowid "
+                f"WHERE generations_fts MATCH ? AND {where} ORDER BY rank LIMIT ?",
+                (expr, *params, limit),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def count(self, **filters) -> int:
+        where, params = _where(filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM generations WHERE {where}", params).fetchone()[0]
+
+    def load(self, entry_id: int) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM generations WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["briefing"] = json.loads(entry["briefing"])
+        entry["ctas"] = json.loads(entry["ctas"])
+        return entry
+
+
+_archive: Archive | None = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> Archive:
+    # Eine Verbindung pro Prozess; alle Streamlit-Sessions schreiben über denselben Lock
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = Archive(DEFAULT_ARCHIVE_PATH)
+        return _archive
@@ -0,0 +1,212 @@
+# batch_generate.py
+# Headless Batch-Generierung: Briefings aus JSONL lesen, Ergebnisse als JSONL streamen
+#
+#   python batch_generate.py briefings.jsonl -o newsletters.jsonl --workers 4
+#
+# Jede Zeile ist ein Briefing, z.B.:
+#   {"id": "kw12-grenzen", "topic": "Grenzen setzen", "reader_state": "Frisch getrennt (No Contact)", "tone": 3}
+# Fehlende Felder bekommen dieselben Defaults wie im Formular von generator_v3.py.
+# Bereits erfolgreich erzeugte IDs in der Ausgabedatei werden beim Neustart übersprungen.
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Vor den App-Modulen: llm_cache, rate_limiter, llm_clients, … lesen ihre Einstellungen beim Import
+load_dotenv()
+
+from newsletter_engine import (
+    STRUCTURED_HINT,
+    STRUCTURED_RESPONSE_FORMAT,
+    TONE_MAP,
+    apply_template,
+    build_system_prompt,
+    build_user_prompt,
+    call_openai,
+    is_complete,
+    parse_output,
+    sections_to_raw,
+    supports_json_schema,
+)
+
+BRIEFING_DEFAULTS = {
+    "reader_state": "Gemischt",
+    "topic": "",
+    "tone": 3,
+    "template": "Standard",
+    "mode": "📖 Mehrwert (Tipp)",
+    "product_context": "",
+    "goal_kpi": "Klickrate",
+    "audience_level": "Einsteiger",
+    "length_target": "Mittel (≈ 400–650 Wörter)",
+    "keywords": "",
+    "forbidden": "",
+}
+
+
+def briefing_id(briefing: dict, line: str) -> str:
+    explicit = briefing.get("id")
+    if explicit:
+        return str(explicit)
+    # Ohne ID: stabil aus dem Inhalt ableiten, damit Resume trotzdem greift
+    return hashlib.sha256(line.encode("utf-8")).hexdigest()[:16]
+
+
+def load_briefings(path: Path) -> list[tuple[str, dict]]:
+    briefings = []
+    seen = set()
+    with path.open(encoding="utf-8") as fh:
+        for lineno, line in enumerate(fh, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                briefing = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"⚠️ Zeile {lineno} übersprungen: {e}", file=sys.stderr)
+                continue
+            bid = briefing_id(briefing, line)
+            if bid in seen:
+                print(f"⚠️ Zeile {lineno}: doppelte ID {bid} übersprungen", file=sys.stderr)
+                continue
+            seen.add(bid)
+            briefings.append((bid, briefing))
+    return briefings
+
+
+def completed_ids(path: Path) -> set[str]:
+    done = set()
+    if not path.exists():
+        return done
+    with path.open(encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Abgeschnittene letzte Zeile nach einem Absturz
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def build_prompts(briefing: dict) -> tuple[str, str]:
+    b = {**BRIEFING_DEFAULTS, **briefing}
+    tone = b.get("tone_label") or TONE_MAP.get(int(b["tone"]), TONE_MAP[3])
+    user = build_user_prompt(
+        reader_state=b["reader_state"],
+        topic=b["topic"],
+        tone_label=tone,
+        mode=b["mode"],
+        product_context=b["product_context"],
+        goal_kpi=b["goal_kpi"],
+        audience_level=b["audience_level"],
+        length_target=b["length_target"],
+        keywords=b["keywords"],
+        forbidden=b["forbidden"],
+    )
+    return build_system_prompt(), apply_template(user, b["template"])
+
+
+def generate_one(bid: str, briefing: dict, args: argparse.Namespace) -> dict:
+    model = briefing.get("model") or args.model
+    temperature = float(briefing.get("temperature", args.temperature))
+    record = {"id": bid, "briefing": briefing, "model": model}
+    # Modelle ohne json_schema laufen im Textformat statt mit 400 abzubrechen
+    structured = args.structured and supports_json_schema(model)
+    started = time.perf_counter()
+    try:
+        system, user = build_prompts(briefing)
+        if structured:
+            user = f"{user}\n\n{STRUCTURED_HINT}"
+        raw = call_openai(
+            args.api_key, model, system, user, temperature, use_cache=not args.no_cache, base_url=args.base_url,
+            response_format=STRUCTURED_RESPONSE_FORMAT if structured else None,
+            is_valid=lambda r: is_complete(r, structured=structured),
+        )
+        sections = parse_output(raw, structured=structured)
+        if structured:
+            raw = sections_to_raw(sections)
+        if sections["subjects"] and sections["newsletter"]:
+            record.update(status="ok", raw=raw, sections=sections)
+        else:
+            # Textformat ohne erkennbare Abschnitte: als Fehler zählen, damit Resume es erneut versucht
+            record.update(status="error", error="Betreffzeilen oder Newsletter-Text leer", raw=raw)
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    record["latency_s"] = round(time.perf_counter() - started, 3)
+    record["finished_at"] = datetime.now().isoformat()
+    return record
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    briefings = load_briefings(args.input)
+    done = completed_ids(args.output)
+    todo = [(bid, b) for bid, b in briefings if bid not in done]
+    print(f"{len(briefings)} Briefings, {len(done & {bid for bid, _ in briefings})} bereits fertig, {len(todo)} offen")
+
+    write_lock = threading.Lock()
+    failures = 0
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with args.output.open("a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=args.workers) as pool:
+        pending = set()
+        queue = iter(todo)
+
+        def write(record: dict) -> None:
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+
+        # Nur begrenzt viele Aufträge gleichzeitig im Pool halten
+        while True:
+            while len(pending) < args.workers * 2:
+                item = next(queue, None)
+                if item is None:
+                    break
+                pending.add(pool.submit(generate_one, *item, args))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                record = fut.result()
+                write(record)
+                if record["status"] != "ok":
+                    failures += 1
+                mark = "✅" if record["status"] == "ok" else "❌"
+                print(f"{mark} {record['id']} ({record['latency_s']:.1f} s)")
+
+    print(f"Fertig: {len(todo) - failures} erfolgreich, {failures} fehlgeschlagen → {args.output}")
+    return 1 if failures else 0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Newsletter headless aus einer JSONL-Briefing-Datei generieren")
+    parser.add_argument("input", type=Path, help="Briefings (JSONL)")
+    parser.add_argument("-o", "--output", type=Path, default=Path("newsletters.jsonl"), help="Ergebnisse (JSONL, wird fortgeschrieben)")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Parallele Anfragen")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--no-cache", action="store_true", help="Antwort-Cache umgehen")
+    parser.add_argument("--structured", action="store_true", help="JSON-Schema-Ausgabe statt Textblöcken")
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL") or None, help="Alternativer Endpoint, z.B. mock_openai_server.py")
+    args = parser.parse_args(argv)
+    args.api_key = os.getenv("OPENAI_API_KEY", "").strip()
+    if not args.api_key:
+        parser.error("OPENAI_API_KEY fehlt (Umgebung oder .env)")
+    if args.workers < 1:
+        parser.error("--workers muss mindestens 1 sein")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(run_batch(parse_args()))
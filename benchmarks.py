@@ -0,0 +1,427 @@
+# benchmarks.py
+# Offline-Benchmarks für die Newsletter-Apps
+#
+#   python benchmarks.py llm --spawn-mock --requests 50 --concurrency 8 --stream
+#   python benchmarks.py parser --corpus newsletters.jsonl --scale 50
+#   python benchmarks.py theme --reruns 100
+#   python benchmarks.py search --docs 10000 --queries 200
+#   python benchmarks.py dedup --docs 5000 --checks 100
+#   python benchmarks.py importtime generator_v3.py newsletterv2.py
+
+import argparse
+import ast
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_metrics import percentile
+
+
+def _summary(label: str, values: list[float]) -> str:
+    if not values:
+        return f"{label}: –"
+    return (
+        f"{label}: p50 {percentile(values, 50) * 1000:.0f} ms • p95 {percentile(values, 95) * 1000:.0f} ms • "
+        f"max {max(values) * 1000:.0f} ms (n={len(values)})"
+    )
+
+
+def bench_llm(args: argparse.Namespace) -> int:
+    from llm_metrics import counters
+    from newsletter_engine import (
+        STRUCTURED_HINT,
+        STRUCTURED_RESPONSE_FORMAT,
+        build_system_prompt,
+        build_user_prompt,
+        call_openai,
+        parse_output,
+        stream_openai,
+    )
+
+    server = None
+    base_url = args.base_url
+    if args.spawn_mock:
+        from mock_openai_server import make_server, parse_args as mock_args
+
+        server = make_server(mock_args(["--port", "0", *args.mock_args]))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    if not base_url:
+        print("Bitte --base-url angeben oder --spawn-mock verwenden (echte Tokens werden nicht verbrannt).", file=sys.stderr)
+        return 2
+
+    system = build_system_prompt()
+    topics = ["Grenzen setzen", "No Contact", "Selbstwert", "Trauma Bonding", "Gaslighting"]
+
+    def one(i: int) -> tuple[float | None, float | None, str | None]:
+        user = build_user_prompt(
+            reader_state="Gemischt", topic=f"{topics[i % len(topics)]} #{i}", tone_label="Ausgewogen",
+            mode="📖 Mehrwert (Tipp)", product_context="", goal_kpi="Klickrate", audience_level="Einsteiger",
+            length_target="Mittel (≈ 400–650 Wörter)", keywords="", forbidden="",
+        )
+        if args.structured:
+            user = f"{user}\n\n{STRUCTURED_HINT}"
+        started = time.perf_counter()
+        ttft = None
+        try:
+            if args.stream:
+                parts = []
+                for delta in stream_openai(args.api_key, args.model, system, user, 0.7, use_cache=False, base_url=base_url):
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                    parts.append(delta)
+                parse_output("".join(parts))
+            else:
+                raw = call_openai(
+                    args.api_key, args.model, system, user, 0.7, use_cache=False, base_url=base_url,
+                    response_format=STRUCTURED_RESPONSE_FORMAT if args.structured else None,
+                )
+                parse_output(raw, structured=args.structured)
+        except Exception as e:
+            return None, None, type(e).__name__
+        return ttft, time.perf_counter() - started, None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - started
+    if server:
+        server.shutdown()
+
+    errors: dict[str, int] = {}
+    for _, _, err in results:
+        if err:
+            errors[err] = errors.get(err, 0) + 1
+    ok = [r for r in results if r[2] is None]
+    print(f"{args.requests} Requests, Concurrency {args.concurrency}, {'Streaming' if args.stream else 'Sync'} → {base_url}")
+    print(_summary("Gesamt", [r[1] for r in ok]))
+    if args.stream:
+        print(_summary("Erstes Token", [r[0] for r in ok if r[0] is not None]))
+    print(f"Durchsatz: {len(ok) / wall:.2f} req/s • Fehler: {errors or 'keine'}")
+    fmt = "json" if args.structured else "text"
+    stats = counters()
+    print(f"Parse-Fehler ({fmt}): {stats.get(f'format.{fmt}.parse_failed', 0)}/{stats.get(f'format.{fmt}.calls', 0)}")
+    return 0
+
+
+def _parser_corpus(args: argparse.Namespace) -> list[str]:
+    from mock_openai_server import canned_newsletter
+
+    corpus = []
+    if args.corpus and os.path.exists(args.corpus):
+        with open(args.corpus, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    raw = json.loads(line).get("raw")
+                except (json.JSONDecodeError, AttributeError):
+                    continue
+                if raw:
+                    corpus.append(raw)
+    # Synthetische Antworten inkl. typischer Format-Abweichungen der Modelle
+    rng = random.Random(42)
+    drifts = [
+        lambda t: t,
+        lambda t: t.replace("\n", "\r\n"),
+        lambda t: t.lower(),
+        lambda t: t.replace("PREHEADER:", "Preheader -"),
+        lambda t: t.replace("NEWSLETTER:\n", ""),
+        lambda t: t.replace("---\n", ""),
+        lambda t: t.replace("CTA_VARIANTEN:", "CTAs:"),
+        lambda t: t.replace("\n\n", "\n \n\t\n"),
+        lambda t: f"Hier ist dein Newsletter:\n\n{t}\n\nViel Erfolg!",
+        lambda t: t.replace("BETREFF:\n", "BETREFF: "),
+    ]
+    for i in range(args.samples):
+        corpus.append(rng.choice(drifts)(canned_newsletter(f"Korpus #{i}")))
+    return corpus
+
+
+def bench_parser(args: argparse.Namespace) -> int:
+    from newsletter_engine import extract_sections_regex
+    from section_parser import SectionParser
+
+    corpus = _parser_corpus(args)
+    rng = random.Random(7)
+    mismatches = 0
+    for raw in corpus:
+        expected = extract_sections_regex(raw)
+        parser = SectionParser()
+        pos = 0
+        while pos < len(raw):
+            step = rng.randint(1, 12)
+            parser.feed(raw[pos:pos + step])
+            pos += step
+        if SectionParser.parse(raw) != expected or parser.close() != expected:
+            mismatches += 1
+    print(f"Äquivalenz: {len(corpus) - mismatches}/{len(corpus)} Antworten identisch")
+
+    # Große Ausgabe: Newsletter-Text künstlich vervielfacht
+    base = corpus[-1]
+    head, _, tail = base.partition("CTA_VARIANTEN:")
+    big = head * args.scale + "CTA_VARIANTEN:" + tail
+    chunks = [big[i:i + 4] for i in range(0, len(big), 4)]
+
+    def timed(fn, repeat: int = 5) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def regex_stream() -> None:
+        buf = []
+        for i, chunk in enumerate(chunks, 1):
+            buf.append(chunk)
+            if i % args.render_every == 0:
+                extract_sections_regex("".join(buf))
+        extract_sections_regex("".join(buf))
+
+    def parser_stream() -> None:
+        parser = SectionParser()
+        for i, chunk in enumerate(chunks, 1):
+            parser.feed(chunk)
+            if i % args.render_every == 0:
+                parser.sections()
+        parser.close()
+
+    print(f"Große Ausgabe: {len(big) / 1024:.0f} KB, {len(chunks)} Chunks, Vorschau alle {args.render_every} Chunks")
+    for label, old, new in (
+        ("Einmalig", lambda: extract_sections_regex(big), lambda: SectionParser.parse(big)),
+        ("Stream", regex_stream, parser_stream),
+    ):
+        t_old, t_new = timed(old), timed(new)
+        print(f"{label}: Regex {t_old * 1000:.1f} ms • Parser {t_new * 1000:.1f} ms (×{t_old / max(t_new, 1e-9):.1f})")
+    return 1 if mismatches else 0
+
+
+def bench_theme(args: argparse.Namespace) -> int:
+    import theme
+
+    css, _ = theme.bundle()
+    print(f"Bundle: {len(css.encode('utf-8')):,} Bytes (beide Themes, minifiziert) • {theme.publish()}")
+    for dark, label in ((True, "Dunkel"), (False, "Hell")):
+        sizes = theme.payload_bytes(dark)
+        saved = sizes["legacy"] - sizes["loader"]
+        print(
+            f"{label}: Inline-CSS {sizes['legacy']:,} B • minifiziert {sizes['inline']:,} B • Loader {sizes['loader']:,} B "
+            f"→ {saved:,} B weniger pro Rerun, {saved * args.reruns / 1024:.0f} KB über {args.reruns} Reruns"
+        )
+    return 0
+
+
+SEARCH_TOPICS = [
+    "No Contact", "Grenzen setzen", "Co-Parenting", "Selbstwert stärken", "Trauma-Bonding", "Gaslighting erkennen",
+    "Frühling und Neuanfang", "Einsamkeit am Wochenende", "Schuldgefühle loslassen", "Rückfall vermeiden",
+]
+
+
+def bench_search(args: argparse.Namespace) -> int:
+    import tempfile
+
+    from archive import Archive
+    from mock_openai_server import canned_sections
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = Archive(os.path.join(tmp, "archive.sqlite3"))
+        started = time.perf_counter()
+        for i in range(args.docs):
+            topic = rng.choice(SEARCH_TOPICS)
+            sections = canned_sections(f"{topic} #{i}")
+            archive.add({
+                "version": i,
+                "action": "Generiert",
+                "topic": topic,
+                "subject": f"{topic}: {sections['subjects'][0]}",
+                "preheader": sections["preheader"],
+                "body": f"Heute geht es um {topic}.\n\n{sections['newsletter']}",
+                "ctas": sections["ctas"],
+                "briefing": {"topic": topic, "reader_state": "Gemischt"},
+            })
+        build_s = time.perf_counter() - started
+        print(f"Index: {args.docs} Dokumente in {build_s:.1f} s ({build_s / args.docs * 1000:.2f} ms/Dokument)")
+
+        queries = [rng.choice(SEARCH_TOPICS) for _ in range(args.queries)]
+        # Teilweise getippte Suchen, z.B. "Grenzen se"
+        queries += [q[:rng.randint(3, len(q))] for q in queries[:args.queries // 2]]
+        latencies, hits = [], 0
+        for q in queries:
+            t0 = time.perf_counter()
+            results = archive.search(q, limit=10)
+            latencies.append(time.perf_counter() - t0)
+            hits += bool(results)
+        print(_summary("Suche (Top 10)", latencies))
+        print(f"Treffer: {hits}/{len(queries)} Suchen mit Ergebnis")
+        slow = percentile(latencies, 95) > args.budget_ms / 1000
+    return 1 if slow else 0
+
+
+def bench_dedup(args: argparse.Namespace) -> int:
+    import tempfile
+
+    from archive import Archive
+    from mock_openai_server import canned_sections
+
+    rng = random.Random(13)
+
+    def issue(i: int) -> dict:
+        topic = rng.choice(SEARCH_TOPICS)
+        sections = canned_sections(f"{topic} #{i}")
+        # Eigener Einstiegsabsatz pro Ausgabe, damit nicht alles aus demselben Absatz-Pool stammt
+        intro = " ".join(rng.choice(sections["newsletter"].split()) for _ in range(40))
+        return {
+            "version": i,
+            "subject": f"{topic}: {sections['subjects'][0]}",
+            "body": f"{intro}\n\n{sections['newsletter']}",
+            "ctas": sections["ctas"],
+        }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = Archive(os.path.join(tmp, "archive.sqlite3"))
+        stored = []
+        started = time.perf_counter()
+        for i in range(args.docs):
+            doc = issue(i)
+            archive.add(doc, session=f"s{i}")
+            stored.append(doc)
+        build_s = time.perf_counter() - started
+        print(f"Index: {args.docs} Ausgaben in {build_s:.1f} s ({build_s / args.docs * 1000:.2f} ms/Ausgabe)")
+
+        latencies, detected = [], 0
+        for i in range(args.checks):
+            # Hälfte: leicht umformulierte Kopie einer alten Ausgabe, Rest: neue Ausgabe
+            if i % 2 == 0:
+                old = rng.choice(stored)
+                words = old["body"].split("\n\n")[0].split()
+                words[rng.randrange(len(words))] = "anders"
+                doc = {"subject": old["subject"] + "!", "body": " ".join(words)}
+            else:
+                doc = issue(args.docs + i)
+            t0 = time.perf_counter()
+            found = archive.near_duplicates(doc, exclude_session="bench")
+            latencies.append(time.perf_counter() - t0)
+            if i % 2 == 0 and any(item["kind"] == "paragraph" for item in found):
+                detected += 1
+        print(_summary("Prüfung pro Ausgabe", latencies))
+        print(f"Erkannt: {detected}/{(args.checks + 1) // 2} umformulierte Kopien")
+    return 0
+
+
+APPS = ["generator_v3.py", "newsletterv2.py", "newslettergen.py"]
+HEAVY_MODULES = ("openai", "httpx", "dotenv")
+
+
+def _top_level_imports(path: str) -> list[str]:
+    with open(path, encoding="utf-8") as fh:
+        tree = ast.parse(fh.read(), filename=path)
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def _importtime(modules: list[str], cwd: str) -> tuple[list[tuple[str, int]], list[str]] | str:
+    """(Top-Level-Module mit kumulierter Zeit in µs, geladene schwere SDKs) oder Fehlermeldung."""
+    code = "import sys\n" + "".join(f"import {m}\n" for m in modules)
+    code += f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=cwd)
+    if proc.returncode:
+        return (proc.stderr.strip().splitlines() or ["?"])[-1]
+    roots = {m.split(".")[0] for m in modules}
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        # Eingerückte Namen sind Unter-Imports; Interpreter-Start (site, encodings, …) zählt nicht mit
+        if cumulative.strip().isdigit() and not name.startswith("  ") and name.strip().split(".")[0] in roots:
+            rows.append((name.strip(), int(cumulative)))
+    return rows, [m for m in proc.stdout.strip().split(",") if m]
+
+
+def bench_importtime(args: argparse.Namespace) -> int:
+    failed = 0
+    for app in args.apps:
+        modules = _top_level_imports(app)
+        cwd = os.path.dirname(os.path.abspath(app))
+        best = None
+        for _ in range(args.repeat):
+            result = _importtime(modules, cwd)
+            if isinstance(result, str):
+                best = result
+                break
+            if best is None or sum(us for _, us in result[0]) < sum(us for _, us in best[0]):
+                best = result
+        if isinstance(best, str):
+            print(f"{app}: nicht importierbar – {best}")
+            failed += 1
+            continue
+        rows, heavy = best
+        print(f"{app}: {sum(us for _, us in rows) / 1000:.0f} ms Imports (bester von {args.repeat} Läufen)")
+        for name, us in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+            print(f"  {us / 1000:8.1f} ms  {name}")
+        print(f"  Beim Start geladen: {', '.join(heavy) if heavy else 'keins von ' + ', '.join(HEAVY_MODULES)}")
+    return 1 if failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks für die Newsletter-Engine")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_llm = sub.add_parser("llm", help="Last-/Latenztest gegen einen (Mock-)Endpoint")
+    p_llm.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"))
+    p_llm.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY", "mock"))
+    p_llm.add_argument("--model", default="gpt-4o")
+    p_llm.add_argument("--requests", type=int, default=20)
+    p_llm.add_argument("--concurrency", type=int, default=4)
+    p_llm.add_argument("--stream", action="store_true")
+    p_llm.add_argument("--structured", action="store_true", help="JSON-Schema-Ausgabe (ohne --stream)")
+    p_llm.add_argument("--spawn-mock", action="store_true", help="mock_openai_server.py im selben Prozess starten")
+    p_llm.add_argument("--mock-args", nargs=argparse.REMAINDER, default=[], help="Weitere Argumente für den Mock")
+    p_llm.set_defaults(func=bench_llm)
+
+    p_parser = sub.add_parser("parser", help="Abschnitts-Parser: Äquivalenz zur Regex-Variante und Geschwindigkeit")
+    p_parser.add_argument("--corpus", default="newsletters.jsonl", help="JSONL mit Feld raw (z.B. Ausgabe von batch_generate.py)")
+    p_parser.add_argument("--samples", type=int, default=300, help="Zusätzliche synthetische Antworten")
+    p_parser.add_argument("--scale", type=int, default=50, help="Vervielfachung für die große Ausgabe")
+    p_parser.add_argument("--render-every", type=int, default=10, help="Vorschau-Takt im Stream-Test (Chunks)")
+    p_parser.set_defaults(func=bench_parser)
+
+    p_theme = sub.add_parser("theme", help="Theme-Auslieferung: Bytes pro Rerun alt vs. neu")
+    p_theme.add_argument("--reruns", type=int, default=100, help="Hochrechnung für eine Sitzung")
+    p_theme.set_defaults(func=bench_theme)
+
+    p_search = sub.add_parser("search", help="Volltextsuche im Archiv: Indexaufbau und Abfragelatenz")
+    p_search.add_argument("--docs", type=int, default=10000)
+    p_search.add_argument("--queries", type=int, default=200)
+    p_search.add_argument("--budget-ms", type=float, default=50.0, help="p95-Ziel; darüber Exit-Code 1")
+    p_search.set_defaults(func=bench_search)
+
+    p_dedup = sub.add_parser("dedup", help="Beinahe-Duplikate: LSH-Indexaufbau und Prüfzeit pro neuer Ausgabe")
+    p_dedup.add_argument("--docs", type=int, default=5000)
+    p_dedup.add_argument("--checks", type=int, default=100)
+    p_dedup.set_defaults(func=bench_dedup)
+
+    p_import = sub.add_parser("importtime", help="Kaltstart: Importzeit der Apps (python -X importtime)")
+    p_import.add_argument("apps", nargs="*", default=APPS)
+    p_import.add_argument("--repeat", type=int, default=3)
+    p_import.add_argument("--top", type=int, default=8, help="Die langsamsten Top-Level-Imports anzeigen")
+    p_import.set_defaults(func=bench_importtime)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "structured", False) and args.stream:
+        parser.error("--structured und --stream schließen sich aus")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
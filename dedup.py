@@ -0,0 +1,161 @@
+# dedup.py
+# Beinahe-Duplikate über Ausgaben hinweg: MinHash-Signaturen + LSH-Bänder in SQLite
+#
+# Betreffzeilen werden als Zeichen-4-Gramme, Absätze als Wort-3-Gramme verglichen. Jede Signatur
+# wird in BANDS Bänder zu je ROWS Werten zerlegt; Kandidaten sind nur Einträge, die mindestens
+# ein Band teilen (Index-Lookup statt Scan). Die Ähnlichkeit wird dann aus den Signaturen geschätzt.
+
+import hashlib
+import random
+import re
+from array import array
+
+NUM_PERM = 64
+BANDS, ROWS = 16, 4  # Schwelle ≈ (1/BANDS)^(1/ROWS) ≈ 0.5
+THRESHOLD = 0.6
+MIN_PARAGRAPH_WORDS = 8
+MAX_MATCHES = 3  # pro Betreff/Absatz
+MAX_PER_BUCKET = 50  # neueste Einträge pro Band-Treffer; begrenzt die Arbeit auch bei sehr vollen Buckets
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"\w+", re.UNICODE)
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dedup_items (
+    id INTEGER PRIMARY KEY,
+    generation_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_dedup_items_generation ON dedup_items(generation_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dedup_items_text ON dedup_items(kind, text_hash);
+CREATE TABLE IF NOT EXISTS dedup_bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, item_id)
+) WITHOUT ROWID;
+"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(" ".join(_WORD.findall((text or "").lower())).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def shingles(text: str, kind: str) -> set[str]:
+    words = _WORD.findall((text or "").lower())
+    if kind == "subject":
+        joined = " ".join(words)
+        return {joined[i:i + 4] for i in range(max(1, len(joined) - 3))} if joined else set()
+    if len(words) < 3:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def signature(items: set[str]) -> array:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in items]
+    return array("Q", (min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS))
+
+
+def bands(sig: array) -> list[int]:
+    # Bucket = Hash über die ROWS Werte eines Bands, als vorzeichenbehaftete 63-Bit-Zahl für SQLite
+    out = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS:(band + 1) * ROWS].tobytes()
+        out.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little") >> 1)
+    return out
+
+
+def similarity(a: array, b: array) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def items_for(entry: dict) -> list[tuple[str, int, str]]:
+    """(kind, position, text) aller vergleichbaren Teile: Betreff und Absätze mit genug Wörtern.
+
+    position zählt Absätze wie split_paragraphs() im Editor (leere Absätze übersprungen).
+    """
+    out = []
+    if (entry.get("subject") or "").strip():
+        out.append(("subject", 0, entry["subject"].strip()))
+    paragraphs = [p.strip() for p in _PARAGRAPH_SPLIT.split(entry.get("body") or "") if p.strip()]
+    for i, para in enumerate(paragraphs):
+        if len(_WORD.findall(para)) >= MIN_PARAGRAPH_WORDS:
+            out.append(("paragraph", i, para))
+    return out
+
+
+def index(conn, generation_id: int, entry: dict) -> None:
+    """Schreibt Signaturen und Bänder; Commit übernimmt der Aufrufer (Archive.add).
+
+    Wörtlich schon bekannte Texte werden nicht erneut aufgenommen – Treffer verweisen auf das erste Vorkommen.
+    """
+    for kind, position, text in items_for(entry):
+        digest = text_hash(text)
+        if conn.execute("SELECT 1 FROM dedup_items WHERE kind = ? AND text_hash = ?", (kind, digest)).fetchone():
+            continue
+        sh = shingles(text, kind)
+        if not sh:
+            continue
+        sig = signature(sh)
+        item_id = conn.execute(
+            "INSERT INTO dedup_items (generation_id, kind, position, text, text_hash, signature) VALUES (?, ?, ?, ?, ?, ?)",
+            (generation_id, kind, position, text, digest, sig.tobytes()),
+        ).lastrowid
+        conn.executemany(
+            "INSERT OR IGNORE INTO dedup_bands (band, bucket, item_id) VALUES (?, ?, ?)",
+            [(band, bucket, item_id) for band, bucket in enumerate(bands(sig))],
+        )
+
+
+def find(conn, entry: dict, exclude_session: str | None = None, threshold: float = THRESHOLD) -> list[dict]:
+    """Treffer je Betreff/Absatz von entry: nur LSH-Kandidaten werden geladen und verglichen."""
+    buckets = " UNION ".join(
+        "SELECT item_id FROM (SELECT item_id FROM dedup_bands WHERE band = ? AND bucket = ? ORDER BY item_id DESC LIMIT ?)"
+        for _ in range(BANDS)
+    )
+    # Eigene Sitzung ausschließen: dort liegen die Vorversionen desselben Newsletters
+    session_clause = " AND g.session != ?" if exclude_session else ""
+    session_params = [exclude_session] if exclude_session else []
+    sql = (
+        "SELECT i.generation_id, i.text, i.signature, g.subject, g.version, g.created_at "
+        f"FROM ({buckets}) c JOIN dedup_items i ON i.id = c.item_id JOIN generations g ON g.id = i.generation_id "
+        f"WHERE i.kind = ?{session_clause}"
+    )
+    results = []
+    for kind, position, text in items_for(entry):
+        sh = shingles(text, kind)
+        if not sh:
+            continue
+        sig = signature(sh)
+        params = [v for band, bucket in enumerate(bands(sig)) for v in (band, bucket, MAX_PER_BUCKET)]
+        matches = []
+        for row in conn.execute(sql, (*params, kind, *session_params)).fetchall():
+            other = array("Q")
+            other.frombytes(row["signature"])
+            score = similarity(sig, other)
+            if score >= threshold:
+                matches.append({
+                    "generation_id": row["generation_id"],
+                    "text": row["text"],
+                    "subject": row["subject"],
+                    "version": row["version"],
+                    "created_at": row["created_at"],
+                    "score": score,
+                })
+        if matches:
+            matches.sort(key=lambda m: m["score"], reverse=True)
+            # Mehrere ähnliche Absätze derselben Ausgabe: nur den besten zeigen
+            seen, unique = set(), []
+            for m in matches:
+                if m["generation_id"] not in seen:
+                    seen.add(m["generation_id"])
+                    unique.append(m)
+            results.append({"kind": kind, "position": position, "text": text, "matches": unique[:MAX_MATCHES]})
+    return results
@@ -0,0 +1,125 @@
+# exports.py
+# TXT/Markdown/HTML/JSON-Exporte – erst bei Bedarf gebaut und pro Inhalt gecacht
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from string import Template
+
+MAX_CACHED = 64
+
+FORMATS = {
+    "txt": {"label": "📄 TXT", "file_name": "newsletter.txt", "mime": "text/plain"},
+    "md": {"label": "📝 Markdown", "file_name": "newsletter.md", "mime": "text/markdown"},
+    "html": {"label": "🌐 HTML", "file_name": "newsletter.html", "mime": "text/html"},
+    "json": {"label": "🔧 JSON", "file_name": "newsletter.json", "mime": "application/json"},
+}
+
+_BOLD = re.compile(r"\*\*(.*?)\*\*")
+
+HTML_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>$subject</title>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { border-bottom: 2px solid #6A1B9A; padding-bottom: 10px; margin-bottom: 20px; }
+        .preheader { color: #666; font-size: 14px; margin-bottom: 10px; }
+        .content { margin-bottom: 30px; }
+        .cta { background-color: #6A1B9A; color: white; padding: 15px; text-align: center; border-radius: 5px; margin: 20px 0; }
+        .footer { font-size: 12px; color: #999; text-align: center; margin-top: 30px; border-top: 1px solid #eee; padding-top: 10px; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>$subject</h1>
+        <div class="preheader">$preheader</div>
+    </div>
+    <div class="content">
+        <p>$body</p>
+    </div>
+    $cta
+    <div class="footer">
+        Raus aus dem Gift Newsletter • $date
+    </div>
+</body>
+</html>""")
+
+_cache: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+
+def content_key(doc: dict) -> str:
+    """Hash über alles, was in einen Export einfließt (Betreff, Preheader, Text, CTAs, Version, Briefing)."""
+    return hashlib.sha256(json.dumps(doc, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def build_text(doc: dict, now: datetime) -> str:
+    ctas = doc["ctas"]
+    cta_block = "CTA_VARIANTEN:\n" + "\n".join(f"- {c}" for c in ctas) if ctas else ""
+    return "\n".join([
+        f"BETREFF: {doc['subject']}",
+        "",
+        f"PREHEADER: {doc['preheader']}",
+        "",
+        "---",
+        doc["body"],
+        "",
+        cta_block,
+        "",
+        "---",
+        "Generiert mit Raus aus dem Gift Newsletter Engine",
+        f"Datum: {now.strftime('%d.%m.%Y %H:%M')}",
+        f"Version: {doc['version']}",
+    ]).strip()
+
+
+def build_html(doc: dict, now: datetime) -> str:
+    body = doc["body"].replace("\n\n", "</p><p>").replace("\n", "<br>")
+    body = _BOLD.sub(r"<strong>\1</strong>", body)
+    ctas = doc["ctas"]
+    return HTML_TEMPLATE.substitute(
+        subject=doc["subject"],
+        preheader=doc["preheader"],
+        body=body,
+        cta=f'<div class="cta">{ctas[0]}</div>' if ctas else "",
+        date=now.strftime("%d.%m.%Y"),
+    )
+
+
+def build_json(doc: dict, now: datetime) -> str:
+    return json.dumps({
+        "subject": doc["subject"],
+        "preheader": doc["preheader"],
+        "body": doc["body"],
+        "ctas": doc["ctas"],
+        "word_count": doc["word_count"],
+        "generated_at": now.isoformat(timespec="minutes"),
+        "version": doc["version"],
+        "briefing": doc["briefing"],
+    }, indent=2, ensure_ascii=False)
+
+
+_BUILDERS = {"txt": build_text, "md": build_text, "html": build_html, "json": build_json}
+
+
+def render_export(kind: str, doc: dict, key: str | None = None) -> str:
+    """Baut den Export beim ersten Abruf; gleicher Inhalt liefert danach den gecachten String."""
+    # Die Exporte enthalten Datum/Uhrzeit (minutengenau) – die gehört mit in den Key, sonst bleibt der erste Zeitstempel stehen
+    now = datetime.now().replace(second=0, microsecond=0)
+    cache_key = (kind, key or content_key(doc), now)
+    with _lock:
+        if cache_key in _cache:
+            _cache.move_to_end(cache_key)
+            return _cache[cache_key]
+    result = _BUILDERS[kind](doc, now)
+    with _lock:
+        _cache[cache_key] = result
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,61 @@
+# fulltext.py
+# Deutsche Tokenisierung und Stemming für die Volltextsuche im Archiv (SQLite FTS5)
+#
+# Stemmer: CISTEM (Weissweiler & Fraser, 2017) – klein, schnell und für deutsche Texte deutlich
+# besser als Porter. Indexiert und gesucht wird mit denselben Stämmen, daher findet
+# "Grenzen setzen" auch "Grenze", "gesetzt" oder "Setzens".
+
+import re
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_GE_PREFIX = re.compile(r"^ge(.{4,})")
+_DOUBLE = re.compile(r"(.)\1")
+_DOUBLE_MARK = re.compile(r"(.)\*")
+_SUFFIX_LONG = re.compile(r"e[mr]$")
+_SUFFIX_ND = re.compile(r"nd$")
+_SUFFIX_T = re.compile(r"t$")
+_SUFFIX = re.compile(r"[esn]$")
+_FOLD = str.maketrans({"ä": "a", "ö": "o", "ü": "u"})
+
+
+def stem(word: str) -> str:
+    """CISTEM, groß-/kleinschreibungsunabhängig."""
+    word = word.lower().translate(_FOLD).replace("ß", "ss")
+    word = _GE_PREFIX.sub(r"\1", word)
+    word = word.replace("sch", "$").replace("ei", "%").replace("ie", "&")
+    word = _DOUBLE.sub(r"\1*", word)
+    while len(word) > 3:
+        if len(word) > 5:
+            word, n = _SUFFIX_LONG.subn("", word)
+            if n:
+                continue
+            word, n = _SUFFIX_ND.subn("", word)
+            if n:
+                continue
+        word, n = _SUFFIX_T.subn("", word)
+        if n:
+            continue
+        word, n = _SUFFIX.subn("", word)
+        if not n:
+            break
+    word = _DOUBLE_MARK.sub(r"\1\1", word)
+    return word.replace("&", "ie").replace("%", "ei").replace("$", "sch")
+
+
+def tokens(text: str) -> list[str]:
+    return [stem(t) for t in _TOKEN.findall(text or "")]
+
+
+def analyze(text: str) -> str:
+    """Text → Stämme, wie sie im FTS-Index landen."""
+    return " ".join(tokens(text))
+
+
+def match_query(query: str) -> str:
+    """Suchtext → FTS5-MATCH-Ausdruck: alle Stämme müssen vorkommen, der letzte auch als Präfix (Tippen)."""
+    terms = tokens(query)
+    if not terms:
+        return ""
+    parts = [f'"{t}"' for t in terms[:-1]]
+    parts.append(f'"{terms[-1]}"*')
+    return " AND ".join(parts)
@@ -1,16 +1,69 @@
-import re
-import textwrap
+import time
+
+# Zeitmessung pro Rerun (Wanduhr + CPU dieses Script-Threads) – ab hier, damit der Kaltstart-Import mitzählt
+script_started = time.perf_counter()
+script_cpu = time.thread_time()
+
+import sys
+import uuid
+from typing import Iterator
 import streamlit as st
-from openai import OpenAI
+import streamlit.components.v1 as components
 import os
-from dotenv import load_dotenv
-import json
 from datetime import datetime
 
 # =========================
 # Environment Variables
 # =========================
-load_dotenv()  # Lade .env Datei
+@st.cache_resource(show_spinner=False)
+def load_environment() -> None:
+    # .env einmal pro Prozess lesen statt bei jedem Rerun; ohne Spinner, denn der wäre ein Element
+    # vor st.set_page_config() (Streamlit 1.37 zeigt ihn bei jedem Aufruf)
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Vor den App-Modulen: llm_cache, rate_limiter, llm_clients, … lesen ihre Einstellungen beim Import
+load_environment()
+
+from llm_cache import get_response_cache
+from llm_clients import client_stats, shutdown_clients
+from model_router import TIERS, load_policy, route
+from prefetch import RewritePrefetcher, prompt_key, record_use, top_kinds
+from exports import FORMATS as EXPORT_FORMATS, content_key, render_export
+from section_parser import SectionParser
+from text_stats import TextStats, cached_sections
+from history_store import HistoryStore
+from archive import get_archive
+import theme
+from rate_limiter import limiter_stats
+from llm_metrics import counters, incr, latency_summary, percentile, recent_calls, token_summary
+from newsletter_engine import (
+    STATIC_USER_PREFIX,
+    TONE_MAP,
+    apply_template,
+    build_system_prompt,
+    build_user_prompt,
+    call_openai,
+    call_openai_hedged,
+    clamp_text,
+    STRUCTURED_HINT,
+    STRUCTURED_RESPONSE_FORMAT,
+    extract_sections,
+    first_sentence,
+    is_complete,
+    merge_paragraphs,
+    paragraph_rewrite_prompt,
+    parse_output,
+    parse_paragraph_rewrite,
+    prompt_prefix_fingerprint,
+    rewrite_prompt,
+    sections_to_raw,
+    split_paragraphs,
+    stream_openai,
+    supports_json_schema,
+)
+
+imports_s = time.perf_counter() - script_started
 
 # =========================
 # Page Config
@@ -47,7 +100,13 @@ if "debug_prompt" not in st.session_state:
     st.session_state.debug_prompt = ""
 
 if "generation_history" not in st.session_state:
-    st.session_state.generation_history = []
+    st.session_state.generation_history = HistoryStore(depth=int(os.getenv("HISTORY_DEPTH", "100")))
+
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+if "archive_pages" not in st.session_state:
+    st.session_state.archive_pages = [None]  # Keyset-Cursor (created_at, id) je bereits besuchter Seite
 
 if "current_version" not in st.session_state:
     st.session_state.current_version = 1
@@ -55,744 +114,91 @@ if "current_version" not in st.session_state:
 if "api_source" not in st.session_state:
     st.session_state.api_source = "manual"
 
+if "last_timing" not in st.session_state:
+    st.session_state.last_timing = {}
+
+if "rerun_timings" not in st.session_state:
+    st.session_state.rerun_timings = []
+
+if "text_stats" not in st.session_state:
+    st.session_state.text_stats = TextStats()
+
+if "prefetcher" not in st.session_state:
+    st.session_state.prefetcher = RewritePrefetcher()
+
 # =========================
 # Theme / CSS - Responsive
 # =========================
 def apply_theme() -> None:
-    if st.session_state.dark_mode:
-        st.markdown(
-            """
-            <style>
-            /* Basis-Styles */
-            .stApp { 
-                background-color: #0E0B16; 
-                color: #E0E0E0; 
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            }
-            
-            /* Responsive Text */
-            @media (max-width: 768px) {
-                h1 { font-size: 1.8rem !important; }
-                h2 { font-size: 1.5rem !important; }
-                h3 { font-size: 1.3rem !important; }
-                .stButton button { font-size: 0.9rem !important; padding: 0.4rem 0.8rem !important; }
-                .stTextArea textarea { font-size: 0.95rem !important; }
-            }
-            
-            @media (max-width: 480px) {
-                h1 { font-size: 1.6rem !important; }
-                h2 { font-size: 1.3rem !important; }
-                .stButton button { font-size: 0.85rem !important; padding: 0.3rem 0.6rem !important; }
-            }
-            
-            /* Headings */
-            h1, h2, h3, h4 { 
-                color: #BB86FC !important; 
-                font-weight: 600;
-                margin-bottom: 1rem;
-            }
-            
-            /* Form Elements */
-            .stTextInput input, 
-            .stTextArea textarea, 
-            .stSelectbox div[data-baseweb="select"] {
-                background-color: #1F1B24 !important; 
-                color: white !important;
-                border: 1px solid #444 !important;
-                border-radius: 8px !important;
-                font-size: 1rem;
-            }
-            
-            .stTextArea textarea {
-                min-height: 200px;
-                resize: vertical;
-            }
-            
-            div[role="listbox"] ul { 
-                background-color: #1F1B24 !important; 
-                color: white !important;
-            }
-            
-            /* Sidebar */
-            section[data-testid="stSidebar"] { 
-                background-color: #15121E; 
-            }
-            
-            /* Buttons - Responsive */
-            .stButton button { 
-                background-color: #6A1B9A !important; 
-                color: white !important; 
-                border: none !important;
-                border-radius: 8px !important;
-                font-weight: 500 !important;
-                transition: all 0.3s ease !important;
-                font-size: 1rem !important;
-                padding: 0.5rem 1rem !important;
-                width: 100% !important;
-                min-height: 44px !important; /* Touch-friendly */
-            }
-            
-            .stButton button:hover { 
-                background-color: #7B2CBF !important; 
-                transform: translateY(-1px);
-                box-shadow: 0 4px 12px rgba(106, 27, 154, 0.3) !important;
-            }
-            
-            .stButton button:active { 
-                transform: translateY(0);
-            }
-            
-            /* Primary Buttons */
-            .stButton button[data-testid="baseButton-primary"] {
-                background: linear-gradient(135deg, #6A1B9A, #8E24AA) !important;
-                font-weight: 600 !important;
-            }
-            
-            /* Secondary Buttons */
-            .stButton button:not([data-testid="baseButton-primary"]) {
-                background-color: #333344 !important;
-                border: 1px solid #555 !important;
-            }
-            
-            /* Pills */
-            .pill { 
-                display: inline-block; 
-                padding: 6px 12px; 
-                border-radius: 20px; 
-                background: #1F1B24; 
-                border: 1px solid #3b3b3b; 
-                margin-right: 8px; 
-                margin-bottom: 8px; 
-                font-size: 0.9rem; 
-                color: #E0E0E0;
-                transition: all 0.2s ease;
-            }
-            
-            .pill:hover {
-                background: #2A2535;
-                border-color: #BB86FC;
-            }
-            
-            /* Preview Box */
-            .preview-box {
-                padding: 1.5rem;
-                background-color: #1F1B24;
-                border-left: 5px solid #BB86FC;
-                border-radius: 12px;
-                color: #eee;
-                margin-top: 1rem;
-                line-height: 1.6;
-                font-size: 1rem;
-                overflow-wrap: break-word;
-                word-wrap: break-word;
-            }
-            
-            /* Metrics */
-            .stMetric {
-                background-color: #1F1B24;
-                padding: 12px;
-                border-radius: 8px;
-                border: 1px solid #333;
-            }
-            
-            /* Badges */
-            .success-badge { 
-                background-color: #2E7D32; 
-                color: white; 
-                padding: 4px 10px; 
-                border-radius: 12px; 
-                font-size: 0.8em; 
-                margin-left: 8px; 
-                display: inline-block;
-            }
-            
-            .warning-badge { 
-                background-color: #FF9800; 
-                color: white; 
-                padding: 4px 10px; 
-                border-radius: 12px; 
-                font-size: 0.8em; 
-                margin-left: 8px; 
-                display: inline-block;
-            }
-            
-            .version-badge { 
-                background-color: #6A1B9A; 
-                color: white; 
-                padding: 4px 12px; 
-                border-radius: 12px; 
-                font-size: 0.85em; 
-                display: inline-block;
-                margin-bottom: 10px;
-            }
-            
-            /* Progress Bar */
-            .stProgress > div > div > div > div { 
-                background-color: #BB86FC; 
-            }
-            
-            /* Expander */
-            .streamlit-expanderHeader {
-                background-color: #1F1B24;
-                border-radius: 8px;
-                border: 1px solid #333;
-            }
-            
-            /* Tabs */
-            .stTabs [data-baseweb="tab-list"] {
-                gap: 8px;
-            }
-            
-            .stTabs [data-baseweb="tab"] {
-                background-color: #1F1B24;
-                border-radius: 8px 8px 0 0;
-                padding: 10px 16px;
-            }
-            
-            /* Responsive Grid */
-            @media (max-width: 768px) {
-                .stMetric {
-                    padding: 8px;
-                    font-size: 0.9rem;
-                }
-                .preview-box {
-                    padding: 1rem;
-                }
-                .pill {
-                    font-size: 0.85rem;
-                    padding: 5px 10px;
-                }
-            }
-            
-            /* Mobile Menu */
-            @media (max-width: 768px) {
-                section[data-testid="stSidebar"] {
-                    width: 100% !important;
-                }
-            }
-            
-            /* Text Colors */
-            .muted { 
-                color: #b6b6b6; 
-                font-size: 0.95rem;
-            }
-            
-            .text-success { color: #4CAF50 !important; }
-            .text-warning { color: #FF9800 !important; }
-            .text-danger { color: #F44336 !important; }
-            
-            /* Custom Button Styles */
-            .btn-extend { 
-                background: linear-gradient(135deg, #FF6B6B, #FF8E53) !important; 
-            }
-            
-            .btn-shorten { 
-                background: linear-gradient(135deg, #4ECDC4, #44A08D) !important; 
-            }
-            
-            .btn-rewrite { 
-                background: linear-gradient(135deg, #4776E6, #8E54E9) !important; 
-            }
-            </style>
-            """,
-            unsafe_allow_html=True,
-        )
+    # Das Bundle aus theme.py lädt der Browser einmal; pro Rerun gehen nur Loader und Klassenwechsel raus
+    if st.get_option("server.enableStaticServing"):
+        components.html(theme.loader(st.session_state.dark_mode), height=0)
     else:
-        st.markdown(
-            """
-            <style>
-            /* Light Mode Styles - Responsive */
-            .stApp { 
-                background-color: #FDFBF7; 
-                color: #333; 
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            }
-            
-            /* Responsive Text */
-            @media (max-width: 768px) {
-                h1 { font-size: 1.8rem !important; }
-                h2 { font-size: 1.5rem !important; }
-                h3 { font-size: 1.3rem !important; }
-                .stButton button { font-size: 0.9rem !important; padding: 0.4rem 0.8rem !important; }
-                .stTextArea textarea { font-size: 0.95rem !important; }
-            }
-            
-            @media (max-width: 480px) {
-                h1 { font-size: 1.6rem !important; }
-                h2 { font-size: 1.3rem !important; }
-                .stButton button { font-size: 0.85rem !important; padding: 0.3rem 0.6rem !important; }
-            }
-            
-            /* Headings */
-            h1, h2, h3, h4 { 
-                color: #4A148C !important; 
-                font-weight: 600;
-                margin-bottom: 1rem;
-            }
-            
-            /* Form Elements */
-            .stTextInput input, 
-            .stTextArea textarea, 
-            .stSelectbox div[data-baseweb="select"] {
-                background-color: white !important; 
-                color: black !important;
-                border: 1px solid #ddd !important;
-                border-radius: 8px !important;
-                font-size: 1rem;
-            }
-            
-            .stTextArea textarea {
-                min-height: 200px;
-                resize: vertical;
-            }
-            
-            /* Sidebar */
-            section[data-testid="stSidebar"] { 
-                background-color: #F3F0FA; 
-            }
-            
-            /* Buttons - Responsive */
-            .stButton button { 
-                background-color: #6A1B9A !important; 
-                color: white !important; 
-                border: none !important;
-                border-radius: 8px !important;
-                font-weight: 500 !important;
-                transition: all 0.3s ease !important;
-                font-size: 1rem !important;
-                padding: 0.5rem 1rem !important;
-                width: 100% !important;
-                min-height: 44px !important;
-            }
-            
-            .stButton button:hover { 
-                background-color: #7B2CBF !important; 
-                transform: translateY(-1px);
-                box-shadow: 0 4px 12px rgba(106, 27, 154, 0.2) !important;
-            }
-            
-            .stButton button:active { 
-                transform: translateY(0);
-            }
-            
-            /* Primary Buttons */
-            .stButton button[data-testid="baseButton-primary"] {
-                background: linear-gradient(135deg, #6A1B9A, #8E24AA) !important;
-                font-weight: 600 !important;
-            }
-            
-            /* Secondary Buttons */
-            .stButton button:not([data-testid="baseButton-primary"]) {
-                background-color: #EDE7F6 !important;
-                color: #4A148C !important;
-                border: 1px solid #D1C4E9 !important;
-            }
-            
-            /* Pills */
-            .pill { 
-                display: inline-block; 
-                padding: 6px 12px; 
-                border-radius: 20px; 
-                background: #fff; 
-                border: 1px solid #e6e6e6; 
-                margin-right: 8px; 
-                margin-bottom: 8px; 
-                font-size: 0.9rem; 
-                color: #333;
-                transition: all 0.2s ease;
-            }
-            
-            .pill:hover {
-                background: #F3F0FA;
-                border-color: #6A1B9A;
-            }
-            
-            /* Preview Box */
-            .preview-box {
-                padding: 1.5rem;
-                background-color: white;
-                border-left: 5px solid #6A1B9A;
-                border-radius: 12px;
-                box-shadow: 0 2px 15px rgba(0,0,0,0.08);
-                color: #111;
-                margin-top: 1rem;
-                line-height: 1.6;
-                font-size: 1rem;
-                overflow-wrap: break-word;
-                word-wrap: break-word;
-            }
-            
-            /* Metrics */
-            .stMetric {
-                background-color: white;
-                padding: 12px;
-                border-radius: 8px;
-                border: 1px solid #eee;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.05);
-            }
-            
-            /* Badges */
-            .success-badge { 
-                background-color: #4CAF50; 
-                color: white; 
-                padding: 4px 10px; 
-                border-radius: 12px; 
-                font-size: 0.8em; 
-                margin-left: 8px; 
-                display: inline-block;
-            }
-            
-            .warning-badge { 
-                background-color: #FF9800; 
-                color: white; 
-                padding: 4px 10px; 
-                border-radius: 12px; 
-                font-size: 0.8em; 
-                margin-left: 8px; 
-                display: inline-block;
-            }
-            
-            .version-badge { 
-                background-color: #6A1B9A; 
-                color: white; 
-                padding: 4px 12px; 
-                border-radius: 12px; 
-                font-size: 0.85em; 
-                display: inline-block;
-                margin-bottom: 10px;
-            }
-            
-            /* Progress Bar */
-            .stProgress > div > div > div > div { 
-                background-color: #6A1B9A; 
-            }
-            
-            /* Expander */
-            .streamlit-expanderHeader {
-                background-color: white;
-                border-radius: 8px;
-                border: 1px solid #eee;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.05);
-            }
-            
-            /* Tabs */
-            .stTabs [data-baseweb="tab-list"] {
-                gap: 8px;
-            }
-            
-            .stTabs [data-baseweb="tab"] {
-                background-color: white;
-                border-radius: 8px 8px 0 0;
-                padding: 10px 16px;
-                border: 1px solid #eee;
-            }
-            
-            /* Responsive Grid */
-            @media (max-width: 768px) {
-                .stMetric {
-                    padding: 8px;
-                    font-size: 0.9rem;
-                }
-                .preview-box {
-                    padding: 1rem;
-                }
-                .pill {
-                    font-size: 0.85rem;
-                    padding: 5px 10px;
-                }
-            }
-            
-            /* Mobile Menu */
-            @media (max-width: 768px) {
-                section[data-testid="stSidebar"] {
-                    width: 100% !important;
-                }
-            }
-            
-            /* Text Colors */
-            .muted { 
-                color: #666; 
-                font-size: 0.95rem;
-            }
-            
-            .text-success { color: #4CAF50 !important; }
-            .text-warning { color: #FF9800 !important; }
-            .text-danger { color: #F44336 !important; }
-            
-            /* Custom Button Styles */
-            .btn-extend { 
-                background: linear-gradient(135deg, #FF6B6B, #FF8E53) !important; 
-            }
-            
-            .btn-shorten { 
-                background: linear-gradient(135deg, #4ECDC4, #44A08D) !important; 
-            }
-            
-            .btn-rewrite { 
-                background: linear-gradient(135deg, #4776E6, #8E54E9) !important; 
-            }
-            </style>
-            """,
-            unsafe_allow_html=True,
-        )
+        st.markdown(theme.inline(st.session_state.dark_mode), unsafe_allow_html=True)
 
 apply_theme()
 
 # =========================
 # Helpers
 # =========================
-def clamp_text(s: str, max_len: int) -> str:
-    s = (s or "").strip()
-    if len(s) <= max_len:
-        return s
-    return s[: max_len - 1].rstrip() + "…"
-
-def count_words(s: str) -> int:
-    return len(re.findall(r"\b\w+\b", s or ""))
-
-def extract_sections(raw: str) -> dict:
-    out = {
-        "subjects": [],
-        "preheader": "",
-        "newsletter": "",
-        "ctas": [],
-    }
-    if not raw:
-        return out
-
-    txt = raw.replace("\r\n", "\n").strip()
-
-    # Subjects
-    m = re.search(r"BETREFF:\s*(.*?)\n\s*PREHEADER:", txt, flags=re.S | re.I)
-    if m:
-        subj_block = m.group(1).strip()
-        subs = []
-        for line in subj_block.split("\n"):
-            line = re.sub(r"^\s*\d+\.\s*", "", line).strip()
-            if line:
-                subs.append(line)
-        out["subjects"] = subs[:15]
-    
-    if not out["subjects"]:
-        m = re.search(r"BETREFF:\s*(.*?)\n\s*\n", txt, flags=re.S | re.I)
-        if m:
-            subj_block = m.group(1).strip()
-            subs = []
-            for line in subj_block.split("\n"):
-                line = re.sub(r"^\s*\d+\.\s*", "", line).strip()
-                if line:
-                    subs.append(line)
-            out["subjects"] = subs[:15]
-
-    # Preheader
-    m = re.search(r"PREHEADER:\s*(.*?)\n\s*(---|NEWSLETTER:)", txt, flags=re.S | re.I)
-    if m:
-        out["preheader"] = m.group(1).strip()
-    elif "PREHEADER:" in txt:
-        parts = txt.split("PREHEADER:")
-        if len(parts) > 1:
-            pre_part = parts[1].split("\n")[0].strip()
-            out["preheader"] = pre_part
-
-    # Newsletter body
-    m = re.search(r"NEWSLETTER:\s*(.*?)(\n\s*CTA_VARIANTEN:|\Z)", txt, flags=re.S | re.I)
-    if m:
-        out["newsletter"] = m.group(1).strip()
-    elif "---" in txt:
-        parts = txt.split("---")
-        if len(parts) > 1:
-            out["newsletter"] = parts[1].strip()
-
-    # CTA variants
-    m = re.search(r"CTA_VARIANTEN:\s*(.*)$", txt, flags=re.S | re.I)
-    if m:
-        cta_block = m.group(1).strip()
-        ctas = []
-        for line in cta_block.split("\n"):
-            line = re.sub(r"^\s*\d+\.\s*", "", line).strip()
-            if line:
-                ctas.append(line)
-        out["ctas"] = ctas[:10]
-    elif "CTA_VARIANTEN:" in txt:
-        parts = txt.split("CTA_VARIANTEN:")
-        if len(parts) > 1:
-            cta_block = parts[1].strip()
-            ctas = []
-            for line in cta_block.split("\n"):
-                line = re.sub(r"^\s*\d+\.\s*", "", line).strip()
-                if line:
-                    ctas.append(line)
-            out["ctas"] = ctas[:10]
-
-    return out
-
-def build_system_prompt() -> str:
-    return textwrap.dedent(
-        """
-        Du bist ein Elite-Direct-Response-Copywriter für 'Raus aus dem Gift'.
-        Thema: toxische Beziehungen, Trennung, Heilung, Selbstwert, Grenzen.
-
-        Du schreibst nach einem FIXEN Framework, um konstant High-Performance-Newsletter zu liefern.
-
-        OUTPUT (streng einhalten):
-        BETREFF:
-        1. ...
-        2. ...
-        ...
-        10. ...
-
-        PREHEADER:
-        <1 Satz, max. 90 Zeichen>
-
-        ---
-        NEWSLETTER:
-        <Text in kurzen Absätzen>
-
-        CTA_VARIANTEN:
-        1. ...
-        2. ...
-        3. ...
-
-        REGELN:
-        - Du-Ansprache, kurze Sätze, kurze Absätze (max 2 Sätze).
-        - Keine Floskeln. Kein Coaching-Geschwurbel. Kein Over-Explaining.
-        - Baue visuelle Anker: **Fett** nur für:
-          (a) validierende Sätze, (b) Fachbegriffe, (c) konkrete Schritte, (d) CTA.
-        - Nutze psychologische Präzision, aber bleib alltagstauglich.
-        - Kein medizinischer oder rechtlicher Rat.
-        """
-    ).strip()
-
-def build_user_prompt(
-    reader_state: str,
-    topic: str,
-    tone_label: str,
-    mode: str,
-    product_context: str,
-    goal_kpi: str,
-    audience_level: str,
-    length_target: str,
-    keywords: str,
-    forbidden: str,
-    extend_text: bool = False,  # NEU: Parameter für Textverlängerung
-    current_text: str = ""      # NEU: Aktueller Text für Verlängerung
-) -> str:
-    extra_rules = []
-    if keywords.strip():
-        extra_rules.append(f"Nutze diese Keywords organisch: {keywords.strip()}")
-    if forbidden.strip():
-        extra_rules.append(f"Vermeide unbedingt diese Wörter/Phrasen: {forbidden.strip()}")
-
-    length_map = {
-        "Kurz (≈ 250–400 Wörter)": "Ziel: 250–400 Wörter.",
-        "Mittel (≈ 400–650 Wörter)": "Ziel: 400–650 Wörter.",
-        "Lang (≈ 650–900 Wörter)": "Ziel: 650–900 Wörter.",
-    }
-    kpi_map = {
-        "Öffnungsrate": "Optimiere maximal auf Öffnungen: Betreff neugierig, klar, ohne Clickbait.",
-        "Klickrate": "Optimiere auf Klicks: starker CTA, klare nächste Aktion, wenig Reibung.",
-        "Antworten/Engagement": "Optimiere auf Antworten: 1 starke Frage am Ende, emotionaler Trigger.",
-        "Verkäufe": "Optimiere auf Conversions: Schmerz → Lösung → proof → CTA, ohne Druck.",
-    }
-
-    mode_line = "MODUS: MEHRWERT." if mode == "Mehrwert (Tipp)" else "MODUS: VERKAUF."
-    if mode != "Mehrwert (Tipp)":
-        mode_line += f" Angebot-Details: {product_context.strip() or '(keine Details gegeben)'}"
-
-    # NEU: Verlängerungs-Prompt
-    if extend_text and current_text:
-        extend_instruction = f"""
-        AKTUELLER TEXT (verlängern/ergänzen):
-        {current_text[:800]}...
-        
-        ANWEISUNG FÜR VERLÄNGERUNG:
-        - Behalte den vorhandenen Inhalt, Stil und Ton bei
-        - Füge NEUE Inhalte hinzu, die den bestehenden Text ergänzen
-        - Vertiefe die bestehenden Punkte mit zusätzlichen Beispielen, Erklärungen oder Geschichten
-        - Füge 1-2 neue Absätze ein, die den Wert erhöhen
-        - Achte darauf, dass der Text natürlich weiterfließt
-        - Ziel: Text um etwa 30-50% verlängern
-        """
-        current_text_section = extend_instruction
-    else:
-        current_text_section = ""
-
-    return textwrap.dedent(
-        f"""
-        BRIEFING:
-        - Leserphase: {reader_state}
-        - Thema: {topic.strip() or 'Allgemein, aber fokussiert auf Heilung / Grenzen'}
-        - Ton: {tone_label}
-        - Ziel: {mode_line}
-        - Ziel-KPI: {goal_kpi} ({kpi_map.get(goal_kpi, '')})
-        - Audience-Level: {audience_level} (Einsteiger = simpel, Fortgeschritten = präziser)
-        - Länge: {length_map.get(length_target, '')}
-
-        {current_text_section}
-
-        PSYCHOLOGISCHE ANFORDERUNG:
-        - Beginne mit einem Hook, der die exakte Innenwelt der Leserphase trifft.
-        - Dann Validierung (Schuld rausnehmen).
-        - Dann Reframe (neue Perspektive).
-        - Dann ein konkreter Schritt (heute machbar).
-        - Dann CTA (passend zur Leserphase).
-
-        {("ZUSATZREGELN:\n- " + "\n- ".join(extra_rules)) if extra_rules else ""}
-
-        WICHTIG:
-        - Betreffzeilen: max. 45 Zeichen, unterschiedlich, keine Duplikate.
-        - Preheader: max. 90 Zeichen, ergänzt Betreff (nicht wiederholen).
-        - CTA_VARIANTEN: 3–5 Varianten, unterschiedlich in Ton & Reibung.
-
-        Gib NUR das geforderte Output-Format zurück.
-        """
-    ).strip()
-
-def call_openai(api_key: str, model: str, system: str, user: str, temperature: float) -> str:
-    client = OpenAI(api_key=api_key)
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        temperature=temperature,
-    )
-    return resp.choices[0].message.content or ""
-
-def rewrite_prompt(kind: str, reader_state: str, tone_label: str, current_text: str = "") -> str:
-    variants = {
-        "Kürzer": "Kürze radikal. Entferne Wiederholungen. Mehr Punch. Gleiches Framework beibehalten.",
-        "Verlängern": "Füge mehr Tiefe, Beispiele und Erklärungen hinzu. Vertiefe die bestehenden Punkte mit zusätzlichen Insights.",
-        "Direkter": "Weniger weich. Mehr Klartext. Härtere Sätze. Kein Drama. Mehr Führung.",
-        "Sanfter": "Mehr Wärme, mehr Sicherheit. Gleiche Klarheit, aber beruhigender Ton.",
-        "Mehr Story": "Baue eine kurze Mini-Story am Anfang ein (3–6 Sätze) statt abstraktem Einstieg.",
-        "Mehr Conversion": "Stärkerer Benefit-Stack, mehr Proof/Logik, CTA klarer, aber ohne Druck.",
-        "Mehr Empathie": "Betone mehr Verständnis und Validierung. Zeige, dass du die Leserin wirklich verstehst.",
-        "Mehr Actionable": "Fokussiere auf konkrete, umsetzbare Schritte. Weniger Theorie, mehr Praxis.",
-    }
-    instr = variants.get(kind, "Überarbeite den Text sinnvoll.")
-    
-    if kind == "Verlängern" and current_text:
-        instr += f"\n\nAKTUELLER TEXT:\n{current_text[:1000]}\n\nVerlängere diesen Text um etwa 30-50%, füge mehr Tiefe und Beispiele hinzu."
-    
-    return textwrap.dedent(
-        f"""
-        Du überarbeitest einen bestehenden Newsletter.
-        Leserphase: {reader_state}
-        Ton: {tone_label}
-
-        ANWEISUNG:
-        {instr}
-
-        Behalte das Output-Format bei (BETREFF / PREHEADER / --- / NEWSLETTER / CTA_VARIANTEN).
-        """
-    ).strip()
-
 def add_to_history(version_data: dict) -> None:
-    st.session_state.generation_history.append(version_data)
-    if len(st.session_state.generation_history) > 10:
-        st.session_state.generation_history = st.session_state.generation_history[-10:]
+    # Dauerhaft ins Archiv, dazu komprimiert in den Sitzungs-Store (schnelles Wiederherstellen eigener Versionen)
+    entry_id = get_archive().add(version_data, session=st.session_state.session_id)
+    st.session_state.generation_history.push({**version_data, "entry_id": entry_id})
+
+def archive_rewrite(kind: str, settings: dict, model: str, usage: dict, raw: str | None = None) -> None:
+    # Erst nach erfolgreichem Rewrite: der neue Stand wird die nächste Version, mit Modell und Tokens
+    version_data = {
+        "version": st.session_state.current_version,
+        "timestamp": datetime.now().isoformat(),
+        "action": f"Rewrite: {kind}",
+        "topic": settings["topic"],
+        "subject": st.session_state.subject_selected,
+        "preheader": st.session_state.preheader,
+        "body": st.session_state.newsletter_body,
+        "ctas": list(st.session_state.cta_variants),
+        "model": model,
+        "briefing": {"topic": settings["topic"], "reader_state": settings["reader_state"], "tone": settings["tone_label"], "mode": settings["mode"]},
+        **usage,
+    }
+    # Absatz-/Kürzen-Rewrites ändern nur den Text – raw dann aus dem aktuellen Stand bauen
+    version_data["raw"] = raw or entry_raw(version_data)
+    add_to_history(version_data)
+    st.session_state.current_version += 1
+
+def entry_raw(entry: dict) -> str:
+    # Templates (und ältere Archiv-Einträge) haben kein raw – aus den Abschnitten neu bauen
+    if entry.get("raw"):
+        return entry["raw"]
+    return sections_to_raw({
+        "subjects": [entry["subject"]] if entry.get("subject") else [],
+        "preheader": entry.get("preheader") or "",
+        "newsletter": entry.get("body") or "",
+        "ctas": list(entry.get("ctas") or []),
+    })
+
+def load_version(entry: dict) -> dict | None:
+    if entry["session"] == st.session_state.session_id:
+        version = st.session_state.generation_history.get_entry(entry["id"])
+        if version is not None:
+            return version
+    return get_archive().load(entry["id"])
+
+def near_duplicates(subject: str, body: str) -> tuple[list[dict], float]:
+    # Pro Inhalt einmal gegen das Archiv prüfen; Fragment-Reruns ohne Textänderung nutzen das Ergebnis weiter
+    key = content_key({"subject": subject, "body": body})
+    cached = st.session_state.get("near_duplicates")
+    if cached is None or cached[0] != key:
+        started = time.perf_counter()
+        found = get_archive().near_duplicates({"subject": subject, "body": body}, exclude_session=st.session_state.session_id)
+        cached = (key, found, time.perf_counter() - started)
+        st.session_state.near_duplicates = cached
+    return cached[1], cached[2]
+
+def record_rerun(scope: str, wall_s: float, cpu_s: float, imports_s: float = 0.0) -> None:
+    timings = st.session_state.rerun_timings
+    timings.append({"scope": scope, "wall_s": wall_s, "cpu_s": cpu_s, "imports_s": imports_s})
+    del timings[:-200]
 
 # =========================
 # Sidebar - Responsive
@@ -840,13 +246,21 @@ with st.sidebar:
         st.session_state.api_source = "manual"
     
     # Modelauswahl
+    model_options = ["gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo"]
     model_choice = st.selectbox(
         "🤖 Modell auswählen",
-        ["gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo"],
+        model_options,
         index=0,
         help="GPT-4o ist empfohlen für beste Qualität"
     )
     
+    base_url = st.text_input(
+        "🌐 API Base-URL (optional)",
+        value=os.getenv("OPENAI_BASE_URL", ""),
+        placeholder="https://api.openai.com/v1",
+        help="Für Offline-Tests z.B. http://127.0.0.1:8787/v1 (mock_openai_server.py)"
+    ).strip() or None
+    
     st.markdown("---")
     
     # Performance Einstellungen
@@ -880,26 +294,146 @@ with st.sidebar:
         help="Niedrig = konsistenter, Hoch = kreativer"
     )
     
+    json_schema_ok = supports_json_schema(model_choice)
+    structured_mode = st.toggle(
+        "🧱 JSON-Ausgabe (Structured Outputs)",
+        value=False,
+        disabled=not json_schema_ok,
+        help="Modell liefert Betreff, Preheader, Text und CTAs als validiertes JSON statt Textblöcken (ohne Streaming/Hedging)"
+        + ("" if json_schema_ok else f" – {model_choice} unterstützt kein JSON-Schema")
+    ) and json_schema_ok
+    
+    stream_mode = st.toggle(
+        "📡 Live-Streaming",
+        value=True,
+        help="Zeigt Betreff, Preheader, Text und CTAs schon während der Generierung"
+    )
+    
+    hedge_mode = st.toggle(
+        "🛡️ Hedging",
+        value=False,
+        help="Kommt vom Hauptmodell zu lange kein erstes Token, läuft parallel ein Fallback-Modell – das erste brauchbare Ergebnis gewinnt (ohne Live-Vorschau)"
+    )
+    if hedge_mode:
+        fallback_model = st.selectbox(
+            "Fallback-Modell",
+            ["gpt-4o-mini"] + [m for m in model_options if m != model_choice],
+            index=0
+        )
+        ttft_p95 = latency_summary("ttft_s", mode="stream", cached=False, model=model_choice)
+        hedge_auto = st.checkbox(
+            "Schwelle = gemessenes p95 (erstes Token)",
+            value=ttft_p95["count"] >= 5,
+            disabled=ttft_p95["count"] < 5,
+            help="Braucht mindestens 5 gemessene Streams des Hauptmodells"
+        )
+        if hedge_auto:
+            hedge_after_s = max(0.5, ttft_p95["p95"])
+            st.caption(f"Hedge nach {hedge_after_s:.1f} s (p95 aus {ttft_p95['count']} Streams)")
+        else:
+            hedge_after_s = st.slider("Hedge nach (Sekunden)", 0.5, 20.0, 4.0, 0.5)
+    
+    smart_routing = st.toggle(
+        "🧭 Modell-Routing",
+        value=True,
+        help="Leichte Überarbeitungen (Kürzer, Sanfter, …) laufen auf einem schnelleren Modell"
+    )
+    route_policy = load_policy()
+    if smart_routing:
+        with st.expander("Routing-Tabelle", expanded=False):
+            tier_names = list(TIERS)
+            for action, tier in list(route_policy.items()):
+                route_policy[action] = st.selectbox(
+                    action,
+                    tier_names,
+                    index=tier_names.index(tier),
+                    format_func=lambda t: TIERS[t]["label"],
+                    key=f"route_{action}"
+                )
+    
+    prefetch_mode = st.toggle(
+        "🔮 Rewrites vorab berechnen",
+        value=False,
+        help="Startet nach jeder Generierung die meistgenutzten Überarbeitungen im Hintergrund (kostet zusätzliche Tokens)"
+    )
+    prefetch_count = st.slider("Anzahl vorab", 1, 4, 2) if prefetch_mode else 0
+    
     st.markdown("---")
     
-    # Version History
-    if st.session_state.generation_history:
-        st.subheader("📜 Versionen")
-        for i, version in enumerate(reversed(st.session_state.generation_history[-5:])):
-            btn_text = f"v{version['version']} - {version['action'][:15]}..."
-            if st.button(btn_text, key=f"hist_{i}", use_container_width=True):
-                st.session_state.newsletter_raw = version['raw']
-                st.session_state.subject_selected = version['subject']
-                st.session_state.preheader = version['preheader']
-                st.session_state.newsletter_body = version['body']
-                st.session_state.cta_variants = version['ctas']
+    # Version History – seitenweise aus dem Archiv (archive.py)
+    st.subheader("📜 Versionen")
+    history_filter = st.selectbox(
+        "Filter",
+        ["Alle", "Diese Sitzung", "Gleiches Thema", "Gleiche Phase"],
+        key="history_filter",
+        label_visibility="collapsed",
+        on_change=lambda: st.session_state.update(archive_pages=[None]),
+    )
+    filters = {
+        "Diese Sitzung": {"session": st.session_state.session_id},
+        "Gleiches Thema": {"topic": st.session_state.get("topic") or "-"},
+        "Gleiche Phase": {"reader_state": st.session_state.get("reader_state") or "-"},
+    }.get(history_filter, {})
+    history_query = st.text_input(
+        "🔎 Suchen",
+        key="history_query",
+        placeholder="z.B. No Contact Frühling",
+        label_visibility="collapsed",
+    )
+    archive = get_archive()
+    pages = st.session_state.archive_pages
+    searching = bool(history_query.strip())
+    if searching:
+        # Volltextsuche (fulltext.py): Treffer nach Relevanz statt nach Datum, ohne Blättern
+        entries = archive.search(history_query, limit=10, **filters)
+    else:
+        entries = archive.page(limit=6, after=pages[-1], **filters)
+    for entry in entries[:10 if searching else 5]:
+        icon = "💾" if entry["kind"] == "template" else f"v{entry['version']}"
+        btn_text = f"{icon} - {(entry['topic'] or entry['action'])[:15]}..."
+        when = datetime.fromtimestamp(entry["created_at"]).strftime("%d.%m. %H:%M")
+        if st.button(btn_text, key=f"hist_{entry['id']}", use_container_width=True, help=f"{entry['action']} • {when} • {entry['model'] or '–'}"):
+            version = load_version(entry)
+            st.session_state.newsletter_raw = entry_raw(version)
+            st.session_state.subject_selected = version['subject']
+            st.session_state.preheader = version['preheader']
+            st.session_state.newsletter_body = version['body']
+            st.session_state.cta_variants = version['ctas']
+            if version['version']:
                 st.session_state.current_version = version['version']
+            st.rerun()
+    if not entries:
+        st.caption("Keine Treffer." if searching else "Noch keine Einträge.")
+    if not searching:
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if st.button("◀", key="hist_prev", use_container_width=True, disabled=len(pages) == 1):
+                pages.pop()
+                st.rerun()
+        with col_next:
+            if st.button("▶", key="hist_next", use_container_width=True, disabled=len(entries) <= 5):
+                last = entries[4]
+                pages.append((last["created_at"], last["id"]))
                 st.rerun()
+    if st.session_state.generation_history:
+        history = st.session_state.generation_history.stats()
+        st.caption(
+            f"Seite {len(pages)} • {archive.count(**filters)} im Archiv • Sitzung: {history['versions']} Versionen, "
+            f"{history['stored_bytes'] / 1024:.1f} KB statt {history['plain_bytes'] / 1024:.1f} KB"
+        )
+    elif entries:
+        st.caption(f"Seite {len(pages)} • {archive.count(**filters)} im Archiv")
     
     st.markdown("---")
     
     # Debug Option
     show_debug = st.toggle("🔧 Debug-Modus", value=False, help="Zeigt den Prompt an")
+    bypass_cache = st.toggle(
+        "🗄️ Cache umgehen",
+        value=False,
+        help="Immer eine neue Antwort anfordern, auch wenn der identische Prompt schon im Cache liegt"
+    )
+    use_cache = not bypass_cache
     
     # Quick Actions
     st.markdown("---")
@@ -932,8 +466,6 @@ if st.session_state.current_version > 1:
 # Responsive Columns
 col_input, col_output = st.columns([1, 1.25], gap="large")
 
-tone_map = {1: "Sanft & Tröstend", 2: "Verständnisvoll", 3: "Ausgewogen", 4: "Direkt", 5: "Harter Klartext"}
-
 with col_input:
     st.subheader("1️⃣ Briefing erstellen")
     
@@ -941,14 +473,16 @@ with col_input:
     reader_state = st.selectbox(
         "📊 Phase des Lesers",
         ["Akute Krise (Noch in Beziehung)", "Frisch getrennt (No Contact)", "Heilungsphase (Monate später)", "Gemischt"],
-        help="In welcher Phase befindet sich deine Leserin?"
+        help="In welcher Phase befindet sich deine Leserin?",
+        key="reader_state",
     )
     
     # Topic
     topic = st.text_input(
         "🎯 Thema", 
         placeholder="z.B. Grenzen setzen, Co-Parenting, Selbstwert stärken...",
-        help="Hauptthema des Newsletters"
+        help="Hauptthema des Newsletters",
+        key="topic",
     )
     
     # Tone Settings
@@ -959,7 +493,7 @@ with col_input:
         help="1 = sehr sanft, 5 = sehr direkt",
         label_visibility="collapsed"
     )
-    tone_label = tone_map[tone_val]
+    tone_label = TONE_MAP[tone_val]
     st.caption(f"Eingestellter Ton: **{tone_label}**")
     
     st.markdown("---")
@@ -1058,16 +592,104 @@ with col_input:
             "ctas": st.session_state.cta_variants,
             "timestamp": datetime.now().isoformat()
         }
+        template_data["raw"] = entry_raw(template_data)
         st.session_state.saved_templates.append(template_data)
+        get_archive().add(
+            {**template_data, "action": "Template", "topic": topic, "briefing": {"topic": topic, "reader_state": reader_state}},
+            kind="template",
+            session=st.session_state.session_id,
+        )
         st.success("✅ Als Template gespeichert!")
 
 # =========================
 # Generation Function
 # =========================
-def run_generation(extend=False):
+STREAM_RENDER_INTERVAL = 0.15  # Sekunden zwischen zwei Live-Updates
+
+def render_stream(chunks: Iterator[str], live, progress_bar) -> str:
+    buf = []
+    parser = SectionParser()
+    ttft = None
+    started = time.perf_counter()
+    last_render = 0.0
+    
+    with live.container():
+        st.markdown("#### 📡 Live-Vorschau")
+        slot_subjects = st.empty()
+        slot_preheader = st.empty()
+        slot_body = st.empty()
+        slot_ctas = st.empty()
+    
+    def render(final: bool = False) -> None:
+        sections = parser.close() if final else parser.sections()
+        if sections["subjects"]:
+            slot_subjects.markdown("**✉️ Betreff:**\n" + "\n".join(f"{i}. {s}" for i, s in enumerate(sections["subjects"], 1)))
+        if sections["preheader"]:
+            slot_preheader.markdown(f"**📄 Preheader:** {sections['preheader']}")
+        if sections["newsletter"]:
+            slot_body.markdown(sections["newsletter"] + ("" if final else " ▌"))
+        if sections["ctas"]:
+            slot_ctas.markdown("**🎯 CTAs:**\n" + "\n".join(f"- {c}" for c in sections["ctas"]))
+        
+        # Fortschritt an den erreichten Markern ausrichten
+        markers = parser.markers
+        pct = 5
+        for marker, value in (("PREHEADER", 25), ("NEWSLETTER", 35), ("CTA_VARIANTEN", 90)):
+            if marker in markers:
+                pct = value
+        if "NEWSLETTER" in markers and "CTA_VARIANTEN" not in markers:
+            pct = min(85, 35 + len(sections["newsletter"]) // 100)
+        progress_bar.progress(100 if final else pct)
+    
+    for delta in chunks:
+        if ttft is None:
+            ttft = time.perf_counter() - started
+            st.session_state.last_timing = {"ttft": ttft}
+        buf.append(delta)
+        # Abgeschlossener Abschnitt (z.B. alle Betreffzeilen) sofort zeigen, sonst gedrosselt
+        completed = parser.feed(delta)
+        now = time.perf_counter()
+        if completed or now - last_render >= STREAM_RENDER_INTERVAL:
+            render()
+            last_render = now
+    
+    render(final=True)
+    return "".join(buf)
+
+def routed_model(action: str, settings: dict) -> str:
+    if not settings["smart_routing"]:
+        return settings["model_choice"]
+    return route(action, settings["model_choice"], settings["route_policy"])[0]
+
+def start_prefetch(body: str, settings: dict) -> None:
+    # Läuft im Hintergrund-Thread: nur Streamlit-freie Aufrufe, alle Werte vorab binden
+    api_key, base_url, use_cache = settings["api_key"], settings["base_url"], settings["use_cache"]
+    system = build_system_prompt()
+    jobs = {}
+    for kind in top_kinds(settings["prefetch_count"]):
+        user = rewrite_prompt(kind, settings["reader_state"], settings["tone_label"], body)
+
+        model = routed_model(kind, settings)
+
+        # (Text, Tokens) – die Tokens landen beim Übernehmen mit im Archiv
+        def job(kind=kind, user=user, model=model) -> tuple[str, dict]:
+            usage = {}
+            raw = call_openai(
+                api_key, model, system, user, 0.6, use_cache=use_cache, base_url=base_url, route=kind,
+                is_valid=lambda r: bool(extract_sections(r)["newsletter"]), usage=usage,
+            )
+            return raw, usage
+
+        jobs[kind] = (prompt_key(model, system, user), job)
+    st.session_state.prefetcher.start(body, jobs)
+
+def run_generation(settings: dict, extend: bool = False) -> bool:
+    api_key, base_url, temp_value = settings["api_key"], settings["base_url"], settings["temp_value"]
+    topic, reader_state, tone_label, mode = settings["topic"], settings["reader_state"], settings["tone_label"], settings["mode"]
+    template_choice = settings["template_choice"]
     if not api_key:
         st.error("⚠️ Bitte API Key eingeben oder in .env Datei hinterlegen.")
-        return
+        return False
     
     if not topic.strip() and not extend:
         st.warning("Bitte gib ein Thema an.")
@@ -1078,36 +700,84 @@ def run_generation(extend=False):
         topic=topic,
         tone_label=tone_label,
         mode=mode,
-        product_context=product_context,
-        goal_kpi=goal_kpi,
-        audience_level=audience_level,
-        length_target=length_target,
-        keywords=keywords,
-        forbidden=forbidden,
+        product_context=settings["product_context"],
+        goal_kpi=settings["goal_kpi"],
+        audience_level=settings["audience_level"],
+        length_target=settings["length_target"],
+        keywords=settings["keywords"],
+        forbidden=settings["forbidden"],
         extend_text=extend,
         current_text=st.session_state.newsletter_body if extend else ""
     )
     
+    action = "extend" if extend else "generate"
+    gen_model = routed_model(action, settings)
+    # Routing kann auf ein Modell ohne json_schema führen – dann normaler Textpfad statt 400
+    structured = settings["structured_mode"] and supports_json_schema(gen_model)
+    if settings["structured_mode"] and not structured:
+        st.info(f"ℹ️ {gen_model} unterstützt keine JSON-Ausgabe – generiere als Text.")
+    
     # Template-Anweisungen
-    if template_choice != "Standard":
-        template_instructions = {
-            "Schmerzpunkt → Lösung": "Beginne mit klarem Schmerzpunkt, dann konkrete Lösung.",
-            "Story-basiert": "Verwende persönliche Geschichte als Einstieg.",
-            "FAQ-Format": "Strukturiere als Fragen und Antworten.",
-            "Liste": "Präsentiere als nummerierte Liste oder Aufzählung.",
-        }
-        user += f"\n\nVorlage: {template_choice}\n{template_instructions.get(template_choice, '')}"
+    user = apply_template(user, template_choice)
+    if structured:
+        user = f"{user}\n\n{STRUCTURED_HINT}"
+    
+    # Gleiches Briefing nochmal = Regenerierung (meist, weil das Ergebnis unbrauchbar war) –
+    # dann nicht die zuletzt gecachte Antwort zurückgeben
+    regenerate = False
+    if not extend:
+        if st.session_state.get("last_briefing") == user:
+            incr(f"format.{'json' if structured else 'text'}.regenerated")
+            regenerate = True
+        st.session_state.last_briefing = user
+    cached_ok = settings["use_cache"] and not regenerate
+    # Gecacht wird nur, was sich auch als Newsletter parsen lässt
+    valid = lambda r: is_complete(r, structured=structured)
     
     st.session_state.debug_prompt = f"SYSTEM:\n{system}\n\nUSER:\n{user}"
     
     with st.spinner("📝 Schreibe Newsletter..."):
         progress_bar = st.progress(0)
+        live = st.empty()
         
         try:
-            raw = call_openai(api_key, model_choice, system, user, temp_value)
+            started = time.perf_counter()
+            usage = {}  # Tokens genau dieser Aktion (bei Hedging zahlen beide Modelle)
+            if structured:
+                raw = call_openai(
+                    api_key, gen_model, system, user, temp_value, use_cache=cached_ok, base_url=base_url,
+                    route=action, response_format=STRUCTURED_RESPONSE_FORMAT, is_valid=valid, usage=usage,
+                )
+            elif settings["hedge_mode"]:
+                raw, winner = call_openai_hedged(
+                    api_key, gen_model, settings["fallback_model"], system, user, temp_value, settings["hedge_after_s"],
+                    use_cache=cached_ok, base_url=base_url, is_valid=valid, route=action, usage=usage,
+                )
+                if winner != gen_model:
+                    st.info(f"🛡️ {gen_model} war zu langsam – Ergebnis von {winner}.")
+            elif settings["stream_mode"]:
+                raw = render_stream(
+                    stream_openai(
+                        api_key, gen_model, system, user, temp_value, use_cache=cached_ok, base_url=base_url,
+                        route=action, is_valid=valid, usage=usage,
+                    ),
+                    live,
+                    progress_bar,
+                )
+                live.empty()
+            else:
+                raw = call_openai(
+                    api_key, gen_model, system, user, temp_value, use_cache=cached_ok, base_url=base_url, route=action, is_valid=valid, usage=usage,
+                )
+            st.session_state.last_timing = {
+                "ttft": st.session_state.last_timing.get("ttft") if settings["stream_mode"] and not settings["hedge_mode"] and not structured else None,
+                "total": time.perf_counter() - started,
+            }
+            sections = parse_output(raw, structured=structured)
+            if structured:
+                raw = sections_to_raw(sections)
             st.session_state.newsletter_raw = raw
             
-            sections = extract_sections(raw)
             st.session_state.preheader = sections["preheader"] or ""
             st.session_state.newsletter_body = sections["newsletter"] or ""
             st.session_state.cta_variants = sections["ctas"] or []
@@ -1123,6 +793,9 @@ def run_generation(extend=False):
                 "preheader": sections["preheader"] or "",
                 "body": sections["newsletter"] or "",
                 "ctas": sections["ctas"] or [],
+                "model": gen_model,
+                "briefing": {"topic": topic, "reader_state": reader_state, "tone": tone_label, "mode": mode, "template": template_choice},
+                **usage,
             }
             add_to_history(version_data)
             
@@ -1133,15 +806,443 @@ def run_generation(extend=False):
             # Version
             st.session_state.current_version += 1
             
+            if settings["prefetch_mode"] and st.session_state.newsletter_body:
+                start_prefetch(st.session_state.newsletter_body, settings)
+            
             progress_bar.progress(100)
             st.success(f"✅ Newsletter {'verlängert' if extend else 'generiert'}!")
+            return True
             
         except Exception as e:
             progress_bar.empty()
+            live.empty()
             st.error(f"❌ Fehler: {e}")
+            return False
+
+# Alle Widget-Werte, die Generierung und Editor brauchen – explizit weitergereicht, weil das
+# Editor-Fragment bei eigenen Reruns sonst die Modul-Globals des letzten App-Laufs lesen würde
+settings = {
+    "api_key": api_key,
+    "base_url": base_url,
+    "use_cache": use_cache,
+    "model_choice": model_choice,
+    "smart_routing": smart_routing,
+    "route_policy": route_policy,
+    "temp_value": temp_value,
+    "structured_mode": structured_mode,
+    "stream_mode": stream_mode,
+    "hedge_mode": hedge_mode,
+    "fallback_model": fallback_model if hedge_mode else None,
+    "hedge_after_s": hedge_after_s if hedge_mode else None,
+    "prefetch_mode": prefetch_mode,
+    "prefetch_count": prefetch_count,
+    "topic": topic,
+    "reader_state": reader_state,
+    "tone_label": tone_label,
+    "mode": mode,
+    "template_choice": template_choice,
+    "product_context": product_context,
+    "goal_kpi": goal_kpi,
+    "audience_level": audience_level,
+    "length_target": length_target,
+    "keywords": keywords,
+    "forbidden": forbidden,
+}
 
 if generate_btn:
-    run_generation()
+    run_generation(settings)
+
+# =========================
+# Editor (Fragment)
+# =========================
+# Läuft als eigenes Fragment: Tippen im Text, Betreff-/Preheader-/CTA-Änderungen und Export
+# führen nur diese Funktion erneut aus – Theme, Sidebar, Briefing und Debug-Panels bleiben unberührt.
+# Liest: st.session_state (newsletter_*, subject_selected, preheader, cta_variants) + die Parameter.
+# Aktionen, die Verlauf oder Version ändern (Rewrites, Kürzen), lösen weiterhin einen App-Rerun aus.
+@st.fragment
+def render_editor(settings: dict) -> None:
+    api_key, base_url, use_cache = settings["api_key"], settings["base_url"], settings["use_cache"]
+    topic, reader_state, tone_label, mode = settings["topic"], settings["reader_state"], settings["tone_label"], settings["mode"]
+    goal_kpi = settings["goal_kpi"]
+    fragment_started = time.perf_counter()
+    fragment_cpu = time.thread_time()
+    
+    sections = cached_sections(st.session_state.newsletter_raw)
+    subjects = sections["subjects"] or ([st.session_state.subject_selected] if st.session_state.subject_selected else [])
+    
+    # Subject Picker
+    st.markdown("#### ✉️ Betreff auswählen")
+    if subjects:
+        chosen = st.selectbox(
+            "Wähle einen Betreff",
+            options=subjects,
+            index=max(0, subjects.index(st.session_state.subject_selected)) if st.session_state.subject_selected in subjects else 0,
+            help="Ideale Länge: 45-55 Zeichen"
+        )
+        st.session_state.subject_selected = chosen
+        
+        # A/B Testing Buttons
+        if len(subjects) >= 2:
+            col_ab1, col_ab2 = st.columns(2)
+            with col_ab1:
+                st.button(f"🅰️ {subjects[0][:30]}...", 
+                        use_container_width=True,
+                        help="Als Variante A verwenden")
+            with col_ab2:
+                if len(subjects) > 1:
+                    st.button(f"🅱️ {subjects[1][:30]}...", 
+                            use_container_width=True,
+                            help="Als Variante B verwenden")
+    else:
+        st.warning("Keine Betreffzeilen gefunden")
+        st.session_state.subject_selected = st.text_input("Betreff eingeben")
+    
+    # Preheader
+    st.markdown("#### 📄 Preheader")
+    preheader_input = st.text_input(
+        "Preheader Text",
+        value=st.session_state.preheader,
+        help="Maximal 90 Zeichen, ergänzt den Betreff",
+        max_chars=90
+    )
+    st.session_state.preheader = preheader_input
+    
+    # CTA Variants
+    st.markdown("#### 🎯 CTA-Varianten")
+    if st.session_state.cta_variants:
+        st.markdown("".join([f'<span class="pill">{clamp_text(c, 60)}</span>' for c in st.session_state.cta_variants]), unsafe_allow_html=True)
+        
+        with st.expander("✏️ CTAs bearbeiten"):
+            for i, cta in enumerate(st.session_state.cta_variants):
+                new_cta = st.text_input(f"CTA {i+1}", value=cta, key=f"cta_{i}")
+                st.session_state.cta_variants[i] = new_cta
+            
+            col_cta1, col_cta2 = st.columns(2)
+            with col_cta1:
+                if st.button("➕ Neue CTA", use_container_width=True):
+                    st.session_state.cta_variants.append("Neue CTA...")
+                    st.rerun(scope="fragment")
+            with col_cta2:
+                if len(st.session_state.cta_variants) > 1:
+                    if st.button("🗑️ Letzte löschen", use_container_width=True):
+                        st.session_state.cta_variants.pop()
+                        st.rerun(scope="fragment")
+    else:
+        st.info("Noch keine CTAs vorhanden")
+    
+    # Body Editor
+    st.markdown("#### ✍️ Newsletter-Text")
+    
+    # Editor Tools
+    col_tools1, col_tools2, col_tools3 = st.columns(3)
+    with col_tools1:
+        if st.button("📏 Formatieren", use_container_width=True, help="Absätze bereinigen"):
+            text = st.session_state.newsletter_body
+            paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+            st.session_state.newsletter_body = '\n\n'.join(paragraphs)
+            st.rerun(scope="fragment")
+    
+    with col_tools2:
+        if st.button("📝 Wortzahl prüfen", use_container_width=True):
+            word_count = st.session_state.text_stats.update(st.session_state.newsletter_body).word_count
+            st.info(f"Aktuelle Wortzahl: {word_count} Wörter")
+    
+    with col_tools3:
+        if st.button("🔍 Vorschau aktualisieren", use_container_width=True):
+            st.rerun(scope="fragment")
+    
+    # Text Area
+    edited_body = st.text_area(
+        "Text bearbeiten (Markdown unterstützt)",
+        value=st.session_state.newsletter_body,
+        height=350,
+        help="Verwende **fett** für wichtige Stellen"
+    )
+    st.session_state.newsletter_body = edited_body
+    st.session_state.prefetcher.invalidate(edited_body)
+    
+    # Quality Metrics (nur geänderte Absätze werden neu gezählt)
+    text_stats = st.session_state.text_stats.update(st.session_state.newsletter_body)
+    word_count = text_stats.word_count
+    subject_len = len(st.session_state.subject_selected or "")
+    pre_len = len(st.session_state.preheader or "")
+    paragraphs = text_stats.paragraph_count
+    
+    st.markdown("#### 📊 Qualitätsanalyse")
+    
+    # Responsive Metrics Grid
+    col_metrics1, col_metrics2, col_metrics3, col_metrics4 = st.columns(4)
+    
+    with col_metrics1:
+        st.metric("📝 Wörter", word_count)
+    with col_metrics2:
+        status_color = "🟢" if subject_len <= 45 else "🟡" if subject_len <= 55 else "🔴"
+        st.metric("✉️ Betreff", f"{subject_len}/45", delta=status_color)
+    with col_metrics3:
+        status_color = "🟢" if pre_len <= 90 else "🔴"
+        st.metric("📄 Preheader", f"{pre_len}/90", delta=status_color)
+    with col_metrics4:
+        st.metric("📑 Absätze", paragraphs)
+    
+    # Wiederholungen gegenüber früheren Ausgaben (dedup.py)
+    duplicates, dedup_s = near_duplicates(st.session_state.subject_selected, st.session_state.newsletter_body)
+    duplicate_paragraphs = {item["position"] for item in duplicates if item["kind"] == "paragraph"}
+    if duplicates:
+        with st.expander(f"♻️ {len(duplicates)} Wiederholung(en) aus früheren Ausgaben"):
+            for item in duplicates:
+                best = item["matches"][0]
+                label = "Betreff" if item["kind"] == "subject" else f"¶{item['position'] + 1}"
+                when = datetime.fromtimestamp(best["created_at"]).strftime("%d.%m.%Y")
+                st.markdown(
+                    f"**{label}** ähnelt zu {best['score']:.0%} v{best['version']} vom {when}: "
+                    f"„{first_sentence(best['text'], 80)}“"
+                )
+            st.caption(f"Geprüft in {dedup_s * 1000:.0f} ms")
+    
+    # Length Warning & Extend Button
+    st.markdown("#### 🔧 Textlänge anpassen")
+    
+    if word_count < 250:
+        st.warning(f"⚠️ Text ist sehr kurz ({word_count} Wörter). Für Newsletter empfehlen sich 250+ Wörter.")
+        
+        col_extend1, col_extend2 = st.columns([2, 1])
+        with col_extend1:
+            if st.button("📈 Text verlängern", 
+                       type="primary", 
+                       use_container_width=True,
+                       help="Text um 30-50% verlängern mit mehr Tiefe"):
+                # Neue Version im Verlauf: Sidebar und Versions-Badge liegen außerhalb des Fragments
+                if api_key:
+                    if run_generation(settings, extend=True):
+                        st.rerun()
+                else:
+                    st.error("Bitte API Key eingeben")
+        with col_extend2:
+            if st.button("📉 Weitere kürzen", 
+                       use_container_width=True,
+                       help="Noch mehr kürzen"):
+                rewrite_kind = "Kürzer"
+                if api_key:
+                    system = build_system_prompt()
+                    user = rewrite_prompt(rewrite_kind, reader_state, tone_label, st.session_state.newsletter_body)
+                    st.session_state.debug_prompt = f"SYSTEM:\n{system}\n\nUSER:\n{user}"
+                    
+                    with st.spinner("Kürze Text..."):
+                        try:
+                            model, usage = routed_model(rewrite_kind, settings), {}
+                            raw = call_openai(
+                                api_key, model, system, user, 0.5, use_cache=use_cache, base_url=base_url,
+                                route=rewrite_kind, is_valid=lambda r: bool(extract_sections(r)["newsletter"]), usage=usage,
+                            )
+                            sections2 = extract_sections(raw)
+                            if sections2["newsletter"]:
+                                st.session_state.newsletter_body = sections2["newsletter"]
+                                archive_rewrite(rewrite_kind, settings, model, usage)
+                                st.rerun()
+                        except Exception as e:
+                            st.error(f"Fehler: {e}")
+    elif word_count > 900:
+        st.info(f"ℹ️ Text ist lang ({word_count} Wörter). Gut für ausführliche Newsletter.")
+    else:
+        st.success(f"✅ Textlänge ist gut ({word_count} Wörter).")
+        
+        col_length1, col_length2 = st.columns(2)
+        with col_length1:
+            if st.button("📈 Text erweitern", 
+                       use_container_width=True,
+                       help="Mehr Tiefe und Beispiele hinzufügen"):
+                # Neue Version im Verlauf: Sidebar und Versions-Badge liegen außerhalb des Fragments
+                if api_key:
+                    if run_generation(settings, extend=True):
+                        st.rerun()
+                else:
+                    st.error("Bitte API Key eingeben")
+        with col_length2:
+            if st.button("📉 Text kürzen", 
+                       use_container_width=True,
+                       help="Auf das Wesentliche reduzieren"):
+                rewrite_kind = "Kürzer"
+                if api_key:
+                    system = build_system_prompt()
+                    user = rewrite_prompt(rewrite_kind, reader_state, tone_label, st.session_state.newsletter_body)
+                    with st.spinner("Kürze Text..."):
+                        try:
+                            model, usage = routed_model(rewrite_kind, settings), {}
+                            raw = call_openai(
+                                api_key, model, system, user, 0.5, use_cache=use_cache, base_url=base_url,
+                                route=rewrite_kind, is_valid=lambda r: bool(extract_sections(r)["newsletter"]), usage=usage,
+                            )
+                            sections2 = extract_sections(raw)
+                            if sections2["newsletter"]:
+                                st.session_state.newsletter_body = sections2["newsletter"]
+                                archive_rewrite(rewrite_kind, settings, model, usage)
+                                st.rerun()
+                        except Exception as e:
+                            st.error(f"Fehler: {e}")
+    
+    # Preview
+    st.markdown("#### 👁️ Vorschau")
+    with st.container():
+        st.markdown('<div class="preview-box">', unsafe_allow_html=True)
+        
+        st.markdown(f"**✉️ Betreff:** {st.session_state.subject_selected}")
+        st.markdown(f"<span class='muted'><b>📄 Preheader:</b> {st.session_state.preheader}</span>", unsafe_allow_html=True)
+        
+        st.markdown("<hr style='border: 1px solid #444; margin: 1rem 0;'>", unsafe_allow_html=True)
+        
+        st.markdown(st.session_state.newsletter_body)
+        
+        if st.session_state.cta_variants:
+            st.markdown("<br>", unsafe_allow_html=True)
+            st.markdown("**🎯 Call-to-Action:**")
+            for cta in st.session_state.cta_variants[:3]:
+                st.markdown(f"• {cta}")
+        
+        st.markdown("</div>", unsafe_allow_html=True)
+    
+    # Rewrite Options
+    st.markdown("#### 🛠️ Text optimieren")
+    
+    # Button → rewrite_prompt()-Art (= Routing-Schlüssel)
+    rewrite_options = {
+        "📈 Verlängern": ("Verlängern", "Mehr Tiefe, Beispiele und Erklärungen"),
+        "📉 Kürzen": ("Kürzer", "Auf das Wesentliche reduzieren"),
+        "🎯 Direkter": ("Direkter", "Klare, direkte Sprache"),
+        "💖 Sanfter": ("Sanfter", "Mehr Empathie und Wärme"),
+        "📖 Story": ("Mehr Story", "Persönliche Geschichte einbauen"),
+        "💰 Conversion": ("Mehr Conversion", "Verkauf optimieren"),
+        "🤝 Empathie": ("Mehr Empathie", "Mehr Verständnis zeigen"),
+        "⚡ Actionable": ("Mehr Actionable", "Mehr praktische Schritte")
+    }
+    
+    # Absatz-Modus: nur ausgewählte Absätze + kompakter Kontext gehen an das Modell
+    body_paragraphs = split_paragraphs(st.session_state.newsletter_body)
+    selected_paragraphs = st.multiselect(
+        "✂️ Nur diese Absätze überarbeiten (leer = ganzer Newsletter)",
+        list(range(len(body_paragraphs))),
+        format_func=lambda i: f"{'♻️ ' if i in duplicate_paragraphs else ''}¶{i + 1}: {first_sentence(body_paragraphs[i], 60)}"
+    )
+    
+    # Responsive Button Grid
+    cols = st.columns(4)
+    rewrite_kind = None
+    
+    for i, (key, (kind, label)) in enumerate(rewrite_options.items()):
+        with cols[i % 4]:
+            if st.button(key, use_container_width=True, help=f"{label} • {routed_model(kind, settings)}"):
+                rewrite_kind = kind
+    
+    if settings["prefetch_mode"] and st.session_state.prefetcher.pending():
+        st.caption("🔮 Vorab: " + " • ".join(f"{k} ({v})" for k, v in st.session_state.prefetcher.pending().items()))
+    
+    if rewrite_kind:
+        if not api_key:
+            st.error("⚠️ Bitte API Key eingeben.")
+        else:
+            record_use(rewrite_kind)
+            system = build_system_prompt()
+            model, usage = routed_model(rewrite_kind, settings), {}
+            
+            if selected_paragraphs:
+                user = paragraph_rewrite_prompt(
+                    rewrite_kind, reader_state, tone_label, body_paragraphs, selected_paragraphs,
+                    st.session_state.subject_selected
+                )
+                st.session_state.debug_prompt = f"SYSTEM:\n{system}\n\nUSER:\n{user}"
+                with st.spinner(f"Optimiere {len(selected_paragraphs)} Absatz/Absätze: {rewrite_kind}..."):
+                    try:
+                        raw = call_openai(
+                            api_key, model, system, user, 0.6, use_cache=use_cache, base_url=base_url,
+                            route=rewrite_kind, is_valid=lambda r: bool(parse_paragraph_rewrite(r, selected_paragraphs)), usage=usage,
+                        )
+                        replacements = parse_paragraph_rewrite(raw, selected_paragraphs)
+                        if replacements:
+                            st.session_state.newsletter_body = merge_paragraphs(body_paragraphs, replacements)
+                            archive_rewrite(rewrite_kind, settings, model, usage)
+                            st.rerun()
+                        else:
+                            st.warning("⚠️ Antwort enthielt keine erkennbaren Absätze – Text bleibt unverändert.")
+                    except Exception as e:
+                        st.error(f"❌ Fehler: {e}")
+            else:
+                user = rewrite_prompt(rewrite_kind, reader_state, tone_label, st.session_state.newsletter_body)
+                
+                with st.spinner(f"Optimiere: {rewrite_kind}..."):
+                    try:
+                        # Bereits laufender Prefetch ist fast immer schneller als ein neuer Request
+                        budget = TIERS[settings["route_policy"].get(rewrite_kind, "quality")]["latency_budget_s"]
+                        prefetched = st.session_state.prefetcher.take(
+                            st.session_state.newsletter_body, rewrite_kind, prompt_key(model, system, user), wait_s=budget
+                        )
+                        if prefetched is not None:
+                            raw, usage = prefetched
+                        else:
+                            raw = call_openai(
+                                api_key, model, system, user, 0.6, use_cache=use_cache, base_url=base_url,
+                                route=rewrite_kind, is_valid=lambda r: bool(extract_sections(r)["newsletter"]), usage=usage,
+                            )
+                        st.session_state.newsletter_raw = raw
+                        sections2 = extract_sections(raw)
+                        if sections2["subjects"]:
+                            st.session_state.subject_selected = sections2["subjects"][0]
+                        if sections2["preheader"]:
+                            st.session_state.preheader = sections2["preheader"]
+                        if sections2["newsletter"]:
+                            st.session_state.newsletter_body = sections2["newsletter"]
+                        st.session_state.cta_variants = sections2["ctas"] or []
+                        archive_rewrite(rewrite_kind, settings, model, usage, raw=raw if is_complete(raw) else None)
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"❌ Fehler: {e}")
+    
+    # Export – erst beim Klick gebaut, pro Inhalt gecacht (exports.py)
+    st.markdown("#### 📦 Exportieren")
+    
+    export_doc = {
+        "subject": st.session_state.subject_selected,
+        "preheader": st.session_state.preheader,
+        "body": st.session_state.newsletter_body,
+        "ctas": list(st.session_state.cta_variants),
+        "word_count": word_count,
+        "version": st.session_state.current_version - 1,
+        "briefing": {
+            "topic": topic,
+            "reader_state": reader_state,
+            "tone": tone_label,
+            "mode": mode,
+            "kpi": goal_kpi
+        },
+    }
+    export_key = content_key(export_doc)
+    prepared = st.session_state.setdefault("prepared_exports", {})
+    
+    # Export Buttons Grid
+    export_cols = st.columns(len(EXPORT_FORMATS))
+    for col, (kind, fmt) in zip(export_cols, EXPORT_FORMATS.items()):
+        with col:
+            if prepared.get(kind) == export_key:
+                st.download_button(
+                    f"{fmt['label']} herunterladen",
+                    render_export(kind, export_doc, export_key),
+                    file_name=fmt["file_name"],
+                    mime=fmt["mime"],
+                    use_container_width=True,
+                    key=f"download_{kind}"
+                )
+            elif st.button(f"{fmt['label']} vorbereiten", use_container_width=True, key=f"prepare_{kind}"):
+                render_export(kind, export_doc, export_key)
+                prepared[kind] = export_key
+                st.rerun(scope="fragment")
+    
+    # Copy to Clipboard
+    if st.button("📋 In Zwischenablage kopieren", use_container_width=True):
+        export_text = render_export("txt", export_doc, export_key)
+        st.code(export_text[:300] + "..." if len(export_text) > 300 else export_text)
+        st.success("✅ Text bereit zum Kopieren (Strg+C)")
+    
+    st.caption(f"🔄 Version {st.session_state.current_version - 1} • 🔑 API: {st.session_state.api_source.upper()} • 🚀 Gestartet mit: `streamlit run generator.py`")
+    
+    record_rerun("fragment", time.perf_counter() - fragment_started, time.thread_time() - fragment_cpu)
 
 # =========================
 # Output / Editor - Responsive
@@ -1218,387 +1319,143 @@ Auch die kleinen Dinge zählen."""
             with st.expander("🔍 Debug-Prompt anzeigen"):
                 st.text_area("Prompt", st.session_state.debug_prompt, height=200, label_visibility="collapsed")
         
-        sections = extract_sections(st.session_state.newsletter_raw)
-        subjects = sections["subjects"] or ([st.session_state.subject_selected] if st.session_state.subject_selected else [])
-        
-        # Subject Picker
-        st.markdown("#### ✉️ Betreff auswählen")
-        if subjects:
-            chosen = st.selectbox(
-                "Wähle einen Betreff",
-                options=subjects,
-                index=max(0, subjects.index(st.session_state.subject_selected)) if st.session_state.subject_selected in subjects else 0,
-                help="Ideale Länge: 45-55 Zeichen"
-            )
-            st.session_state.subject_selected = chosen
-            
-            # A/B Testing Buttons
-            if len(subjects) >= 2:
-                col_ab1, col_ab2 = st.columns(2)
-                with col_ab1:
-                    st.button(f"🅰️ {subjects[0][:30]}...", 
-                            use_container_width=True,
-                            help="Als Variante A verwenden")
-                with col_ab2:
-                    if len(subjects) > 1:
-                        st.button(f"🅱️ {subjects[1][:30]}...", 
-                                use_container_width=True,
-                                help="Als Variante B verwenden")
-        else:
-            st.warning("Keine Betreffzeilen gefunden")
-            st.session_state.subject_selected = st.text_input("Betreff eingeben")
-        
-        # Preheader
-        st.markdown("#### 📄 Preheader")
-        preheader_input = st.text_input(
-            "Preheader Text",
-            value=st.session_state.preheader,
-            help="Maximal 90 Zeichen, ergänzt den Betreff",
-            max_chars=90
-        )
-        st.session_state.preheader = preheader_input
+        if st.session_state.last_timing.get("total") is not None:
+            timing = st.session_state.last_timing
+            ttft_txt = f"erstes Token nach {timing['ttft']:.2f} s • " if timing.get("ttft") is not None else ""
+            st.caption(f"⏱️ {ttft_txt}gesamt {timing['total']:.2f} s")
         
-        # CTA Variants
-        st.markdown("#### 🎯 CTA-Varianten")
-        if st.session_state.cta_variants:
-            st.markdown("".join([f'<span class="pill">{clamp_text(c, 60)}</span>' for c in st.session_state.cta_variants]), unsafe_allow_html=True)
-            
-            with st.expander("✏️ CTAs bearbeiten"):
-                for i, cta in enumerate(st.session_state.cta_variants):
-                    new_cta = st.text_input(f"CTA {i+1}", value=cta, key=f"cta_{i}")
-                    st.session_state.cta_variants[i] = new_cta
-                
-                col_cta1, col_cta2 = st.columns(2)
-                with col_cta1:
-                    if st.button("➕ Neue CTA", use_container_width=True):
-                        st.session_state.cta_variants.append("Neue CTA...")
-                        st.rerun()
-                with col_cta2:
-                    if len(st.session_state.cta_variants) > 1:
-                        if st.button("🗑️ Letzte löschen", use_container_width=True):
-                            st.session_state.cta_variants.pop()
-                            st.rerun()
-        else:
-            st.info("Noch keine CTAs vorhanden")
-        
-        # Body Editor
-        st.markdown("#### ✍️ Newsletter-Text")
-        
-        # Editor Tools
-        col_tools1, col_tools2, col_tools3 = st.columns(3)
-        with col_tools1:
-            if st.button("📏 Formatieren", use_container_width=True, help="Absätze bereinigen"):
-                text = st.session_state.newsletter_body
-                paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-                st.session_state.newsletter_body = '\n\n'.join(paragraphs)
-                st.rerun()
-        
-        with col_tools2:
-            if st.button("📝 Wortzahl prüfen", use_container_width=True):
-                word_count = count_words(st.session_state.newsletter_body)
-                st.info(f"Aktuelle Wortzahl: {word_count} Wörter")
-        
-        with col_tools3:
-            if st.button("🔍 Vorschau aktualisieren", use_container_width=True):
-                st.rerun()
-        
-        # Text Area
-        edited_body = st.text_area(
-            "Text bearbeiten (Markdown unterstützt)",
-            value=st.session_state.newsletter_body,
-            height=350,
-            help="Verwende **fett** für wichtige Stellen"
-        )
-        st.session_state.newsletter_body = edited_body
-        
-        # Quality Metrics
-        word_count = count_words(st.session_state.newsletter_body)
-        subject_len = len(st.session_state.subject_selected or "")
-        pre_len = len(st.session_state.preheader or "")
-        paragraphs = len([p for p in (st.session_state.newsletter_body or "").split("\n\n") if p.strip()])
-        avg_words = word_count / max(paragraphs, 1)
-        
-        st.markdown("#### 📊 Qualitätsanalyse")
-        
-        # Responsive Metrics Grid
-        col_metrics1, col_metrics2, col_metrics3, col_metrics4 = st.columns(4)
-        
-        with col_metrics1:
-            st.metric("📝 Wörter", word_count)
-        with col_metrics2:
-            status_color = "🟢" if subject_len <= 45 else "🟡" if subject_len <= 55 else "🔴"
-            st.metric("✉️ Betreff", f"{subject_len}/45", delta=status_color)
-        with col_metrics3:
-            status_color = "🟢" if pre_len <= 90 else "🔴"
-            st.metric("📄 Preheader", f"{pre_len}/90", delta=status_color)
-        with col_metrics4:
-            st.metric("📑 Absätze", paragraphs)
-        
-        # Length Warning & Extend Button
-        st.markdown("#### 🔧 Textlänge anpassen")
-        
-        if word_count < 250:
-            st.warning(f"⚠️ Text ist sehr kurz ({word_count} Wörter). Für Newsletter empfehlen sich 250+ Wörter.")
-            
-            col_extend1, col_extend2 = st.columns([2, 1])
-            with col_extend1:
-                if st.button("📈 Text verlängern", 
-                           type="primary", 
-                           use_container_width=True,
-                           help="Text um 30-50% verlängern mit mehr Tiefe"):
-                    if api_key:
-                        run_generation(extend=True)
-                    else:
-                        st.error("Bitte API Key eingeben")
-            with col_extend2:
-                if st.button("📉 Weitere kürzen", 
-                           use_container_width=True,
-                           help="Noch mehr kürzen"):
-                    rewrite_kind = "Kürzer"
-                    if api_key:
-                        system = build_system_prompt()
-                        user = rewrite_prompt(rewrite_kind, reader_state, tone_label, st.session_state.newsletter_body)
-                        st.session_state.debug_prompt = f"SYSTEM:\n{system}\n\nUSER:\n{user}"
-                        
-                        with st.spinner("Kürze Text..."):
-                            try:
-                                raw = call_openai(api_key, model_choice, system, user, 0.5)
-                                sections2 = extract_sections(raw)
-                                if sections2["newsletter"]:
-                                    st.session_state.newsletter_body = sections2["newsletter"]
-                                    st.session_state.current_version += 1
-                                    st.rerun()
-                            except Exception as e:
-                                st.error(f"Fehler: {e}")
-        elif word_count > 900:
-            st.info(f"ℹ️ Text ist lang ({word_count} Wörter). Gut für ausführliche Newsletter.")
-        else:
-            st.success(f"✅ Textlänge ist gut ({word_count} Wörter).")
-            
-            col_length1, col_length2 = st.columns(2)
-            with col_length1:
-                if st.button("📈 Text erweitern", 
-                           use_container_width=True,
-                           help="Mehr Tiefe und Beispiele hinzufügen"):
-                    if api_key:
-                        run_generation(extend=True)
-                    else:
-                        st.error("Bitte API Key eingeben")
-            with col_length2:
-                if st.button("📉 Text kürzen", 
-                           use_container_width=True,
-                           help="Auf das Wesentliche reduzieren"):
-                    rewrite_kind = "Kürzer"
-                    if api_key:
-                        system = build_system_prompt()
-                        user = rewrite_prompt(rewrite_kind, reader_state, tone_label, st.session_state.newsletter_body)
-                        with st.spinner("Kürze Text..."):
-                            try:
-                                raw = call_openai(api_key, model_choice, system, user, 0.5)
-                                sections2 = extract_sections(raw)
-                                if sections2["newsletter"]:
-                                    st.session_state.newsletter_body = sections2["newsletter"]
-                                    st.session_state.current_version += 1
-                                    st.rerun()
-                            except Exception as e:
-                                st.error(f"Fehler: {e}")
-        
-        # Preview
-        st.markdown("#### 👁️ Vorschau")
-        with st.container():
-            st.markdown('<div class="preview-box">', unsafe_allow_html=True)
-            
-            st.markdown(f"**✉️ Betreff:** {st.session_state.subject_selected}")
-            st.markdown(f"<span class='muted'><b>📄 Preheader:</b> {st.session_state.preheader}</span>", unsafe_allow_html=True)
-            
-            st.markdown("<hr style='border: 1px solid #444; margin: 1rem 0;'>", unsafe_allow_html=True)
-            
-            st.markdown(st.session_state.newsletter_body)
-            
-            if st.session_state.cta_variants:
-                st.markdown("<br>", unsafe_allow_html=True)
-                st.markdown("**🎯 Call-to-Action:**")
-                for cta in st.session_state.cta_variants[:3]:
-                    st.markdown(f"• {cta}")
-            
-            st.markdown("</div>", unsafe_allow_html=True)
-        
-        # Rewrite Options
-        st.markdown("#### 🛠️ Text optimieren")
-        
-        rewrite_options = {
-            "📈 Verlängern": "Mehr Tiefe, Beispiele und Erklärungen",
-            "📉 Kürzen": "Auf das Wesentliche reduzieren",
-            "🎯 Direkter": "Klare, direkte Sprache",
-            "💖 Sanfter": "Mehr Empathie und Wärme",
-            "📖 Story": "Persönliche Geschichte einbauen",
-            "💰 Conversion": "Verkauf optimieren",
-            "🤝 Empathie": "Mehr Verständnis zeigen",
-            "⚡ Actionable": "Mehr praktische Schritte"
-        }
-        
-        # Responsive Button Grid
-        cols = st.columns(4)
-        rewrite_kind = None
-        
-        for i, (key, label) in enumerate(rewrite_options.items()):
-            with cols[i % 4]:
-                if st.button(key, use_container_width=True, help=label):
-                    rewrite_kind = key.replace("📈 ", "").replace("📉 ", "").replace("🎯 ", "").replace("💖 ", "").replace("📖 ", "").replace("💰 ", "").replace("🤝 ", "").replace("⚡ ", "")
-        
-        if rewrite_kind:
-            if not api_key:
-                st.error("⚠️ Bitte API Key eingeben.")
-            else:
-                # Save to history
-                version_data = {
-                    "version": st.session_state.current_version,
-                    "timestamp": datetime.now().isoformat(),
-                    "action": f"Rewrite: {rewrite_kind}",
-                    "topic": topic,
-                    "raw": st.session_state.newsletter_raw,
-                    "subject": st.session_state.subject_selected,
-                    "preheader": st.session_state.preheader,
-                    "body": st.session_state.newsletter_body,
-                    "ctas": st.session_state.cta_variants,
-                }
-                add_to_history(version_data)
-                
-                system = build_system_prompt()
-                user = rewrite_prompt(rewrite_kind, reader_state, tone_label, st.session_state.newsletter_body)
-                
-                with st.spinner(f"Optimiere: {rewrite_kind}..."):
-                    try:
-                        raw = call_openai(api_key, model_choice, system, user, 0.6)
-                        st.session_state.newsletter_raw = raw
-                        sections2 = extract_sections(raw)
-                        if sections2["subjects"]:
-                            st.session_state.subject_selected = sections2["subjects"][0]
-                        if sections2["preheader"]:
-                            st.session_state.preheader = sections2["preheader"]
-                        if sections2["newsletter"]:
-                            st.session_state.newsletter_body = sections2["newsletter"]
-                        st.session_state.cta_variants = sections2["ctas"] or []
-                        st.session_state.current_version += 1
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"❌ Fehler: {e}")
-        
-        # Export
-        st.markdown("#### 📦 Exportieren")
-        
-        export_text = textwrap.dedent(
-            f"""
-            BETREFF: {st.session_state.subject_selected}
-            
-            PREHEADER: {st.session_state.preheader}
-            
-            ---
-            {st.session_state.newsletter_body}
+        if show_debug:
+            with st.expander("⏱️ Latenz"):
+                ttft_stats = latency_summary("ttft_s", mode="stream", cached=False)
+                total_stats = latency_summary("total_s", cached=False)
+                st.caption(
+                    f"Erstes Token: p50 {ttft_stats['p50']:.2f} s • p95 {ttft_stats['p95']:.2f} s ({ttft_stats['count']} Streams)"
+                )
+                st.caption(
+                    f"Gesamt: p50 {total_stats['p50']:.2f} s • p95 {total_stats['p95']:.2f} s ({total_stats['count']} Aufrufe)"
+                )
+                for action_name, tier in route_policy.items():
+                    route_stats = latency_summary("total_s", route=action_name, cached=False)
+                    if not route_stats["count"]:
+                        continue
+                    budget = TIERS[tier]["latency_budget_s"]
+                    flag = "✅" if route_stats["p95"] <= budget else "⚠️"
+                    st.caption(
+                        f"{flag} {action_name} → {TIERS[tier]['label']}: p50 {route_stats['p50']:.2f} s • "
+                        f"p95 {route_stats['p95']:.2f} s (Budget {budget:.0f} s, {route_stats['count']} Aufrufe)"
+                    )
+                hedge = counters()
+                if hedge.get("prefetch.started"):
+                    st.caption(
+                        f"Prefetch: {hedge.get('prefetch.hit', 0)} Treffer • {hedge.get('prefetch.miss', 0)} verfehlt • "
+                        f"{hedge.get('prefetch.discarded', 0)} verworfen ({hedge['prefetch.started']} gestartet, "
+                        f"{hedge.get('prefetch.skipped', 0)} ausgelassen)"
+                    )
+                for fmt, fmt_label in (("text", "Freitext"), ("json", "JSON")):
+                    calls = hedge.get(f"format.{fmt}.calls", 0)
+                    if calls:
+                        st.caption(
+                            f"{fmt_label}: {hedge.get(f'format.{fmt}.parse_failed', 0) / calls:.0%} Parse-Fehler • "
+                            f"{hedge.get(f'format.{fmt}.regenerated', 0) / calls:.0%} neu generiert ({calls} Antworten)"
+                        )
+                if hedge.get("singleflight.coalesced"):
+                    st.caption(
+                        f"Single-Flight: {hedge['singleflight.coalesced']} Anfragen an laufende Calls angehängt "
+                        f"({hedge.get('singleflight.leader', 0)} Upstream-Calls)"
+                    )
+                if hedge.get("hedge.requests"):
+                    fired = hedge.get("hedge.fired", 0)
+                    st.caption(
+                        f"Hedging: {fired}/{hedge['hedge.requests']} ausgelöst ({fired / hedge['hedge.requests']:.0%}) • "
+                        f"Fallback gewinnt {hedge.get('hedge.win.fallback', 0)}/{fired or 1} • "
+                        f"Hauptmodell gewinnt {hedge.get('hedge.win.primary', 0)}/{fired or 1}"
+                    )
+            
+            with st.expander("🔁 Reruns"):
+                for scope, scope_label in (("app", "Ganze App"), ("fragment", "Nur Editor-Fragment")):
+                    runs = [t for t in st.session_state.rerun_timings if t["scope"] == scope]
+                    if runs:
+                        st.caption(
+                            f"{scope_label}: p50 {percentile([t['wall_s'] for t in runs], 50) * 1000:.0f} ms • "
+                            f"CPU p50 {percentile([t['cpu_s'] for t in runs], 50) * 1000:.0f} ms ({len(runs)} Läufe)"
+                        )
+                first = next((t for t in st.session_state.rerun_timings if t["scope"] == "app"), None)
+                if first:
+                    st.caption(
+                        f"Erster Lauf der Sitzung: {first['wall_s'] * 1000:.0f} ms, davon Imports {first['imports_s'] * 1000:.0f} ms • "
+                        f"OpenAI-SDK geladen: {'ja' if 'openai' in sys.modules else 'nein (erst beim ersten LLM-Aufruf)'}"
+                    )
+            
+            with st.expander("🎨 Theme"):
+                sizes = theme.payload_bytes(st.session_state.dark_mode)
+                static = st.get_option("server.enableStaticServing")
+                sent = sizes["loader"] if static else sizes["inline"]
+                st.caption(
+                    f"Pro Rerun: {sent:,} Bytes ({'Loader' if static else 'Inline-Fallback'}) statt "
+                    f"{sizes['legacy']:,} Bytes Inline-CSS • Bundle {theme.publish() if static else '–'}"
+                )
+            
+            with st.expander("🧩 Prompt-Prefix-Cache"):
+                tokens = token_summary()
+                st.caption(
+                    f"Prefix-Fingerprint: `{prompt_prefix_fingerprint(build_system_prompt(), STATIC_USER_PREFIX)}` • "
+                    f"{tokens['cached_tokens']:,} von {tokens['prompt_tokens']:,} Prompt-Tokens aus dem Provider-Cache "
+                    f"({tokens['cached_share']:.0%}, {tokens['calls']} Aufrufe)"
+                )
+                for call in reversed(recent_calls(5)):
+                    if call.get("cached") or "prompt_tokens" not in call:
+                        continue
+                    st.caption(
+                        f"{call['model']} • {call['prompt_tokens']} Prompt / {call['cached_tokens']} gecacht / "
+                        f"{call['completion_tokens']} Output • {call['total_s']:.2f} s • Prefix {call.get('prefix', '–')}"
+                    )
+            
+            cache_stats = get_response_cache().stats()
+            with st.expander("🗄️ Antwort-Cache"):
+                col_cache1, col_cache2, col_cache3 = st.columns(3)
+                with col_cache1:
+                    st.metric("Treffer", cache_stats["hits"])
+                with col_cache2:
+                    st.metric("Fehlgriffe", cache_stats["misses"])
+                with col_cache3:
+                    st.metric("Trefferquote", f"{cache_stats['hit_rate']:.0%}")
+                st.caption(
+                    f"{cache_stats['entries']} Einträge • "
+                    f"{cache_stats['bytes'] / 1024:.1f} / {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB • "
+                    f"{cache_stats['evictions']} verdrängt"
+                )
+                if st.button("🧹 Cache leeren", use_container_width=True):
+                    get_response_cache().clear()
+                    st.rerun()
             
-            {'CTA_VARIANTEN:' + chr(10) + chr(10).join([f"- {c}" for c in st.session_state.cta_variants]) if st.session_state.cta_variants else ''}
+            with st.expander("🔌 Verbindungen"):
+                pools = client_stats()
+                if not pools:
+                    st.caption("Noch kein Client aufgebaut.")
+                for pool in pools:
+                    st.caption(
+                        f"Key …{pool['key_id'][-4:]}: {pool['requests']} Requests • "
+                        f"{pool['new_connections']} neue Verbindungen • "
+                        f"{pool['reuse_rate']:.0%} wiederverwendet"
+                    )
+                if pools and st.button("⏏️ Verbindungen schließen", use_container_width=True):
+                    shutdown_clients()
+                    st.rerun()
             
-            ---
-            Generiert mit Raus aus dem Gift Newsletter Engine
-            Datum: {datetime.now().strftime('%d.%m.%Y %H:%M')}
-            Version: {st.session_state.current_version - 1}
-            """
-        ).strip()
-        
-        # JSON Export
-        export_json = json.dumps({
-            "subject": st.session_state.subject_selected,
-            "preheader": st.session_state.preheader,
-            "body": st.session_state.newsletter_body,
-            "ctas": st.session_state.cta_variants,
-            "word_count": word_count,
-            "generated_at": datetime.now().isoformat(),
-            "version": st.session_state.current_version - 1,
-            "briefing": {
-                "topic": topic,
-                "reader_state": reader_state,
-                "tone": tone_label,
-                "mode": mode,
-                "kpi": goal_kpi
-            }
-        }, indent=2, ensure_ascii=False)
-        
-        # HTML Export
-        html_body = st.session_state.newsletter_body
-        html_body = html_body.replace('\n\n', '</p><p>').replace('\n', '<br>')
-        html_body = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', html_body)
-        
-        export_html = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{st.session_state.subject_selected}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ border-bottom: 2px solid #6A1B9A; padding-bottom: 10px; margin-bottom: 20px; }}
-        .preheader {{ color: #666; font-size: 14px; margin-bottom: 10px; }}
-        .content {{ margin-bottom: 30px; }}
-        .cta {{ background-color: #6A1B9A; color: white; padding: 15px; text-align: center; border-radius: 5px; margin: 20px 0; }}
-        .footer {{ font-size: 12px; color: #999; text-align: center; margin-top: 30px; border-top: 1px solid #eee; padding-top: 10px; }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>{st.session_state.subject_selected}</h1>
-        <div class="preheader">{st.session_state.preheader}</div>
-    </div>
-    <div class="content">
-        <p>{html_body}</p>
-    </div>
-    {f'<div class="cta">{st.session_state.cta_variants[0] if st.session_state.cta_variants else "Jetzt weiterlesen"}</div>' if st.session_state.cta_variants else ''}
-    <div class="footer">
-        Raus aus dem Gift Newsletter • {datetime.now().strftime('%d.%m.%Y')}
-    </div>
-</body>
-</html>"""
-        
-        # Export Buttons Grid
-        col_export1, col_export2, col_export3, col_export4 = st.columns(4)
+            with st.expander("🚦 Rate-Limit"):
+                limits = limiter_stats()
+                if not limits:
+                    st.caption("Noch keine Anfragen.")
+                for lim in limits:
+                    st.caption(
+                        f"Key …{lim['key_id'][-4:]}: {lim['requests_available']:.0f}/{lim['rpm_limit']:.0f} Requests • "
+                        f"{lim['tokens_available']:.0f}/{lim['tpm_limit']:.0f} Tokens frei • "
+                        f"{lim['waiting']} wartend • {lim['backoffs']} Backoffs • "
+                        f"{lim['total_wait_s']:.1f} s Wartezeit gesamt"
+                    )
+                st.caption(f"Retries: {counters().get('rate_limit.retries', 0)}")
         
-        with col_export1:
-            st.download_button(
-                "📄 TXT herunterladen",
-                export_text,
-                file_name="newsletter.txt",
-                use_container_width=True
-            )
-        
-        with col_export2:
-            st.download_button(
-                "📝 Markdown herunterladen",
-                export_text,
-                file_name="newsletter.md",
-                use_container_width=True
-            )
-        
-        with col_export3:
-            st.download_button(
-                "🌐 HTML herunterladen",
-                export_html,
-                file_name="newsletter.html",
-                use_container_width=True
-            )
-        
-        with col_export4:
-            st.download_button(
-                "🔧 JSON herunterladen",
-                export_json,
-                file_name="newsletter.json",
-                use_container_width=True
-            )
-        
-        # Copy to Clipboard
-        if st.button("📋 In Zwischenablage kopieren", use_container_width=True):
-            st.code(export_text[:300] + "..." if len(export_text) > 300 else export_text)
-            st.success("✅ Text bereit zum Kopieren (Strg+C)")
-        
-        st.caption(f"🔄 Version {st.session_state.current_version - 1} • 🔑 API: {st.session_state.api_source.upper()} • 🚀 Gestartet mit: `streamlit run generator.py`")
+        render_editor(settings)
 
 # =========================
 # Responsive Footer
@@ -1617,4 +1474,6 @@ with col_footer2:
         </div>
         """,
         unsafe_allow_html=True
-    )
\ No newline at end of file
+    )
+
+record_rerun("app", time.perf_counter() - script_started, time.thread_time() - script_cpu, imports_s)
@@ -0,0 +1,152 @@
+# history_store.py
+# Versionsverlauf mit Rückwärts-Deltas: neueste Version komplett, ältere als komprimierte Diffs
+#
+# Jede ältere Version speichert nur, wie sie aus ihrer Nachfolgerin entsteht (zeilenweiser Diff,
+# zlib-komprimiert). Die neueste Version liegt als einziger Vollstand vor und ist damit in O(1)
+# abrufbar; beim Kürzen fällt der älteste Eintrag einfach weg, ohne dass etwas neu berechnet wird.
+# Der Store liegt pro Sitzung vor dem Archiv (archive.py): eigene Versionen werden von hier
+# wiederhergestellt, ältere und fremde aus SQLite.
+
+import difflib
+import json
+import zlib
+from datetime import datetime
+
+FIELDS = ("raw", "subject", "preheader", "body", "ctas")
+
+
+def _size(value) -> int:
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return sum(len(v.encode("utf-8")) for v in value)
+
+
+def _diff(new: str, old: str) -> list:
+    """Ops, die aus new wieder old machen: [a, b] = Zeilen a..b aus new übernehmen, str = neuer Text."""
+    new_lines, old_lines = new.splitlines(keepends=True), old.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, new_lines, old_lines, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(old_lines[j1:j2]))
+    return ops
+
+
+def _patch(new: str, ops: list) -> str:
+    lines = new.splitlines(keepends=True)
+    return "".join("".join(lines[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+class Version:
+    """Metadaten einer Version; delta ist None für die neueste (Vollstand im Store)."""
+
+    __slots__ = ("version", "timestamp", "action", "topic", "delta", "plain_size", "entry_id")
+
+    def __init__(self, version: int, timestamp: str, action: str, topic: str, plain_size: int, entry_id: int | None = None):
+        self.version = version
+        self.entry_id = entry_id  # id im Archiv
+        self.timestamp = timestamp
+        self.action = action
+        self.topic = topic
+        self.delta: bytes | None = None
+        self.plain_size = plain_size
+
+
+class HistoryStore:
+    __slots__ = ("depth", "_records", "_latest")
+
+    def __init__(self, depth: int = 100):
+        self.depth = max(1, depth)
+        self._records: list[Version] = []  # älteste zuerst
+        self._latest: dict | None = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __bool__(self) -> bool:
+        return bool(self._records)
+
+    def push(self, version_data: dict) -> None:
+        """Nimmt einen Eintrag im Format von add_to_history() auf (version, timestamp, action, topic, entry_id + FIELDS)."""
+        doc = {f: version_data.get(f) or ("" if f != "ctas" else []) for f in FIELDS}
+        doc["ctas"] = list(doc["ctas"])
+        if self._latest is not None:
+            # Bisherige Spitze wird zum Delta gegenüber dem neuen Vollstand
+            self._records[-1].delta = self._encode(doc, self._latest)
+        self._records.append(Version(
+            version_data["version"],
+            version_data.get("timestamp") or datetime.now().isoformat(),
+            version_data.get("action", ""),
+            version_data.get("topic", ""),
+            sum(_size(doc[f]) for f in FIELDS),
+            version_data.get("entry_id"),
+        ))
+        self._latest = doc
+        if len(self._records) > self.depth:
+            del self._records[:len(self._records) - self.depth]
+
+    def latest(self) -> dict | None:
+        if not self._records:
+            return None
+        return self._entry(self._records[-1], self._latest)
+
+    def get(self, version: int) -> dict | None:
+        """Stellt eine Version wieder her, indem die Deltas von der neuesten rückwärts angewendet werden."""
+        return self._find(lambda record: record.version == version)
+
+    def get_entry(self, entry_id: int) -> dict | None:
+        """Wie get(), aber über die Archiv-id – eindeutig, auch wenn Versionsnummern sich wiederholen."""
+        return self._find(lambda record: record.entry_id == entry_id)
+
+    def _find(self, match) -> dict | None:
+        doc = self._latest
+        for record in reversed(self._records):
+            if record.delta is not None:
+                doc = self._decode(doc, record.delta)
+            if match(record):
+                return self._entry(record, doc)
+        return None
+
+    def versions(self, limit: int | None = None) -> list[Version]:
+        """Neueste zuerst – nur Metadaten, nichts wird entpackt."""
+        records = self._records[::-1]
+        return records[:limit] if limit is not None else records
+
+    def stats(self) -> dict:
+        stored = sum(len(r.delta) for r in self._records if r.delta is not None)
+        if self._latest is not None:
+            stored += sum(_size(self._latest[f]) for f in FIELDS)
+        return {
+            "versions": len(self._records),
+            "depth": self.depth,
+            "stored_bytes": stored,
+            "plain_bytes": sum(r.plain_size for r in self._records),
+        }
+
+    @staticmethod
+    def _entry(record: Version, doc: dict) -> dict:
+        return {
+            "version": record.version,
+            "timestamp": record.timestamp,
+            "action": record.action,
+            "topic": record.topic,
+            **{f: list(doc[f]) if f == "ctas" else doc[f] for f in FIELDS},
+        }
+
+    @staticmethod
+    def _encode(new: dict, old: dict) -> bytes:
+        delta = {}
+        for f in FIELDS:
+            if new[f] == old[f]:
+                continue
+            delta[f] = old[f] if f == "ctas" else _diff(new[f], old[f])
+        return zlib.compress(json.dumps(delta, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+    @staticmethod
+    def _decode(new: dict, delta: bytes) -> dict:
+        changes = json.loads(zlib.decompress(delta))
+        doc = dict(new)
+        for f, value in changes.items():
+            doc[f] = list(value) if f == "ctas" else _patch(new[f], value)
+        return doc
@@ -0,0 +1,117 @@
+# llm_clients.py
+# Prozessweite OpenAI/httpx-Clients mit Keep-Alive und Verbindungs-Metriken
+
+import atexit
+import hashlib
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import OpenAI
+
+MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "60"))
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+
+
+def key_id(api_key: str) -> str:
+    # Den Key selbst nie als Dict-Key oder in Metriken halten
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+class PooledClient:
+    def __init__(self, api_key: str, base_url: str | None = None):
+        self.key_id = key_id(api_key)
+        self.base_url = base_url
+        self.created_at = time.time()
+        self.requests = 0
+        self.new_connections = 0
+        self._seen_streams: dict[int, float] = {}
+        self._lock = threading.Lock()
+        # openai/httpx erst mit dem ersten Client laden – spart beim Kaltstart den größten Import-Block
+        import httpx
+        from openai import OpenAI
+
+        self.http_client = httpx.Client(
+            proxies=None,
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            event_hooks={"response": [self._on_response]},
+        )
+        # Retries übernimmt rate_limiter.limited_create (mit Header-Auswertung und Jitter)
+        # base_url=None → SDK-Default bzw. OPENAI_BASE_URL (z.B. mock_openai_server.py)
+        self.openai = OpenAI(api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0)
+
+    def _on_response(self, response: "httpx.Response") -> None:
+        # httpcore hängt den Netzwerk-Stream an; ein unbekannter Stream = neue TCP/TLS-Verbindung
+        stream = response.extensions.get("network_stream")
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            if stream is None:
+                return
+            expired = [sid for sid, seen in self._seen_streams.items() if now - seen > KEEPALIVE_EXPIRY * 2]
+            for sid in expired:
+                del self._seen_streams[sid]
+            if id(stream) not in self._seen_streams:
+                self.new_connections += 1
+            self._seen_streams[id(stream)] = now
+
+    def stats(self) -> dict:
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "key_id": self.key_id,
+                "base_url": self.base_url or "",
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused": reused,
+                "reuse_rate": (reused / self.requests) if self.requests else 0.0,
+                "age_s": time.time() - self.created_at,
+            }
+
+    def close(self) -> None:
+        self.http_client.close()
+
+
+_clients: dict[tuple[str, str], PooledClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_pooled_client(api_key: str, base_url: str | None = None) -> PooledClient:
+    registry_key = (key_id(api_key), base_url or "")
+    with _clients_lock:
+        pooled = _clients.get(registry_key)
+        if pooled is None:
+            pooled = PooledClient(api_key, base_url)
+            _clients[registry_key] = pooled
+        return pooled
+
+
+def get_openai_client(api_key: str, base_url: str | None = None) -> "OpenAI":
+    return get_pooled_client(api_key, base_url).openai
+
+
+def client_stats() -> list[dict]:
+    with _clients_lock:
+        clients = list(_clients.values())
+    return [c.stats() for c in clients]
+
+
+def shutdown_clients() -> None:
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for c in clients:
+        c.close()
+
+
+atexit.register(shutdown_clients)
@@ -0,0 +1,70 @@
+# llm_metrics.py
+# Prozessweite Latenz- und Zähler-Metriken für LLM-Aufrufe
+
+import threading
+import time
+from collections import Counter, deque
+
+MAX_RECORDS = 500
+
+_calls: deque = deque(maxlen=MAX_RECORDS)
+_counters: Counter = Counter()
+_lock = threading.Lock()
+
+
+def record_call(**fields) -> dict:
+    record = {"ts": time.time(), **fields}
+    with _lock:
+        _calls.append(record)
+    return record
+
+
+def recent_calls(limit: int = 20) -> list[dict]:
+    with _lock:
+        return list(_calls)[-limit:]
+
+
+def incr(name: str, by: int = 1) -> None:
+    with _lock:
+        _counters[name] += by
+
+
+def counters() -> dict:
+    with _lock:
+        return dict(_counters)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def latency_summary(field: str = "total_s", **match) -> dict:
+    with _lock:
+        values = [
+            c[field] for c in _calls
+            if c.get(field) is not None and all(c.get(k) == v for k, v in match.items())
+        ]
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def token_summary(**match) -> dict:
+    with _lock:
+        calls = [c for c in _calls if not c.get("cached") and all(c.get(k) == v for k, v in match.items())]
+    prompt = sum(c.get("prompt_tokens", 0) for c in calls)
+    cached = sum(c.get("cached_tokens", 0) for c in calls)
+    return {
+        "calls": len(calls),
+        "prompt_tokens": prompt,
+        "cached_tokens": cached,
+        "completion_tokens": sum(c.get("completion_tokens", 0) for c in calls),
+        "cached_share": (cached / prompt) if prompt else 0.0,
+    }
@@ -0,0 +1,88 @@
+# llm_tasks.py
+# Gemeinsamer Thread-Pool, um unabhängige LLM-Aufrufe parallel auszuführen
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable
+
+MAX_WORKERS = int(os.getenv("LLM_TASK_WORKERS", "8"))
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    # Ein Pool pro Prozess; Streamlit-Reruns und Sessions teilen ihn
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="llm")
+        return _executor
+
+
+@dataclass
+class TaskResult:
+    name: str
+    status: str = "pending"  # ok | error | timeout | cancelled
+    value: Any = None
+    error: BaseException | None = None
+    latency_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+def _timed(fn: Callable[[], Any]) -> tuple[Any, float]:
+    started = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - started
+
+
+def run_parallel(tasks: dict[str, Callable[[], Any]], timeout: float | dict[str, float] | None = None) -> dict[str, TaskResult]:
+    """Startet alle Tasks gleichzeitig; Fehler und Timeouts bleiben pro Task isoliert."""
+    executor = get_executor()
+    started = time.perf_counter()
+    futures: dict[str, Future] = {name: executor.submit(_timed, fn) for name, fn in tasks.items()}
+    results = {name: TaskResult(name=name) for name in tasks}
+
+    def limit_for(name: str) -> float | None:
+        if isinstance(timeout, dict):
+            return timeout.get(name)
+        return timeout
+
+    pending = set(futures)
+    while pending:
+        now = time.perf_counter() - started
+        deadlines = [limit_for(n) for n in pending if limit_for(n) is not None]
+        wait_for = max(0.0, min(deadlines) - now) if deadlines else None
+        wait([futures[n] for n in pending], timeout=wait_for, return_when="FIRST_COMPLETED")
+
+        for name in list(pending):
+            fut = futures[name]
+            res = results[name]
+            if fut.done():
+                pending.discard(name)
+                if fut.cancelled():
+                    res.status = "cancelled"
+                    continue
+                exc = fut.exception()
+                if exc is not None:
+                    res.status, res.error = "error", exc
+                    res.latency_s = time.perf_counter() - started
+                else:
+                    res.value, res.latency_s = fut.result()
+                    res.status = "ok"
+                continue
+            limit = limit_for(name)
+            if limit is not None and time.perf_counter() - started >= limit:
+                pending.discard(name)
+                # Noch nicht gestartete Tasks werden verworfen; laufende enden über ihren eigenen HTTP-Timeout
+                res.status = "cancelled" if fut.cancel() else "timeout"
+                res.error = TimeoutError(f"{name} nach {limit:g} s abgebrochen")
+                res.latency_s = time.perf_counter() - started
+
+    return results
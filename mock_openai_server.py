@@ -0,0 +1,326 @@
+# mock_openai_server.py
+# Lokaler OpenAI-kompatibler Stand-in für /v1/chat/completions (Offline-Last- und Latenztests)
+#
+#   python mock_openai_server.py --port 8787 --latency-ms 800 --tokens-per-s 60 --error-rate-429 0.05
+#   OPENAI_BASE_URL=http://127.0.0.1:8787/v1 OPENAI_API_KEY=mock streamlit run generator_v3.py
+#
+# Antworten kommen im BETREFF / PREHEADER / --- / NEWSLETTER / CTA_VARIANTEN-Format,
+# das extract_sections() erwartet – mit und ohne stream=True.
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUBJECTS = [
+    "Du bist nicht zu empfindlich",
+    "Warum dein Nein reicht",
+    "Das Schweigen danach",
+    "Heute zählt nur ein Schritt",
+    "Was dein Körper längst weiß",
+    "Kein Drama, nur Klarheit",
+    "Die leise Form von Mut",
+    "Du musst nichts erklären",
+    "Grenzen sind Fürsorge",
+    "Atemraum statt Rechtfertigung",
+    "Wenn Zweifel lauter werden",
+    "Dein Gefühl war richtig",
+]
+
+PARAGRAPHS = [
+    "Du kennst diesen Moment. Alles in dir sagt Nein, aber dein Mund sagt Ja.",
+    "**Das ist keine Schwäche.** Das ist ein Muster, das dich lange geschützt hat.",
+    "Dein Nervensystem hat gelernt, dass Anpassung Sicherheit bedeutet.",
+    "Heute darfst du etwas anderes ausprobieren. Nicht perfekt. Nur ehrlich.",
+    "**Trauma Bonding** fühlt sich an wie Liebe. Es ist aber Bindung an Unsicherheit.",
+    "Du musst niemandem beweisen, dass dein Schmerz echt ist.",
+    "Klarheit entsteht nicht im Kopf. Sie entsteht in kleinen Entscheidungen.",
+    "**Heutiger Schritt:** Schreib einen Satz auf, den du dir selbst schuldest.",
+    "Es geht nicht darum, die andere Person zu ändern. Es geht um deinen Raum.",
+    "Wenn Schuldgefühle kommen, heißt das nicht, dass du falsch liegst.",
+]
+
+CTAS = [
+    "Antworte mir mit einem Wort: Wie geht es dir heute?",
+    "**Hol dir den kostenlosen Grenzen-Guide**",
+    "Trag dich für das nächste Live-Q&A ein",
+    "Lies den Artikel zu Trauma Bonding im Blog",
+    "Buche dein kostenfreies Erstgespräch",
+]
+
+LENGTH_HINT = re.compile(r"Ziel:\s*(\d+)[–-](\d+)\s*Wörter")
+
+
+def canned_sections(prompt: str) -> dict:
+    # Deterministisch pro Prompt, damit Cache- und Coalescing-Tests reproduzierbar sind
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+    m = LENGTH_HINT.search(prompt)
+    target_words = int(m.group(1)) if m else 400
+    subjects = rng.sample(SUBJECTS, 10)
+    body = []
+    words = 0
+    while words < target_words:
+        p = rng.choice(PARAGRAPHS)
+        body.append(p)
+        words += len(p.split())
+    return {
+        "subjects": subjects,
+        "preheader": rng.choice(PARAGRAPHS).replace("**", "")[:90],
+        "newsletter": "\n\n".join(body),
+        "ctas": rng.sample(CTAS, rng.randint(3, 5)),
+    }
+
+
+def canned_newsletter(prompt: str) -> str:
+    if "ZU ÜBERARBEITEN:" in prompt:
+        # Absatz-Rewrite: nur die angefragten Marken beantworten
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        marks = re.findall(r"^\[\[A\d+\]\]$", prompt.split("ZU ÜBERARBEITEN:", 1)[1], re.MULTILINE)
+        return "\n\n".join(f"{mark}\n{rng.choice(PARAGRAPHS)}" for mark in marks)
+    sections = canned_sections(prompt)
+    return (
+        "BETREFF:\n"
+        + "\n".join(f"{i}. {s}" for i, s in enumerate(sections["subjects"], 1))
+        + "\n\nPREHEADER:\n"
+        + sections["preheader"]
+        + "\n\n---\nNEWSLETTER:\n"
+        + sections["newsletter"]
+        + "\n\nCTA_VARIANTEN:\n"
+        + "\n".join(f"{i}. {c}" for i, c in enumerate(sections["ctas"], 1))
+    )
+
+
+def tokenize(text: str) -> list[str]:
+    # Grob wie BPE: Wörter inkl. führendem Leerraum als "Token"
+    return re.findall(r"\s*\S+|\s+", text)
+
+
+class MockConfig:
+    def __init__(self, args: argparse.Namespace):
+        self.latency_ms = args.latency_ms
+        self.latency_jitter_ms = args.latency_jitter_ms
+        self.latency_dist = args.latency_dist
+        self.tokens_per_s = args.tokens_per_s
+        self.error_rate_429 = args.error_rate_429
+        self.error_rate_500 = args.error_rate_500
+        self.timeout_rate = args.timeout_rate
+        self.hang_s = args.hang_s
+        self.cached_prefix_ratio = args.cached_prefix_ratio
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def first_token_delay(self) -> float:
+        with self.lock:
+            mean = self.latency_ms / 1000
+            jitter = self.latency_jitter_ms / 1000
+            if self.latency_dist == "fixed":
+                value = mean
+            elif self.latency_dist == "uniform":
+                value = self.rng.uniform(max(0.0, mean - jitter), mean + jitter)
+            elif self.latency_dist == "lognormal":
+                # Schwerer Tail wie bei echten Modellen; mean/jitter beschreiben die Verteilung selbst
+                sigma = max(1e-6, (jitter / mean) if mean else 0.5)
+                value = self.rng.lognormvariate(0, sigma) * mean
+            else:
+                value = self.rng.gauss(mean, jitter)
+            return max(0.0, value)
+
+    def pick_fault(self) -> str | None:
+        with self.lock:
+            self.requests += 1
+            r = self.rng.random()
+        if r < self.error_rate_429:
+            return "429"
+        r -= self.error_rate_429
+        if r < self.error_rate_500:
+            return "500"
+        r -= self.error_rate_500
+        if r < self.timeout_rate:
+            return "timeout"
+        return None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "MockOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+    config: MockConfig
+
+    def log_message(self, fmt, *args):  # noqa: N802 - Signatur von BaseHTTPRequestHandler
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _rate_headers(self) -> dict:
+        return {
+            "x-ratelimit-limit-requests": "500",
+            "x-ratelimit-remaining-requests": "499",
+            "x-ratelimit-reset-requests": "120ms",
+            "x-ratelimit-limit-tokens": "30000",
+            "x-ratelimit-remaining-tokens": "28000",
+            "x-ratelimit-reset-tokens": "4s",
+        }
+
+    def do_GET(self):  # noqa: N802
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": m, "object": "model", "owned_by": "mock"}
+                for m in ("gpt-4o", "gpt-4o-mini", "gpt-4", "gpt-4-turbo", "gpt-3.5-turbo")
+            ]})
+            return
+        self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):  # noqa: N802
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "invalid JSON", "type": "invalid_request_error"}})
+            return
+
+        cfg = self.config
+        fault = cfg.pick_fault()
+        if fault == "429":
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+                            {**self._rate_headers(), "x-ratelimit-remaining-requests": "0", "retry-after-ms": "500"})
+            return
+        if fault == "500":
+            self._send_json(500, {"error": {"message": "Internal error (mock)", "type": "server_error"}})
+            return
+        if fault == "timeout":
+            time.sleep(cfg.hang_s)
+            self._send_json(504, {"error": {"message": "Gateway timeout (mock)", "type": "server_error"}})
+            return
+
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(m.get("content") or "") for m in messages)
+        text = self.server.responder(body, prompt)
+        tokens = tokenize(text)
+        prompt_tokens = max(1, len(prompt) // 4)
+        # Anteil des Prompts, den ein Provider-Prefix-Cache abdecken würde (in 128er-Blöcken ab 1024)
+        cached_tokens = 0
+        if prompt_tokens >= 1024 and cfg.cached_prefix_ratio > 0:
+            cached_tokens = int(prompt_tokens * cfg.cached_prefix_ratio) // 128 * 128
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        model = body.get("model") or "gpt-4o"
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        time.sleep(cfg.first_token_delay())
+
+        if body.get("stream"):
+            self._stream(completion_id, created, model, tokens, usage, body)
+            return
+
+        if cfg.tokens_per_s > 0:
+            time.sleep(len(tokens) / cfg.tokens_per_s)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }, self._rate_headers())
+
+    def _stream(self, completion_id: str, created: int, model: str, tokens: list[str], usage: dict, body: dict) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        for k, v in self._rate_headers().items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta: dict, finish: str | None = None, extra: dict | None = None) -> None:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if delta is not None else [],
+                **(extra or {}),
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        delay = 1 / self.config.tokens_per_s if self.config.tokens_per_s > 0 else 0
+        try:
+            event({"role": "assistant", "content": ""})
+            for tok in tokens:
+                event({"content": tok})
+                if delay:
+                    time.sleep(delay)
+            event({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                event(None, extra={"usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client hat abgebrochen (z.B. Hedging-Verlierer)
+            pass
+
+
+def make_server(args: argparse.Namespace) -> ThreadingHTTPServer:
+    handler = type("BoundMockHandler", (MockHandler,), {"config": MockConfig(args)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    server.verbose = args.verbose
+    server.responder = lambda body, prompt: (
+        json.dumps(canned_sections(prompt), ensure_ascii=False)
+        if (body.get("response_format") or {}).get("type") == "json_schema"
+        else canned_newsletter(prompt)
+    )
+    return server
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Lokaler Mock für die OpenAI Chat-Completions-API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=600, help="Mittlere Zeit bis zum ersten Token")
+    parser.add_argument("--latency-jitter-ms", type=float, default=200)
+    parser.add_argument("--latency-dist", choices=["fixed", "normal", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--tokens-per-s", type=float, default=80, help="Ausgabe-Rate; 0 = sofort")
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-500", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Anteil Anfragen, die --hang-s lang hängen")
+    parser.add_argument("--hang-s", type=float, default=120)
+    parser.add_argument("--cached-prefix-ratio", type=float, default=0.0, help="Simulierter Anteil gecachter Prompt-Tokens")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = make_server(args)
+    print(f"Mock-OpenAI läuft auf http://{args.host}:{args.port}/v1  (Strg+C zum Beenden)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
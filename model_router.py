@@ -0,0 +1,65 @@
+# model_router.py
+# Ordnet jeder Aktion (Generieren, Verlängern, Rewrite-Art) eine Modell-Stufe mit Latenz-/Kostenbudget zu
+
+import json
+import os
+
+# model=None → das in der Sidebar gewählte Modell; sonst höchstens so teuer wie das gewählte (siehe route())
+TIERS = {
+    "quality": {"model": None, "latency_budget_s": 45.0, "cost": "hoch", "label": "Qualität (gewähltes Modell)"},
+    "balanced": {"model": "gpt-4o", "latency_budget_s": 25.0, "cost": "mittel", "label": "Ausgewogen (max. gpt-4o)"},
+    "fast": {"model": "gpt-4o-mini", "latency_budget_s": 10.0, "cost": "niedrig", "label": "Schnell (gpt-4o-mini)"},
+}
+
+# Relative Kosten pro Token (aufsteigend); unbekannte Modelle werden nie ersetzt
+MODEL_COST_RANK = {
+    "gpt-4o-mini": 0,
+    "gpt-3.5-turbo": 1,
+    "gpt-4o": 2,
+    "gpt-4-turbo": 3,
+    "gpt-4": 4,
+}
+
+# Schlüssel = Aktion bzw. rewrite_prompt()-Art
+DEFAULT_POLICY = {
+    "generate": "quality",
+    "extend": "quality",
+    "Verlängern": "quality",
+    "Mehr Story": "quality",
+    "Mehr Conversion": "balanced",
+    "Kürzer": "fast",
+    "Direkter": "fast",
+    "Sanfter": "fast",
+    "Mehr Empathie": "fast",
+    "Mehr Actionable": "fast",
+}
+
+
+def load_policy(overrides: dict | None = None) -> dict:
+    """DEFAULT_POLICY, überschrieben durch MODEL_ROUTES (JSON oder Pfad zu JSON) und dann durch overrides."""
+    policy = dict(DEFAULT_POLICY)
+    env = (os.getenv("MODEL_ROUTES") or "").strip()
+    if env:
+        try:
+            if os.path.exists(env):
+                with open(env, encoding="utf-8") as f:
+                    data = json.load(f)
+            else:
+                data = json.loads(env)
+            policy.update({k: v for k, v in data.items() if v in TIERS})
+        except (OSError, ValueError):
+            pass
+    if overrides:
+        policy.update({k: v for k, v in overrides.items() if v in TIERS})
+    return policy
+
+
+def route(action: str, selected_model: str, policy: dict | None = None) -> tuple[str, str]:
+    policy = policy if policy is not None else load_policy()
+    tier = policy.get(action, "quality")
+    model = TIERS[tier]["model"] or selected_model
+    # Routing soll sparen, nie verteuern: ein Tier-Modell über der Sidebar-Wahl fällt auf diese zurück
+    if model not in MODEL_COST_RANK or MODEL_COST_RANK.get(selected_model, -1) < MODEL_COST_RANK[model]:
+        model = selected_model
+    return model, tier
+
@@ -0,0 +1,741 @@
+# newsletter_engine.py
+# Prompt-Bau, LLM-Aufruf und Parsing – ohne Streamlit, damit auch headless nutzbar
+
+import hashlib
+import json
+import queue
+import re
+import textwrap
+import threading
+import time
+from typing import Callable, Iterator
+
+from llm_cache import get_response_cache, make_cache_key
+from llm_clients import get_openai_client, key_id
+from llm_metrics import incr, record_call
+from llm_tasks import get_executor
+from rate_limiter import limited_create
+from section_parser import SectionParser
+import singleflight
+
+TONE_MAP = {1: "Sanft & Tröstend", 2: "Verständnisvoll", 3: "Ausgewogen", 4: "Direkt", 5: "Harter Klartext"}
+
+TEMPLATE_INSTRUCTIONS = {
+    "Schmerzpunkt → Lösung": "Beginne mit klarem Schmerzpunkt, dann konkrete Lösung.",
+    "Story-basiert": "Verwende persönliche Geschichte als Einstieg.",
+    "FAQ-Format": "Strukturiere als Fragen und Antworten.",
+    "Liste": "Präsentiere als nummerierte Liste oder Aufzählung.",
+}
+
+def clamp_text(s: str, max_len: int) -> str:
+    s = (s or "").strip()
+    if len(s) <= max_len:
+        return s
+    return s[: max_len - 1].rstrip() + "…"
+
+def count_words(s: str) -> int:
+    return len(re.findall(r"\b\w+\b", s or ""))
+
+def extract_sections(raw: str) -> dict:
+    return SectionParser.parse(raw)
+
+def extract_sections_regex(raw: str) -> dict:
+    # Ursprüngliche Regex-Kaskade; Referenz für die Äquivalenzprüfung in benchmarks.py parser
+    out = {
+        "subjects": [],
+        "preheader": "",
+        "newsletter": "",
+        "ctas": [],
+    }
+    if not raw:
+        return out
+
+    txt = raw.replace("\r\n", "\n").strip()
+
+    # Subjects
+    m = re.search(r"BETREFF:\s*(.*?)\n\s*PREHEADER:", txt, flags=re.S | re.I)
+    if m:
+        subj_block = m.group(1).strip()
+        subs = []
+        for line in subj_block.split("\n"):
+            line = re.sub(r"^\s*\d+\.\s*", "", line).strip()
+            if line:
+                subs.append(line)
+        out["subjects"] = subs[:15]
+    
+    if not out["subjects"]:
+        m = re.search(r"BETREFF:\s*(.*?)\n\s*\n", txt, flags=re.S | re.I)
+        if m:
+            subj_block = m.group(1).strip()
+            subs = []
+            for line in subj_block.split("\n"):
+                line = re.sub(r"^\s*\d+\.\s*", "", line).strip()
+                if line:
+                    subs.append(line)
+            out["subjects"] = subs[:15]
+
+    # Preheader
+    m = re.search(r"PREHEADER:\s*(.*?)\n\s*(---|NEWSLETTER:)", txt, flags=re.S | re.I)
+    if m:
+        out["preheader"] = m.group(1).strip()
+    elif "PREHEADER:" in txt:
+        parts = txt.split("PREHEADER:")
+        if len(parts) > 1:
+            pre_part = parts[1].split("\n")[0].strip()
+            out["preheader"] = pre_part
+
+    # Newsletter body
+    m = re.search(r"NEWSLETTER:\s*(.*?)(\n\s*CTA_VARIANTEN:|\Z)", txt, flags=re.S | re.I)
+    if m:
+        out["newsletter"] = m.group(1).strip()
+    elif "---" in txt:
+        parts = txt.split("---")
+        if len(parts) > 1:
+            out["newsletter"] = parts[1].strip()
+
+    # CTA variants
+    m = re.search(r"CTA_VARIANTEN:\s*(.*)$", txt, flags=re.S | re.I)
+    if m:
+        cta_block = m.group(1).strip()
+        ctas = []
+        for line in cta_block.split("\n"):
+            line = re.sub(r"^\s*\d+\.\s*", "", line).strip()
+            if line:
+                ctas.append(line)
+        out["ctas"] = ctas[:10]
+    elif "CTA_VARIANTEN:" in txt:
+        parts = txt.split("CTA_VARIANTEN:")
+        if len(parts) > 1:
+            cta_block = parts[1].strip()
+            ctas = []
+            for line in cta_block.split("\n"):
+                line = re.sub(r"^\s*\d+\.\s*", "", line).strip()
+                if line:
+                    ctas.append(line)
+            out["ctas"] = ctas[:10]
+
+    return out
+
+class StructuredOutputError(ValueError):
+    pass
+
+NEWSLETTER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "subjects": {"type": "array", "items": {"type": "string"}},
+        "preheader": {"type": "string"},
+        "newsletter": {"type": "string"},
+        "ctas": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["subjects", "preheader", "newsletter", "ctas"],
+    "additionalProperties": False,
+}
+
+STRUCTURED_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "newsletter", "strict": True, "schema": NEWSLETTER_SCHEMA},
+}
+
+# json_schema-Antworten gibt es erst ab gpt-4o-2024-08-06 (und gpt-4o-mini); ältere Modelle antworten mit 400
+JSON_SCHEMA_MIN_DATE = "2024-08-06"
+
+def supports_json_schema(model: str) -> bool:
+    if model in ("gpt-4o", "gpt-4o-mini") or model.startswith("gpt-4o-mini-"):
+        return True
+    m = re.fullmatch(r"gpt-4o-(\d{4}-\d{2}-\d{2})", model or "")
+    return bool(m) and m.group(1) >= JSON_SCHEMA_MIN_DATE
+
+# Wird ans Ende des User-Prompts gehängt, damit der statische Prefix cachebar bleibt
+STRUCTURED_HINT = (
+    "AUSGABEFORMAT: JSON statt Textblöcken – subjects (10 Betreffzeilen), preheader, "
+    "newsletter (Markdown, Absätze durch Leerzeilen getrennt), ctas (3–5 Varianten)."
+)
+
+def parse_structured(content: str) -> dict:
+    """Strikte Validierung einer JSON-Antwort; liefert dieselbe Form wie extract_sections()."""
+    try:
+        data = json.loads(content or "")
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Kein gültiges JSON: {e}") from e
+    if not isinstance(data, dict) or set(data) != set(NEWSLETTER_SCHEMA["required"]):
+        raise StructuredOutputError("JSON passt nicht zum Schema (Felder)")
+    if not all(isinstance(data[k], str) for k in ("preheader", "newsletter")):
+        raise StructuredOutputError("preheader/newsletter müssen Text sein")
+    if not all(isinstance(data[k], list) and all(isinstance(x, str) for x in data[k]) for k in ("subjects", "ctas")):
+        raise StructuredOutputError("subjects/ctas müssen Textlisten sein")
+    out = {
+        "subjects": [x.strip() for x in data["subjects"] if x.strip()][:15],
+        "preheader": data["preheader"].strip(),
+        "newsletter": data["newsletter"].strip(),
+        "ctas": [x.strip() for x in data["ctas"] if x.strip()][:10],
+    }
+    if not out["subjects"] or not out["newsletter"]:
+        raise StructuredOutputError("Betreffzeilen oder Newsletter-Text leer")
+    return out
+
+def sections_to_raw(sections: dict) -> str:
+    # Zurück ins Textformat, damit Verlauf, Export und extract_sections() unverändert funktionieren
+    return (
+        "BETREFF:\n"
+        + "\n".join(f"{i}. {s}" for i, s in enumerate(sections["subjects"], 1))
+        + f"\n\nPREHEADER:\n{sections['preheader']}\n\n---\nNEWSLETTER:\n{sections['newsletter']}"
+        + "\n\nCTA_VARIANTEN:\n"
+        + "\n".join(f"{i}. {c}" for i, c in enumerate(sections["ctas"], 1))
+    )
+
+def parse_output(raw: str, structured: bool = False) -> dict:
+    """Parst eine Antwort beider Modi und zählt Parse-Fehler pro Modus (format.<modus>.*)."""
+    mode = "json" if structured else "text"
+    incr(f"format.{mode}.calls")
+    if structured:
+        try:
+            return parse_structured(raw)
+        except StructuredOutputError:
+            incr(f"format.{mode}.parse_failed")
+            raise
+    sections = extract_sections(raw)
+    if not sections["subjects"] or not sections["newsletter"]:
+        incr(f"format.{mode}.parse_failed")
+    return sections
+
+def is_complete(raw: str, structured: bool = False) -> bool:
+    """Ob eine Antwort sich als vollständiger Newsletter parsen lässt – ohne die format.*-Zähler zu berühren."""
+    if structured:
+        try:
+            parse_structured(raw)
+        except StructuredOutputError:
+            return False
+        return True
+    sections = extract_sections(raw)
+    return bool(sections["subjects"] and sections["newsletter"])
+
+def build_system_prompt() -> str:
+    return textwrap.dedent(
+        """
+        Du bist ein Elite-Direct-Response-Copywriter für 'Raus aus dem Gift'.
+        Thema: toxische Beziehungen, Trennung, Heilung, Selbstwert, Grenzen.
+
+        Du schreibst nach einem FIXEN Framework, um konstant High-Performance-Newsletter zu liefern.
+
+        OUTPUT (streng einhalten):
+        BETREFF:
+        1. ...
+        2. ...
+        ...
+        10. ...
+
+        PREHEADER:
+        <1 Satz, max. 90 Zeichen>
+
+        ---
+        NEWSLETTER:
+        <Text in kurzen Absätzen>
+
+        CTA_VARIANTEN:
+        1. ...
+        2. ...
+        3. ...
+
+        REGELN:
+        - Du-Ansprache, kurze Sätze, kurze Absätze (max 2 Sätze).
+        - Keine Floskeln. Kein Coaching-Geschwurbel. Kein Over-Explaining.
+        - Baue visuelle Anker: **Fett** nur für:
+          (a) validierende Sätze, (b) Fachbegriffe, (c) konkrete Schritte, (d) CTA.
+        - Nutze psychologische Präzision, aber bleib alltagstauglich.
+        - Kein medizinischer oder rechtlicher Rat.
+        """
+    ).strip()
+
+# Unveränderliche Anweisungen stehen vor dem Briefing, damit System-Prompt + dieser Block
+# ein stabiles Prefix bilden, das der Provider-Prompt-Cache wiederverwenden kann.
+STATIC_USER_PREFIX = textwrap.dedent(
+    """
+    PSYCHOLOGISCHE ANFORDERUNG:
+    - Beginne mit einem Hook, der die exakte Innenwelt der Leserphase trifft.
+    - Dann Validierung (Schuld rausnehmen).
+    - Dann Reframe (neue Perspektive).
+    - Dann ein konkreter Schritt (heute machbar).
+    - Dann CTA (passend zur Leserphase).
+
+    WICHTIG:
+    - Betreffzeilen: max. 45 Zeichen, unterschiedlich, keine Duplikate.
+    - Preheader: max. 90 Zeichen, ergänzt Betreff (nicht wiederholen).
+    - CTA_VARIANTEN: 3–5 Varianten, unterschiedlich in Ton & Reibung.
+
+    Gib NUR das geforderte Output-Format zurück.
+    Setze das folgende BRIEFING um:
+    """
+).strip()
+
+REWRITE_STATIC_PREFIX = textwrap.dedent(
+    """
+    Du überarbeitest einen bestehenden Newsletter.
+    Behalte das Output-Format bei (BETREFF / PREHEADER / --- / NEWSLETTER / CTA_VARIANTEN).
+    """
+).strip()
+
+PARAGRAPH_STATIC_PREFIX = textwrap.dedent(
+    """
+    Du überarbeitest einzelne Absätze eines bestehenden Newsletters. Der Rest bleibt unverändert.
+    Gib für JEDEN markierten Absatz genau einen Block zurück, eingeleitet mit seiner Marke (z.B. [[A3]]) in einer eigenen Zeile.
+    Keine Betreffzeilen, keine CTAs, keine Erklärungen – nur die überarbeiteten Absätze.
+    Übergänge müssen zum KONTEXT passen.
+    """
+).strip()
+
+PARAGRAPH_MARKER = re.compile(r"^\s*\[\[A(\d+)\]\]\s*$", re.MULTILINE)
+
+def prompt_prefix_fingerprint(system: str, user: str) -> str:
+    prefixes = (STATIC_USER_PREFIX, REWRITE_STATIC_PREFIX, PARAGRAPH_STATIC_PREFIX)
+    prefix = next((p for p in prefixes if user.startswith(p)), "")
+    return hashlib.sha256(f"{system}\n{prefix}".encode("utf-8")).hexdigest()[:12]
+
+def usage_fields(usage) -> dict:
+    if usage is None:
+        return {}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+def estimated_usage(system: str, user: str, completion_chunks: int) -> dict:
+    # Abgebrochene Streams melden kein usage: ≈ 4 Zeichen pro Prompt-Token, ein Delta ≈ ein Token
+    return {"prompt_tokens": (len(system) + len(user)) // 4, "completion_tokens": completion_chunks}
+
+_usage_lock = threading.Lock()
+
+def add_usage(total: dict | None, fields: dict) -> None:
+    """Summiert prompt/completion-Tokens in total (den usage-Parameter der call_*-Funktionen); threadsicher."""
+    if total is None:
+        return
+    with _usage_lock:
+        for k in ("prompt_tokens", "completion_tokens"):
+            total[k] = total.get(k, 0) + fields.get(k, 0)
+
+def build_user_prompt(
+    reader_state: str,
+    topic: str,
+    tone_label: str,
+    mode: str,
+    product_context: str,
+    goal_kpi: str,
+    audience_level: str,
+    length_target: str,
+    keywords: str,
+    forbidden: str,
+    extend_text: bool = False,  # NEU: Parameter für Textverlängerung
+    current_text: str = ""      # NEU: Aktueller Text für Verlängerung
+) -> str:
+    extra_rules = []
+    if keywords.strip():
+        extra_rules.append(f"Nutze diese Keywords organisch: {keywords.strip()}")
+    if forbidden.strip():
+        extra_rules.append(f"Vermeide unbedingt diese Wörter/Phrasen: {forbidden.strip()}")
+
+    length_map = {
+        "Kurz (≈ 250–400 Wörter)": "Ziel: 250–400 Wörter.",
+        "Mittel (≈ 400–650 Wörter)": "Ziel: 400–650 Wörter.",
+        "Lang (≈ 650–900 Wörter)": "Ziel: 650–900 Wörter.",
+    }
+    kpi_map = {
+        "Öffnungsrate": "Optimiere maximal auf Öffnungen: Betreff neugierig, klar, ohne Clickbait.",
+        "Klickrate": "Optimiere auf Klicks: starker CTA, klare nächste Aktion, wenig Reibung.",
+        "Antworten/Engagement": "Optimiere auf Antworten: 1 starke Frage am Ende, emotionaler Trigger.",
+        "Verkäufe": "Optimiere auf Conversions: Schmerz → Lösung → proof → CTA, ohne Druck.",
+    }
+
+    mode_line = "MODUS: MEHRWERT." if mode == "Mehrwert (Tipp)" else "MODUS: VERKAUF."
+    if mode != "Mehrwert (Tipp)":
+        mode_line += f" Angebot-Details: {product_context.strip() or '(keine Details gegeben)'}"
+
+    # NEU: Verlängerungs-Prompt
+    if extend_text and current_text:
+        extend_instruction = f"""
+        AKTUELLER TEXT (verlängern/ergänzen):
+        {current_text[:800]}...
+        
+        ANWEISUNG FÜR VERLÄNGERUNG:
+        - Behalte den vorhandenen Inhalt, Stil und Ton bei
+        - Füge NEUE Inhalte hinzu, die den bestehenden Text ergänzen
+        - Vertiefe die bestehenden Punkte mit zusätzlichen Beispielen, Erklärungen oder Geschichten
+        - Füge 1-2 neue Absätze ein, die den Wert erhöhen
+        - Achte darauf, dass der Text natürlich weiterfließt
+        - Ziel: Text um etwa 30-50% verlängern
+        """
+        current_text_section = extend_instruction
+    else:
+        current_text_section = ""
+
+    extra_rules_section = ("ZUSATZREGELN:\n- " + "\n- ".join(extra_rules)) if extra_rules else ""
+
+    # Statischer Block zuerst (Prefix-Cache), variables Briefing danach
+    briefing = textwrap.dedent(
+        f"""
+        BRIEFING:
+        - Leserphase: {reader_state}
+        - Thema: {topic.strip() or 'Allgemein, aber fokussiert auf Heilung / Grenzen'}
+        - Ton: {tone_label}
+        - Ziel: {mode_line}
+        - Ziel-KPI: {goal_kpi} ({kpi_map.get(goal_kpi, '')})
+        - Audience-Level: {audience_level} (Einsteiger = simpel, Fortgeschritten = präziser)
+        - Länge: {length_map.get(length_target, '')}
+
+        {current_text_section}
+
+        {extra_rules_section}
+        """
+    ).strip()
+    return f"{STATIC_USER_PREFIX}\n\n{briefing}"
+
+def response_cache_key(model: str, system: str, user: str, temperature: float, base_url: str | None = None, structured: bool = False) -> str:
+    # Antworten anderer Endpoints (z.B. Mock-Server) nicht mit echten mischen
+    model_tag = f"{model}#json" if structured else model
+    return make_cache_key(f"{base_url}|{model_tag}" if base_url else model_tag, system, user, temperature)
+
+def call_openai(
+    api_key: str,
+    model: str,
+    system: str,
+    user: str,
+    temperature: float,
+    use_cache: bool = True,
+    base_url: str | None = None,
+    route: str | None = None,
+    response_format: dict | None = None,
+    is_valid: Callable[[str], bool] | None = None,
+    usage: dict | None = None,
+) -> str:
+    """is_valid entscheidet, ob die Antwort in den Cache darf – ungültige würden sonst beim Neugenerieren wiederkommen.
+
+    usage (falls übergeben) wird um die Tokens erhöht, die dieser Aufruf upstream verbraucht hat.
+    """
+    is_valid = is_valid or (lambda raw: bool(raw.strip()))
+    cache = get_response_cache()
+    cache_key = response_cache_key(model, system, user, temperature, base_url, structured=response_format is not None)
+    extra = {"response_format": response_format} if response_format else {}
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            record_call(model=model, mode="sync", route=route, cached=True, ttft_s=None, total_s=0.0)
+            return cached
+
+    started = time.perf_counter()
+
+    def upstream() -> str:
+        client = get_openai_client(api_key, base_url)
+        resp = limited_create(
+            client,
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            temperature=temperature,
+            **extra,
+        )
+        content = resp.choices[0].message.content or ""
+        fields = usage_fields(getattr(resp, "usage", None))
+        record_call(
+            model=model, mode="sync", route=route, cached=False, ttft_s=None, total_s=time.perf_counter() - started,
+            prefix=prompt_prefix_fingerprint(system, user), **fields,
+        )
+        add_usage(usage, fields)
+        # Auch bei "Cache umgehen" speichern, damit die frische Antwort künftig wiederverwendet wird
+        if is_valid(content):
+            cache.set(cache_key, model, content)
+        return content
+
+    # Identische Anfragen anderer Sessions, die gerade laufen, teilen sich einen Upstream-Call –
+    # nur mit demselben API-Key, sonst liefe die Anfrage auf fremdem Kontingent
+    content, shared = singleflight.do(f"{key_id(api_key)}|{cache_key}", upstream)
+    if shared:
+        record_call(model=model, mode="sync", route=route, cached=True, coalesced=True, ttft_s=None, total_s=time.perf_counter() - started)
+    return content
+
+def stream_openai(
+    api_key: str,
+    model: str,
+    system: str,
+    user: str,
+    temperature: float,
+    use_cache: bool = True,
+    base_url: str | None = None,
+    route: str | None = None,
+    is_valid: Callable[[str], bool] | None = None,
+    usage: dict | None = None,
+    coalesce: bool = True,
+    on_open: Callable[[object], None] | None = None,
+) -> Iterator[str]:
+    is_valid = is_valid or (lambda raw: bool(raw.strip()))
+    cache = get_response_cache()
+    cache_key = response_cache_key(model, system, user, temperature, base_url)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            record_call(model=model, mode="stream", route=route, cached=True, ttft_s=0.0, total_s=0.0)
+            yield cached
+            return
+
+    def upstream() -> Iterator[str]:
+        started = time.perf_counter()
+        ttft = None
+        parts = []
+        client = get_openai_client(api_key, base_url)
+        stream = limited_create(
+            client,
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        reported = None
+        try:
+            if on_open is not None:
+                on_open(stream)
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    reported = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if not delta:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                parts.append(delta)
+                yield delta
+        finally:
+            # Bei Abbruch (z.B. Hedging-Verlierer) die HTTP-Verbindung sofort freigeben – bezahlt wird trotzdem
+            stream.close()
+            fields = usage_fields(reported) or estimated_usage(system, user, len(parts))
+            record_call(
+                model=model, mode="stream", route=route, cached=False, ttft_s=ttft, total_s=time.perf_counter() - started,
+                prefix=prompt_prefix_fingerprint(system, user), estimated=reported is None, **fields,
+            )
+            add_usage(usage, fields)
+
+        content = "".join(parts)
+        if is_valid(content):
+            cache.set(cache_key, model, content)
+
+    if not coalesce:
+        yield from upstream()
+        return
+    # Identische Streams (gleicher Key, Prompt, Modell) teilen sich einen Upstream-Aufruf
+    started = time.perf_counter()
+    chunks, shared = singleflight.stream(f"{key_id(api_key)}|{cache_key}", upstream)
+    if not shared:
+        yield from chunks
+        return
+    ttft = None
+    for delta in chunks:
+        if ttft is None:
+            ttft = time.perf_counter() - started
+        yield delta
+    record_call(model=model, mode="stream", route=route, cached=True, coalesced=True, ttft_s=ttft, total_s=time.perf_counter() - started)
+
+def call_openai_hedged(
+    api_key: str,
+    model: str,
+    fallback_model: str,
+    system: str,
+    user: str,
+    temperature: float,
+    hedge_after_s: float,
+    use_cache: bool = True,
+    base_url: str | None = None,
+    is_valid: Callable[[str], bool] | None = None,
+    route: str | None = None,
+    usage: dict | None = None,
+) -> tuple[str, str]:
+    """Startet eine Kopie auf fallback_model, wenn model nach hedge_after_s noch kein Token geliefert hat.
+
+    Das erste vollständige und gültige Ergebnis gewinnt, der andere Stream wird abgebrochen.
+    Gibt (Text, Gewinner-Modell) zurück; usage enthält danach die Tokens beider Versuche.
+    """
+    is_valid = is_valid or (lambda raw: bool(raw.strip()))
+    if use_cache:
+        cached = get_response_cache().get(response_cache_key(model, system, user, temperature, base_url))
+        if cached is not None:
+            record_call(model=model, mode="hedged", route=route, cached=True, ttft_s=0.0, total_s=0.0)
+            return cached, model
+
+    incr("hedge.requests")
+    results: queue.Queue = queue.Queue()
+    cancel = threading.Event()
+    first_token = threading.Event()
+    primary_started = threading.Event()
+    primary_signal = threading.Event()  # erstes Token oder Ende des Primär-Versuchs
+    progress: dict[str, int] = {}  # Deltas je Versuch – für die Token-Schätzung noch laufender Verlierer
+    streams: dict[str, object] = {}  # offene Upstream-Streams, damit der Gewinner die Verlierer sofort schließen kann
+    streams_lock = threading.Lock()
+
+    def opened(name: str, stream) -> None:
+        with streams_lock:
+            streams[name] = stream
+            late = cancel.is_set()
+        if late:
+            stream.close()
+
+    def close_losers() -> None:
+        with streams_lock:
+            cancel.set()
+            losers = [stream for name, stream in streams.items() if name in running]
+        for stream in losers:
+            # Bricht auch einen Stream ab, der gerade auf das erste Token wartet
+            stream.close()
+
+    def attempt(name: str, attempt_model: str) -> None:
+        if name == "primary":
+            primary_started.set()
+        parts, spent = [], {}
+        content, error = None, None
+        gen = stream_openai(
+            api_key, attempt_model, system, user, temperature, use_cache=False, base_url=base_url, route=route,
+            is_valid=is_valid, usage=spent, coalesce=False, on_open=lambda stream: opened(name, stream),
+        )
+        try:
+            for delta in gen:
+                if name == "primary":
+                    first_token.set()
+                    primary_signal.set()
+                if cancel.is_set():
+                    break
+                parts.append(delta)
+                progress[name] = len(parts)
+            else:
+                content = "".join(parts)
+        except Exception as e:
+            error = e
+        finally:
+            # Erst schließen, dann melden: so ist spent beim Empfänger vollständig
+            gen.close()
+            if name == "primary":
+                primary_signal.set()
+            results.put((name, attempt_model, content, error, spent))
+
+    executor = get_executor()
+    executor.submit(attempt, "primary", model)
+    running = {"primary"}
+    hedged = False
+    # Die Schwelle zählt ab dem Start des Versuchs, nicht ab dem Einreihen in den (geteilten) Pool –
+    # ist der Pool aber voll, höchstens eine weitere Schwelle lang auf einen freien Thread warten
+    if primary_started.wait(hedge_after_s):
+        primary_signal.wait(hedge_after_s)
+    # Auch ein schnell gescheiterter Primär-Versuch ohne Token löst den Fallback aus
+    if not first_token.is_set() and fallback_model and fallback_model != model:
+        hedged = True
+        incr("hedge.fired")
+        executor.submit(attempt, "fallback", fallback_model)
+        running.add("fallback")
+
+    best_effort, last_error = None, None
+    while running:
+        name, attempt_model, content, error, spent = results.get()
+        running.discard(name)
+        add_usage(usage, spent)
+        if error is not None:
+            last_error = error
+            continue
+        if content is not None and is_valid(content):
+            close_losers()
+            # Der abgebrochene Verlierer wird bezahlt, meldet aber kein usage mehr – hier schätzen
+            for other in running:
+                add_usage(usage, estimated_usage(system, user, progress.get(other, 0)))
+            if hedged:
+                incr(f"hedge.win.{name}")
+            return content, attempt_model
+        if content:
+            best_effort = (content, attempt_model)
+
+    # Kein gültiges Ergebnis: lieber unvollständigen Text zeigen als nichts
+    if best_effort is not None:
+        return best_effort
+    raise last_error or RuntimeError("Keine Antwort erhalten")
+
+REWRITE_VARIANTS = {
+    "Kürzer": "Kürze radikal. Entferne Wiederholungen. Mehr Punch. Gleiches Framework beibehalten.",
+    "Verlängern": "Füge mehr Tiefe, Beispiele und Erklärungen hinzu. Vertiefe die bestehenden Punkte mit zusätzlichen Insights.",
+    "Direkter": "Weniger weich. Mehr Klartext. Härtere Sätze. Kein Drama. Mehr Führung.",
+    "Sanfter": "Mehr Wärme, mehr Sicherheit. Gleiche Klarheit, aber beruhigender Ton.",
+    "Mehr Story": "Baue eine kurze Mini-Story am Anfang ein (3–6 Sätze) statt abstraktem Einstieg.",
+    "Mehr Conversion": "Stärkerer Benefit-Stack, mehr Proof/Logik, CTA klarer, aber ohne Druck.",
+    "Mehr Empathie": "Betone mehr Verständnis und Validierung. Zeige, dass du die Leserin wirklich verstehst.",
+    "Mehr Actionable": "Fokussiere auf konkrete, umsetzbare Schritte. Weniger Theorie, mehr Praxis.",
+}
+
+def rewrite_prompt(kind: str, reader_state: str, tone_label: str, current_text: str = "") -> str:
+    instr = REWRITE_VARIANTS.get(kind, "Überarbeite den Text sinnvoll.")
+    if kind == "Verlängern":
+        instr += " Verlängere den Text um etwa 30-50%."
+    
+    details = textwrap.dedent(
+        f"""
+        Leserphase: {reader_state}
+        Ton: {tone_label}
+
+        ANWEISUNG:
+        {instr}
+        """
+    ).strip()
+    # Jede Art braucht den vollständigen Text; erst nach dedent anhängen, sonst bleibt die Einrückung stehen
+    if current_text:
+        details += f"\n\nAKTUELLER TEXT:\n{current_text}"
+    return f"{REWRITE_STATIC_PREFIX}\n\n{details}"
+
+def split_paragraphs(body: str) -> list[str]:
+    return [p.strip() for p in re.split(r"\n\s*\n", body or "") if p.strip()]
+
+def first_sentence(text: str, max_len: int = 90) -> str:
+    m = re.match(r"(.+?[.!?…])(\s|$)", text.replace("\n", " "))
+    return clamp_text(m.group(1) if m else text.replace("\n", " "), max_len)
+
+def paragraph_context(paragraphs: list[str], selected: list[int], subject: str = "") -> str:
+    """Kompakter Kontext: Nachbarn der Auswahl vollständig, alle anderen Absätze nur als erster Satz."""
+    neighbours = {i + d for i in selected for d in (-1, 1)} - set(selected)
+    lines = [f"Betreff: {subject}"] if subject else []
+    for i, para in enumerate(paragraphs):
+        if i in selected:
+            lines.append(f"[[A{i + 1}]] (wird überarbeitet)")
+        elif i in neighbours:
+            lines.append(f"¶{i + 1}: {para}")
+        else:
+            lines.append(f"¶{i + 1}: {first_sentence(para)}")
+    return "\n".join(lines)
+
+def paragraph_rewrite_prompt(kind: str, reader_state: str, tone_label: str, paragraphs: list[str], selected: list[int], subject: str = "") -> str:
+    instr = REWRITE_VARIANTS.get(kind, "Überarbeite den Text sinnvoll.")
+    blocks = "\n\n".join(f"[[A{i + 1}]]\n{paragraphs[i]}" for i in sorted(selected))
+    details = (
+        f"Leserphase: {reader_state}\nTon: {tone_label}\n\n"
+        f"ANWEISUNG:\n{instr}\n\n"
+        f"KONTEXT:\n{paragraph_context(paragraphs, selected, subject)}\n\n"
+        f"ZU ÜBERARBEITEN:\n{blocks}"
+    )
+    return f"{PARAGRAPH_STATIC_PREFIX}\n\n{details}"
+
+def parse_paragraph_rewrite(raw: str, selected: list[int]) -> dict[int, str]:
+    """Ordnet die Blöcke der Antwort den ausgewählten Absatz-Indizes zu; unbekannte Marken werden ignoriert."""
+    markers = list(PARAGRAPH_MARKER.finditer(raw or ""))
+    result = {}
+    for n, m in enumerate(markers):
+        idx = int(m.group(1)) - 1
+        end = markers[n + 1].start() if n + 1 < len(markers) else len(raw)
+        text = raw[m.end():end].strip()
+        if idx in selected and text:
+            result[idx] = text
+    return result
+
+def merge_paragraphs(paragraphs: list[str], replacements: dict[int, str]) -> str:
+    return "\n\n".join(replacements.get(i, para) for i, para in enumerate(paragraphs))
+
+def apply_template(user: str, template_choice: str) -> str:
+    if template_choice == "Standard":
+        return user
+    return user + f"\n\nVorlage: {template_choice}\n{TEMPLATE_INSTRUCTIONS.get(template_choice, '')}"
@@ -1,7 +1,16 @@
+import os
 import streamlit as st
-import openai
 from datetime import datetime
 import json
+import time
+
+from llm_clients import get_openai_client
+from llm_tasks import run_parallel
+from rate_limiter import limited_create
+
+# Eigene Timeouts pro Aufruf (Sekunden)
+NEWSLETTER_TIMEOUT = 90
+HEADER_TIMEOUT = 60
 
 # Page Config
 st.set_page_config(
@@ -66,10 +75,16 @@ st.markdown("""
 try:
     api_key = st.secrets["OPENAI_API_KEY"]
     api_key_loaded = True
-except Exception as e:
+except Exception:
     api_key = None
     api_key_loaded = False
 
+# Optionaler alternativer Endpoint, z.B. http://127.0.0.1:8787/v1 für mock_openai_server.py
+try:
+    base_url = st.secrets.get("OPENAI_BASE_URL") or os.getenv("OPENAI_BASE_URL") or None
+except Exception:
+    base_url = os.getenv("OPENAI_BASE_URL") or None
+
 # Header
 st.markdown("# 💜 Newsletter Generator")
 st.markdown("### *Raus aus dem Gift* - Deine Stimme für Heilung und Empowerment")
@@ -257,8 +272,8 @@ st.markdown("---")
 if st.button("✨ Newsletter generieren", use_container_width=True):
     with st.spinner("💜 Dein Newsletter wird erstellt... Dies kann einen Moment dauern."):
         try:
-            # OpenAI Client initialisieren
-            client = openai.OpenAI(api_key=api_key)
+            # OpenAI Client (prozessweit geteilt)
+            client = get_openai_client(api_key, base_url)
             
             # Prompt für Newsletter-Erstellung
             newsletter_prompt = f"""
@@ -289,18 +304,6 @@ Strukturiere den Newsletter mit:
 Schreibe auf Deutsch, authentisch und mit Herz.
 """
 
-            # Newsletter generieren
-            newsletter_response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "Du bist eine einfühlsame Content-Spezialistin für Trauma-Heilung und Empowerment von Frauen nach narzisstischem Missbrauch."},
-                    {"role": "user", "content": newsletter_prompt}
-                ],
-                temperature=0.7
-            )
-            
-            newsletter_content = newsletter_response.choices[0].message.content
-            
             # Prompt für Header und Pre-Header
             header_prompt = f"""
 Erstelle 5 virale, aufmerksamkeitsstarke Header-Varianten und passende Pre-Header für folgenden Newsletter:
@@ -328,31 +331,71 @@ Pre-Header 1: [Text]
 [Wiederhole für 2-5]
 """
 
-            header_response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Du bist eine Expertin für E-Mail-Marketing im Bereich Trauma-Heilung und Empowerment."},
-                    {"role": "user", "content": header_prompt}
-                ],
-                temperature=0.8
+            def generate_newsletter():
+                response = limited_create(
+                    client.with_options(timeout=NEWSLETTER_TIMEOUT),
+                    deadline=time.monotonic() + NEWSLETTER_TIMEOUT,
+                    model="gpt-4o",
+                    messages=[
+                        {"role": "system", "content": "Du bist eine einfühlsame Content-Spezialistin für Trauma-Heilung und Empowerment von Frauen nach narzisstischem Missbrauch."},
+                        {"role": "user", "content": newsletter_prompt}
+                    ],
+                    temperature=0.7
+                )
+                return response.choices[0].message.content
+
+            def generate_headers():
+                response = limited_create(
+                    client.with_options(timeout=HEADER_TIMEOUT),
+                    deadline=time.monotonic() + HEADER_TIMEOUT,
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": "Du bist eine Expertin für E-Mail-Marketing im Bereich Trauma-Heilung und Empowerment."},
+                        {"role": "user", "content": header_prompt}
+                    ],
+                    temperature=0.8
+                )
+                return response.choices[0].message.content
+
+            # Newsletter (gpt-4o) und Header (gpt-4) laufen unabhängig voneinander parallel
+            results = run_parallel(
+                {"newsletter": generate_newsletter, "headers": generate_headers},
+                timeout={"newsletter": NEWSLETTER_TIMEOUT + 5, "headers": HEADER_TIMEOUT + 5},
             )
-            
-            headers_content = header_response.choices[0].message.content
+            newsletter_result = results["newsletter"]
+            header_result = results["headers"]
+            newsletter_content = newsletter_result.value or ""
+            headers_content = header_result.value or ""
             
             # Ergebnisse anzeigen
-            st.success("✅ Newsletter erfolgreich erstellt!")
+            if newsletter_result.ok and header_result.ok:
+                st.success("✅ Newsletter erfolgreich erstellt!")
+            elif newsletter_result.ok or header_result.ok:
+                st.warning("⚠️ Teilweise erstellt – ein Schritt ist fehlgeschlagen (siehe unten).")
+            
+            st.caption(
+                f"⏱️ Newsletter (gpt-4o): {newsletter_result.latency_s:.1f} s • "
+                f"Header (gpt-4): {header_result.latency_s:.1f} s • "
+                f"Gesamt: {max(newsletter_result.latency_s, header_result.latency_s):.1f} s"
+            )
             
             # Header Optionen
             st.markdown("## 📬 Header & Pre-Header Vorschläge")
-            st.markdown('<div class="header-option">', unsafe_allow_html=True)
-            st.markdown(headers_content)
-            st.markdown('</div>', unsafe_allow_html=True)
+            if header_result.ok:
+                st.markdown('<div class="header-option">', unsafe_allow_html=True)
+                st.markdown(headers_content)
+                st.markdown('</div>', unsafe_allow_html=True)
+            else:
+                st.error(f"❌ Header konnten nicht erstellt werden: {header_result.error}")
             
             # Newsletter Content
             st.markdown("## ✍️ Newsletter-Inhalt")
-            st.markdown('<div class="success-box">', unsafe_allow_html=True)
-            st.markdown(newsletter_content)
-            st.markdown('</div>', unsafe_allow_html=True)
+            if newsletter_result.ok:
+                st.markdown('<div class="success-box">', unsafe_allow_html=True)
+                st.markdown(newsletter_content)
+                st.markdown('</div>', unsafe_allow_html=True)
+            else:
+                st.error(f"❌ Newsletter konnte nicht erstellt werden: {newsletter_result.error}")
             
             # Download Optionen
             st.markdown("---")
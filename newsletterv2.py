@@ -4,13 +4,20 @@
 
 import os
 import json
+import time
 from datetime import datetime
-from typing import List, Dict
+from typing import TYPE_CHECKING
 
 import streamlit as st
-import httpx
-from openai import OpenAI
-from openai import APIError, RateLimitError, AuthenticationError, BadRequestError
+
+from llm_cache import make_cache_key
+from llm_clients import get_openai_client, key_id
+from llm_tasks import run_parallel
+from rate_limiter import RateLimitQueueTimeout, limited_create
+import singleflight
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -54,18 +61,29 @@ def get_api_key() -> str:
     return (os.getenv("OPENAI_API_KEY") or "").strip()
 
 
-def get_client() -> OpenAI:
+def get_base_url() -> str | None:
+    # Optional, z.B. http://127.0.0.1:8787/v1 für mock_openai_server.py
+    return (os.getenv("OPENAI_BASE_URL") or "").strip() or None
+
+
+def get_client() -> "OpenAI":
     api_key = get_api_key()
     if not api_key:
+        from openai import AuthenticationError
         raise AuthenticationError("OPENAI_API_KEY fehlt.")
 
-    http_client = httpx.Client(proxies=None, timeout=60.0)
-    return OpenAI(api_key=api_key, http_client=http_client)
+    # Geteilter Client pro Key: Keep-Alive statt neuer TCP/TLS-Verbindung pro Klick
+    return get_openai_client(api_key, get_base_url())
 
 
 def friendly_error(e: Exception) -> str:
+    # SDK erst hier laden: bis zum ersten Fehler/Aufruf muss die Seite ohne openai auskommen
+    from openai import APIError, AuthenticationError, BadRequestError, RateLimitError
+
     if isinstance(e, AuthenticationError):
         return "❌ API-Key fehlt oder ist ungültig."
+    if isinstance(e, RateLimitQueueTimeout):
+        return "⏳ Viele gleichzeitige Anfragen – bitte in einer Minute erneut versuchen."
     if isinstance(e, RateLimitError):
         return "⏳ Rate-Limit erreicht."
     if isinstance(e, BadRequestError):
@@ -75,13 +93,23 @@ def friendly_error(e: Exception) -> str:
     return f"Unerwarteter Fehler: {e}"
 
 
-def call_llm(client: OpenAI, model: str, system: str, user: str, temperature: float) -> str:
-    r = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-        temperature=temperature,
-    )
-    return r.choices[0].message.content.strip()
+LLM_TIMEOUT = 90.0
+
+
+def call_llm(client: "OpenAI", model: str, system: str, user: str, temperature: float) -> str:
+    def upstream() -> str:
+        r = limited_create(
+            client.with_options(timeout=LLM_TIMEOUT),
+            deadline=time.monotonic() + LLM_TIMEOUT,
+            model=model,
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            temperature=temperature,
+        )
+        return r.choices[0].message.content.strip()
+
+    # Gleiche Anfrage (gleicher API-Key) aus einer anderen Session läuft schon → deren Ergebnis abwarten
+    key = f"{key_id(client.api_key)}|" + make_cache_key(f"{client.base_url}|{model}", system, user, temperature)
+    return singleflight.do(key, upstream)[0]
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -180,14 +208,6 @@ Zusatz:
 Gib nur den Newsletter-Text zurück.
 """
 
-            content = call_llm(
-                client,
-                model,
-                "Du schreibst sichere, stimmige Newsletter für emotionale Heilung.",
-                base_prompt,
-                temperature,
-            )
-
             header_prompt = f"""
 Erstelle 5 Header + Preheader.
 Stil: Hoffnungsvoll & stärkend, warm & validierend, klar & aufdeckend (in dieser Priorität).
@@ -202,30 +222,55 @@ Format exakt:
    Preheader: ...
 """
 
-            headers = call_llm(
-                client,
-                model,
-                "Du bist Expertin für E-Mail-Marketing & traumasensible Kommunikation.",
-                header_prompt,
-                temperature,
-            )
-
-            st.session_state.output = {
-                "headers": headers,
-                "content": content,
-                "cta": cta,
-                "meta": {
-                    "type": newsletter_type,
-                    "theme": theme,
-                    "audience": audience,
-                    "tone": tone,
-                    "depth": depth,
-                    "model": model,
-                    "generated_at": datetime.now().isoformat(),
+            # header_prompt hängt nur von Thema & Zielgruppe ab → beide Aufrufe parallel
+            results = run_parallel(
+                {
+                    "content": lambda: call_llm(
+                        client,
+                        model,
+                        "Du schreibst sichere, stimmige Newsletter für emotionale Heilung.",
+                        base_prompt,
+                        temperature,
+                    ),
+                    "headers": lambda: call_llm(
+                        client,
+                        model,
+                        "Du bist Expertin für E-Mail-Marketing & traumasensible Kommunikation.",
+                        header_prompt,
+                        temperature,
+                    ),
                 },
-            }
+                timeout=LLM_TIMEOUT + 5,
+            )
 
-            st.success("✅ Fertig!")
+            for name, label in (("content", "Newsletter"), ("headers", "Header")):
+                if not results[name].ok:
+                    st.error(f"{label}: {friendly_error(results[name].error)}")
+
+            if results["content"].ok or results["headers"].ok:
+                st.session_state.output = {
+                    "headers": results["headers"].value,
+                    "content": results["content"].value,
+                    "cta": cta,
+                    "meta": {
+                        "type": newsletter_type,
+                        "theme": theme,
+                        "audience": audience,
+                        "tone": tone,
+                        "depth": depth,
+                        "model": model,
+                        "generated_at": datetime.now().isoformat(),
+                        "latency_s": {name: round(r.latency_s, 2) for name, r in results.items()},
+                    },
+                }
+
+                if results["content"].ok and results["headers"].ok:
+                    st.success("✅ Fertig!")
+                wall = max(r.latency_s for r in results.values())
+                st.caption(
+                    f"⏱️ {wall:.1f} s gesamt • Newsletter {results['content'].latency_s:.1f} s • "
+                    f"Header {results['headers'].latency_s:.1f} s (parallel)"
+                )
 
         except Exception as e:
             st.error(friendly_error(e))
@@ -238,12 +283,12 @@ if "output" in st.session_state:
 
     st.markdown("## 🧾 Header & Preheader")
     st.markdown("<div class='card'>", unsafe_allow_html=True)
-    st.markdown(out["headers"])
+    st.markdown(out["headers"] or "_Header konnten nicht erstellt werden._")
     st.markdown("</div>", unsafe_allow_html=True)
 
     st.markdown("## ✍️ Newsletter")
     st.markdown("<div class='card'>", unsafe_allow_html=True)
-    st.markdown(out["content"])
+    st.markdown(out["content"] or "_Newsletter konnte nicht erstellt werden._")
     st.markdown("</div>", unsafe_allow_html=True)
 
     st.markdown("## 🎯 CTA")
@@ -251,7 +296,7 @@ if "output" in st.session_state:
 
     st.download_button(
         "💾 Newsletter (TXT)",
-        out["content"],
+        out["content"] or "",
         file_name="newsletter.txt",
         mime="text/plain",
     )
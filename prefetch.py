@@ -0,0 +1,141 @@
+# prefetch.py
+# Spekulatives Vorab-Berechnen der häufigsten Rewrites direkt nach einer Generierung
+
+import hashlib
+import os
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from llm_metrics import incr
+
+# Reihenfolge, solange noch keine Klicks gezählt wurden
+DEFAULT_KINDS = ["Kürzer", "Direkter", "Mehr Story", "Sanfter"]
+
+# Eigener, kleiner Pool: spekulative Jobs dürfen den gemeinsamen LLM-Pool (Generieren, Hedging) nicht belegen
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", str(PREFETCH_WORKERS * 4)))  # laufend + wartend, prozessweit
+
+_usage: Counter = Counter()
+_usage_lock = threading.Lock()
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PREFETCH_MAX_PENDING)
+
+
+def get_prefetch_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        return _executor
+
+
+def _submit(fn: Callable[[], Any]) -> Future | None:
+    # Volle Warteschlange: Job auslassen statt ihn hinter viele andere Sessions zu reihen
+    if not _slots.acquire(blocking=False):
+        incr("prefetch.skipped")
+        return None
+    fut = get_prefetch_executor().submit(fn)
+    fut.add_done_callback(lambda _: _slots.release())
+    return fut
+
+
+def body_key(body: str) -> str:
+    return hashlib.sha256((body or "").strip().encode("utf-8")).hexdigest()
+
+
+def prompt_key(model: str, system: str, user: str) -> str:
+    # Ein Prefetch passt nur zu genau diesem Prompt (Ton, Phase, …) auf genau diesem Modell
+    return hashlib.sha256(f"{model}\n{system}\n{user}".encode("utf-8")).hexdigest()
+
+
+def record_use(kind: str) -> None:
+    with _usage_lock:
+        _usage[kind] += 1
+
+
+def top_kinds(n: int, candidates: list[str] | None = None) -> list[str]:
+    """Die n meistgeklickten Rewrite-Arten (prozessweit), aufgefüllt mit DEFAULT_KINDS."""
+    with _usage_lock:
+        ranked = [k for k, _ in _usage.most_common()]
+    ordered = ranked + [k for k in DEFAULT_KINDS if k not in ranked]
+    if candidates is not None:
+        ordered = [k for k in ordered if k in candidates]
+    return ordered[:n]
+
+
+class RewritePrefetcher:
+    """Hält Prefetch-Futures für genau einen Body; jede Änderung am Text verwirft sie.
+
+    Jeder Job trägt den prompt_key() seines Prompts; take() liefert nur bei gleichem Schlüssel.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key: str | None = None
+        self._futures: dict[str, tuple[str, Future]] = {}
+
+    def start(self, body: str, jobs: dict[str, tuple[str, Callable[[], Any]]]) -> None:
+        key = body_key(body)
+        with self._lock:
+            if key != self._key:
+                self._discard_locked()
+                self._key = key
+            for kind, (job_key, fn) in jobs.items():
+                current = self._futures.get(kind)
+                if current is not None and current[0] == job_key:
+                    continue
+                if current is not None:
+                    current[1].cancel()
+                    incr("prefetch.discarded")
+                    del self._futures[kind]
+                fut = _submit(fn)
+                if fut is not None:
+                    self._futures[kind] = (job_key, fut)
+                    incr("prefetch.started")
+
+    def invalidate(self, body: str) -> None:
+        with self._lock:
+            if self._key is not None and body_key(body) != self._key:
+                self._discard_locked()
+                self._key = None
+
+    def take(self, body: str, kind: str, job_key: str, wait_s: float | None = None) -> Any | None:
+        """Fertiges (oder innerhalb von wait_s fertig werdendes) Ergebnis, sonst None."""
+        with self._lock:
+            entry = self._futures.pop(kind, None) if body_key(body) == self._key else None
+        if entry is None:
+            incr("prefetch.miss")
+            return None
+        stored_key, fut = entry
+        if stored_key != job_key:
+            # Seit dem Start Ton, Phase oder Routing geändert: Ergebnis passt nicht mehr
+            fut.cancel()
+            incr("prefetch.stale")
+            incr("prefetch.miss")
+            return None
+        try:
+            result = fut.result(timeout=wait_s)
+        except Exception:
+            # Timeout oder API-Fehler: der Klick läuft ganz normal synchron
+            incr("prefetch.miss")
+            return None
+        incr("prefetch.hit")
+        return result
+
+    def pending(self) -> dict[str, str]:
+        with self._lock:
+            return {
+                kind: "fertig" if fut.done() else "läuft" if fut.running() else "wartet"
+                for kind, (_, fut) in self._futures.items()
+            }
+
+    def _discard_locked(self) -> None:
+        # Wartende Jobs fallen weg; laufende Requests enden über ihren HTTP-Timeout, das Ergebnis wird ignoriert
+        for _, fut in self._futures.values():
+            fut.cancel()
+            incr("prefetch.discarded")
+        self._futures.clear()
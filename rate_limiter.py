@@ -0,0 +1,240 @@
+# rate_limiter.py
+# Prozessweiter Token-Bucket (Requests/min + Tokens/min) pro API-Key mit adaptivem Backoff
+
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+
+from llm_metrics import incr
+
+DEFAULT_RPM = float(os.getenv("LLM_RPM", "500"))
+DEFAULT_TPM = float(os.getenv("LLM_TPM", "30000"))
+MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", "120"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+RETRY_BUDGET = float(os.getenv("LLM_RETRY_BUDGET", "180"))  # Sekunden für Warten + Retries, wenn der Aufrufer keine Frist setzt
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+DEFAULT_COMPLETION_TOKENS = 1200
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class RateLimitQueueTimeout(TimeoutError):
+    pass
+
+
+def parse_duration(value: str | None) -> float | None:
+    # OpenAI-Header wie "1s", "6m0s", "20ms", "1h2m3.5s"
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in _DURATION_RE.findall(value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+def retry_after_seconds(headers) -> float | None:
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+def estimate_tokens(messages: list[dict], max_tokens: int | None = None) -> int:
+    # Grobe Schätzung (≈ 4 Zeichen pro Token) – wird nach der Antwort über usage korrigiert
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars // 4 + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60.0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Anfragen größer als die Kapazität dürfen bei vollem Bucket trotzdem starten
+        needed = min(amount, self.capacity) - self.tokens
+        return max(0.0, needed / self.rate) if self.rate else float("inf")
+
+
+class RateLimiter:
+    def __init__(self, rpm: float = DEFAULT_RPM, tpm: float = DEFAULT_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.cooldown_until = 0.0
+        self.waiting = 0
+        self.total_wait_s = 0.0
+        self.backoffs = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, est_tokens: int, max_wait: float = MAX_QUEUE_WAIT) -> float:
+        started = time.monotonic()
+        deadline = started + max_wait
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    delay = max(
+                        self.cooldown_until - now,
+                        self.requests.wait_time(1),
+                        self.tokens.wait_time(est_tokens),
+                    )
+                    if delay <= 0:
+                        self.requests.tokens -= 1
+                        self.tokens.tokens -= min(est_tokens, self.tokens.capacity)
+                        waited = now - started
+                        self.total_wait_s += waited
+                        return waited
+                    if now + delay > deadline:
+                        raise RateLimitQueueTimeout(f"Rate-Limit: nach {max_wait:.0f} s Wartezeit abgebrochen")
+                    self._cond.wait(timeout=delay)
+            finally:
+                self.waiting -= 1
+
+    def settle(self, est_tokens: int, actual_tokens: int | None) -> None:
+        if actual_tokens is None:
+            return
+        with self._cond:
+            refund = min(est_tokens, self.tokens.capacity) - actual_tokens
+            self.tokens.tokens = min(self.tokens.capacity, self.tokens.tokens + refund)
+            self._cond.notify_all()
+
+    def update_from_headers(self, headers) -> None:
+        if not headers:
+            return
+        with self._cond:
+            now = time.monotonic()
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                try:
+                    if limit is not None:
+                        bucket.capacity = float(limit)
+                    if remaining is not None:
+                        bucket.refill(now)
+                        # Server-Sicht gewinnt, wenn sie knapper ist (andere Prozesse mit demselben Key)
+                        bucket.tokens = min(bucket.tokens, float(remaining))
+                except ValueError:
+                    continue
+            self._cond.notify_all()
+
+    def backoff(self, attempt: int, headers=None) -> float:
+        delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        retry_after = retry_after_seconds(headers)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        with self._cond:
+            self.backoffs += 1
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+        return delay
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                "rpm_limit": self.requests.capacity,
+                "tpm_limit": self.tokens.capacity,
+                "requests_available": self.requests.tokens,
+                "tokens_available": self.tokens.tokens,
+                "waiting": self.waiting,
+                "total_wait_s": self.total_wait_s,
+                "backoffs": self.backoffs,
+                "cooldown_s": max(0.0, self.cooldown_until - now),
+            }
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(api_key: str, base_url: str = "") -> RateLimiter:
+    # Gleicher Key (und Endpoint) → gleicher Limiter, über alle Streamlit-Sessions des Prozesses
+    key_id = hashlib.sha256(f"{api_key or ''}|{base_url}".encode("utf-8")).hexdigest()[:12]
+    with _limiters_lock:
+        limiter = _limiters.get(key_id)
+        if limiter is None:
+            limiter = RateLimiter()
+            _limiters[key_id] = limiter
+        return limiter
+
+
+def limiter_stats() -> list[dict]:
+    with _limiters_lock:
+        items = list(_limiters.items())
+    return [{"key_id": key_id, **limiter.stats()} for key_id, limiter in items]
+
+
+def limited_create(client, max_retries: int = MAX_RETRIES, deadline: float | None = None, **kwargs):
+    """chat.completions.create hinter Token-Bucket, Header-Auswertung und Retry mit Jitter.
+
+    deadline (time.monotonic()) begrenzt Queue-Wartezeit und Retries zusammen; ohne Angabe gilt RETRY_BUDGET.
+    """
+    # Lazy: ist zu diesem Zeitpunkt über den Client ohnehin schon geladen
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+    limiter = get_limiter(client.api_key, str(client.base_url))
+    est = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+    if deadline is None:
+        deadline = time.monotonic() + RETRY_BUDGET
+    attempt = 0
+    while True:
+        limiter.acquire(est, max_wait=min(MAX_QUEUE_WAIT, max(0.0, deadline - time.monotonic())))
+        try:
+            raw = client.chat.completions.with_raw_response.create(**kwargs)
+        except APITimeoutError:
+            # Hat bereits das volle Request-Timeout gekostet – erneut warten sprengt die Frist des Aufrufers
+            raise
+        except RateLimitError as e:
+            # Aufgebrauchtes Kontingent kommt durch Warten nicht zurück
+            if attempt >= max_retries or getattr(e, "code", None) == "insufficient_quota":
+                raise
+            delay = limiter.backoff(attempt, e.response.headers if e.response is not None else None)
+            if time.monotonic() + delay > deadline:
+                raise
+            incr("rate_limit.retries")
+            attempt += 1
+            continue
+        except (APIConnectionError, InternalServerError):
+            if attempt >= max_retries:
+                raise
+            delay = limiter.backoff(attempt)
+            if time.monotonic() + delay > deadline:
+                raise
+            incr("rate_limit.retries")
+            attempt += 1
+            continue
+
+        limiter.update_from_headers(raw.headers)
+        result = raw.parse()
+        if not kwargs.get("stream"):
+            usage = getattr(result, "usage", None)
+            limiter.settle(est, getattr(usage, "total_tokens", None))
+        return result
@@ -0,0 +1,223 @@
+# section_parser.py
+# Inkrementeller Ein-Pass-Parser für das Format BETREFF / PREHEADER / --- / NEWSLETTER / CTA_VARIANTEN
+#
+# Liefert exakt dieselben Ergebnisse wie die frühere Regex-Kaskade in extract_sections(),
+# verarbeitet den Text aber stückweise (z.B. direkt aus einem Token-Stream): jede Suche
+# setzt dort fort, wo sie beim letzten Chunk aufgehört hat, statt den ganzen Text neu zu scannen.
+
+import re
+
+_NUMBERING = re.compile(r"^\s*\d+\.\s*")
+_BODY_MARKER = re.compile(r"---|NEWSLETTER:", re.I)
+
+
+class _Search:
+    """Fortsetzbare Suche nach dem ersten Treffer ab start.
+
+    keep = Länge des Musters ohne führendes \\n\\s* minus 1; so weit kann ein Treffer über das bisherige Textende
+    hinausragen. Bei ws_prefix kommt der gesamte Whitespace-Lauf davor hinzu.
+    """
+
+    __slots__ = ("pattern", "keep", "ws_prefix", "start", "resume", "pos", "end")
+
+    def __init__(self, pattern: str, flags: int = 0, keep: int = 0, ws_prefix: bool = False, start: int | None = None):
+        self.pattern = re.compile(pattern, flags)
+        self.keep = keep
+        self.ws_prefix = ws_prefix
+        self.start = start  # None = wartet auf das Ergebnis einer anderen Suche
+        self.resume = start or 0
+        self.pos: int | None = None
+        self.end: int | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.start is not None and self.pos is None
+
+    def activate(self, start: int) -> None:
+        self.start = self.resume = start
+
+    def run(self, window: str, offset: int) -> bool:
+        begin = max(self.start, self.resume) - offset
+        m = self.pattern.search(window, begin)
+        if m:
+            self.pos, self.end = m.start() + offset, m.end() + offset
+            return True
+        r = max(begin, len(window) - self.keep)
+        if self.ws_prefix:
+            while r > begin and window[r - 1].isspace():
+                r -= 1
+        self.resume = r + offset
+        return False
+
+
+def _numbered_lines(block: str, limit: int) -> list[str]:
+    lines = []
+    for line in block.split("\n"):
+        line = _NUMBERING.sub("", line).strip()
+        if line:
+            lines.append(line)
+    return lines[:limit]
+
+
+class SectionParser:
+    """feed() nimmt Chunks entgegen und meldet fertig abgeschlossene Abschnitte; sections() liefert jederzeit den Stand."""
+
+    ORDER = ("subjects", "preheader", "newsletter", "ctas")
+
+    def __init__(self):
+        self._parts: list[str] = []
+        self._length = 0
+        self._joined = ""
+        self._window = ""  # Text ab _window_start – nur so viel, wie offene Suchen noch brauchen
+        self._window_start = 0
+        self._pending_cr = False
+        self._started = False
+        self._emitted: set[str] = set()
+        self._closed = False
+
+        ci = re.I
+        self._s = {
+            "subj": _Search(r"BETREFF:", ci, keep=7, start=0),
+            "subj_body": _Search(r"\S"),
+            "subj_end": _Search(r"\n\s*PREHEADER:", ci, keep=9, ws_prefix=True),
+            "subj_blank": _Search(r"\n\s*\n", ws_prefix=True),
+            "pre": _Search(r"PREHEADER:", ci, keep=9, start=0),
+            "pre_body": _Search(r"\S"),
+            "pre_end": _Search(r"\n\s*(?:---|NEWSLETTER:)", ci, keep=10, ws_prefix=True),
+            "pre_exact": _Search(r"PREHEADER:", keep=9, start=0),
+            "pre_exact_eol": _Search(r"\n"),
+            "pre_exact_next": _Search(r"PREHEADER:", keep=9),
+            "body": _Search(r"NEWSLETTER:", ci, keep=10, start=0),
+            "body_start": _Search(r"\S"),
+            "body_end": _Search(r"\n\s*CTA_VARIANTEN:", ci, keep=13, ws_prefix=True),
+            "dash": _Search(r"---", keep=2, start=0),
+            "dash_next": _Search(r"---", keep=2),
+            "cta": _Search(r"CTA_VARIANTEN:", ci, keep=13, start=0),
+        }
+        # Kind-Suche startet am Ende (end) bzw. Anfang (pos) des Eltern-Treffers
+        self._children = {
+            "subj": [("subj_body", "end")],
+            "subj_body": [("subj_end", "pos"), ("subj_blank", "pos")],
+            "pre": [("pre_body", "end")],
+            "pre_body": [("pre_end", "pos")],
+            "pre_exact": [("pre_exact_eol", "end"), ("pre_exact_next", "end")],
+            "body": [("body_start", "end")],
+            "body_start": [("body_end", "pos")],
+            "dash": [("dash_next", "end")],
+        }
+
+    @classmethod
+    def parse(cls, raw: str) -> dict:
+        parser = cls()
+        if raw:
+            parser.feed(raw)
+        return parser.close()
+
+    @property
+    def markers(self) -> set[str]:
+        names = {"subj": "BETREFF", "pre": "PREHEADER", "body": "NEWSLETTER", "cta": "CTA_VARIANTEN"}
+        return {label for key, label in names.items() if self._s[key].pos is not None}
+
+    def feed(self, chunk: str) -> list[str]:
+        if not chunk or self._closed:
+            return []
+        # \r\n kann über eine Chunk-Grenze verteilt sein
+        if self._pending_cr:
+            chunk = "\r" + chunk
+            self._pending_cr = False
+        if chunk.endswith("\r"):
+            chunk = chunk[:-1]
+            self._pending_cr = True
+        chunk = chunk.replace("\r\n", "\n")
+        if not self._started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return []
+            self._started = True
+        self._parts.append(chunk)
+        self._length += len(chunk)
+        self._window += chunk
+        self._scan()
+        return self._events()
+
+    def close(self) -> dict:
+        self._closed = True
+        self._pending_cr = False
+        self._events()
+        return self.sections()
+
+    def sections(self) -> dict:
+        out = {"subjects": [], "preheader": "", "newsletter": "", "ctas": []}
+        text = self._text()
+        end = len(text)
+        while end and text[end - 1].isspace():
+            end -= 1
+        s = self._s
+
+        # Betreff: bis PREHEADER, sonst bis zur ersten Leerzeile
+        if s["subj_body"].pos is not None:
+            start = s["subj_body"].pos
+            if s["subj_end"].pos is not None:
+                out["subjects"] = _numbered_lines(text[start:s["subj_end"].pos].strip(), 15)
+            if not out["subjects"] and s["subj_blank"].pos is not None and s["subj_blank"].pos < end:
+                out["subjects"] = _numbered_lines(text[start:s["subj_blank"].pos].strip(), 15)
+
+        # Preheader: bis --- / NEWSLETTER:, sonst Rest der PREHEADER-Zeile
+        if s["pre"].pos is not None:
+            start = s["pre_body"].pos
+            if s["pre_end"].pos is not None:
+                out["preheader"] = text[start:s["pre_end"].pos].strip()
+            elif start is not None and "\n" in text[s["pre"].end:start] and _BODY_MARKER.match(text, start):
+                # Marker folgt direkt nach Leerzeilen: leerer Preheader, kein Fallback
+                pass
+            elif s["pre_exact"].pos is not None:
+                # Wie split("PREHEADER:")[1].split("\n")[0]
+                stop = min(p for p in (s["pre_exact_eol"].pos, s["pre_exact_next"].pos, end) if p is not None)
+                out["preheader"] = text[s["pre_exact"].end:stop].strip()
+
+        # Text: bis CTA_VARIANTEN:, sonst zwischen den ersten beiden ---
+        if s["body"].pos is not None:
+            start = s["body_start"].pos
+            if start is not None:
+                stop = s["body_end"].pos if s["body_end"].pos is not None else end
+                out["newsletter"] = text[start:stop].strip()
+        elif s["dash"].pos is not None:
+            stop = s["dash_next"].pos if s["dash_next"].pos is not None else end
+            out["newsletter"] = text[s["dash"].end:stop].strip()
+
+        if s["cta"].pos is not None:
+            out["ctas"] = _numbered_lines(text[s["cta"].end:end].strip(), 10)
+        return out
+
+    def _text(self) -> str:
+        if len(self._joined) != self._length:
+            self._joined = "".join(self._parts)
+            self._parts = [self._joined]
+        return self._joined
+
+    def _scan(self) -> None:
+        progress = True
+        while progress:
+            progress = False
+            for name, search in self._s.items():
+                if search.active and search.run(self._window, self._window_start):
+                    progress = True
+                    for child, attr in self._children.get(name, ()):
+                        self._s[child].activate(getattr(search, attr))
+        # Alles vor der frühesten offenen Fortsetzungsstelle wird nie wieder durchsucht
+        resume = [s.resume for s in self._s.values() if s.active]
+        keep_from = min(resume) if resume else self._length
+        if keep_from > self._window_start:
+            self._window = self._window[keep_from - self._window_start:]
+            self._window_start = keep_from
+
+    def _events(self) -> list[str]:
+        done = {
+            "subjects": self._s["subj_end"].pos is not None,
+            "preheader": self._s["pre_end"].pos is not None,
+            "newsletter": self._s["body_end"].pos is not None,
+            "ctas": False,
+        }
+        fresh = [name for name in self.ORDER if (done[name] or self._closed) and name not in self._emitted]
+        self._emitted.update(fresh)
+        return fresh
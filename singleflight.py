@@ -0,0 +1,154 @@
+# singleflight.py
+# Prozessweites Zusammenlegen identischer, gleichzeitig laufender LLM-Aufrufe
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Iterator
+
+from llm_metrics import incr
+
+_inflight: dict[str, Future] = {}
+_streams: dict[str, "_Broadcast"] = {}
+_lock = threading.Lock()
+
+
+class StreamAborted(RuntimeError):
+    pass
+
+
+class _Broadcast:
+    """Chunks eines laufenden Streams; Nachzügler bekommen erst alles Bisherige, dann den Rest live."""
+
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.followers = 0  # nur unter _lock ändern
+        self.cond = threading.Condition()
+
+    def publish(self, chunk: str) -> None:
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        with self.cond:
+            self.done, self.error = True, error
+            self.cond.notify_all()
+
+    def follow(self) -> Iterator[str]:
+        seen = 0
+        while True:
+            with self.cond:
+                while seen >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                chunks, done, error = self.chunks[seen:], self.done, self.error
+                seen += len(chunks)
+            yield from chunks
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+def do(key: str, fn: Callable[[], Any]) -> tuple[Any, bool]:
+    """Führt fn genau einmal pro key gleichzeitig aus; alle Wartenden bekommen dasselbe Ergebnis.
+
+    Gibt (Ergebnis, shared) zurück – shared ist True, wenn der Aufruf sich an einen laufenden angehängt hat.
+    Fehler des ausführenden Aufrufs werden an alle Wartenden weitergereicht.
+    """
+    with _lock:
+        fut = _inflight.get(key)
+        leader = fut is None
+        if leader:
+            fut = _inflight[key] = Future()
+    if not leader:
+        incr("singleflight.coalesced")
+        return fut.result(), True
+
+    incr("singleflight.leader")
+    try:
+        value = fn()
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(value)
+        return value, False
+    finally:
+        # Erst nach dem Ergebnis austragen, damit Nachzügler nicht doppelt anfragen
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def stream(key: str, fn: Callable[[], Iterator[str]]) -> tuple[Iterator[str], bool]:
+    """Wie do(), aber für Streams: der erste Aufruf liest fn(), alle weiteren bekommen dieselben Chunks.
+
+    Bricht der führende Aufrufer ab, während andere mitlesen, liest ein Hintergrund-Thread für sie zu Ende.
+    """
+    with _lock:
+        broadcast = _streams.get(key)
+        leader = broadcast is None
+        if leader:
+            broadcast = _streams[key] = _Broadcast()
+        else:
+            broadcast.followers += 1
+    if leader:
+        incr("singleflight.leader")
+        return _lead(key, broadcast, fn), False
+    incr("singleflight.coalesced")
+    return _follow(broadcast), True
+
+
+def _follow(broadcast: _Broadcast) -> Iterator[str]:
+    try:
+        yield from broadcast.follow()
+    finally:
+        with _lock:
+            broadcast.followers -= 1
+
+
+def _lead(key: str, broadcast: _Broadcast, fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+    source = fn()
+    handed_off = False
+    try:
+        for chunk in source:
+            broadcast.publish(chunk)
+            yield chunk
+        broadcast.finish()
+    except GeneratorExit:
+        with _lock:
+            handed_off = broadcast.followers > 0
+            if not handed_off:
+                _streams.pop(key, None)
+        if handed_off:
+            threading.Thread(target=_drain, args=(key, broadcast, source), name="singleflight-drain", daemon=True).start()
+        else:
+            broadcast.finish(StreamAborted("Gemeinsamer Stream abgebrochen"))
+        raise
+    except BaseException as e:
+        broadcast.finish(e)
+        raise
+    finally:
+        if not handed_off:
+            _release(key, broadcast)
+            source.close()
+
+
+def _drain(key: str, broadcast: _Broadcast, source: Iterator[str]) -> None:
+    try:
+        for chunk in source:
+            broadcast.publish(chunk)
+        broadcast.finish()
+    except BaseException as e:
+        broadcast.finish(e)
+    finally:
+        _release(key, broadcast)
+        source.close()
+
+
+def _release(key: str, broadcast: _Broadcast) -> None:
+    # Erst nach dem Ende austragen, damit Nachzügler nicht doppelt anfragen
+    with _lock:
+        if _streams.get(key) is broadcast:
+            del _streams[key]
@@ -0,0 +1,71 @@
+# text_stats.py
+# Abgeleitete Ansichten für den Editor: gecachte Abschnitte und inkrementelle Textstatistik
+
+import re
+from functools import lru_cache
+
+from section_parser import SectionParser
+
+_WORD = re.compile(r"\b\w+\b")
+_SEPARATOR = "\n\n"
+
+
+@lru_cache(maxsize=64)
+def _sections(raw: str) -> tuple:
+    s = SectionParser.parse(raw)
+    return tuple(s["subjects"]), s["preheader"], s["newsletter"], tuple(s["ctas"])
+
+
+def cached_sections(raw: str) -> dict:
+    """extract_sections() mit Memo über den Inhalt – Reruns ohne neue Antwort parsen nicht erneut."""
+    subjects, preheader, newsletter, ctas = _sections(raw or "")
+    return {"subjects": list(subjects), "preheader": preheader, "newsletter": newsletter, "ctas": list(ctas)}
+
+
+class TextStats:
+    """Wörter und Absätze eines Textes; update() zählt nur die geänderten Absätze neu.
+
+    Absätze sind die Segmente zwischen Leerzeilen ("\\n\\n"). Da dort keine Wortzeichen stehen,
+    ist die Summe der Segment-Wortzahlen identisch mit count_words() über den ganzen Text.
+    """
+
+    __slots__ = ("text", "_segments", "_words", "_filled", "word_count", "paragraph_count", "recounted")
+
+    def __init__(self, text: str = ""):
+        self.text = ""
+        self._segments: list[str] = [""]
+        self._words: list[int] = [0]
+        self._filled: list[bool] = [False]
+        self.word_count = 0
+        self.paragraph_count = 0
+        self.recounted = 0  # Segmente, die beim letzten update() neu gezählt wurden
+        self.update(text)
+
+    def update(self, text: str) -> "TextStats":
+        text = text or ""
+        if text is self.text or text == self.text:
+            self.recounted = 0
+            return self
+        old, new = self._segments, text.split(_SEPARATOR)
+
+        # Unveränderten Anfang und Ende überspringen
+        head = 0
+        limit = min(len(old), len(new))
+        while head < limit and old[head] == new[head]:
+            head += 1
+        tail = 0
+        while tail < limit - head and old[-1 - tail] == new[-1 - tail]:
+            tail += 1
+
+        changed = new[head:len(new) - tail]
+        counts = [len(_WORD.findall(seg)) for seg in changed]
+        filled = [bool(seg.strip()) for seg in changed]
+        old_slice = slice(head, len(old) - tail)
+        self.word_count += sum(counts) - sum(self._words[old_slice])
+        self.paragraph_count += sum(filled) - sum(self._filled[old_slice])
+        self._words[old_slice] = counts
+        self._filled[old_slice] = filled
+        self._segments = new
+        self.text = text
+        self.recounted = len(changed)
+        return self
@@ -0,0 +1,147 @@
+# theme.py
+# Hell-/Dunkel-Theme: einmal minifiziert, mit Fingerprint als statische Datei ausgeliefert
+#
+# Beide Themes landen in einem Bundle, gescoped auf html.theme-dark bzw. html.theme-light.
+# Pro Rerun geht nur noch ein kleiner Loader über den Websocket: er lädt das Bundle einmal pro
+# Browser-Sitzung in den <head> und schaltet danach nur noch die Klasse am <html>-Element um.
+
+import hashlib
+import re
+from functools import lru_cache
+from pathlib import Path
+
+THEMES = ("dark", "light")
+STYLES_DIR = Path(__file__).with_name("styles")
+# Streamlit liefert ./static unter app/static/ aus (server.enableStaticServing)
+STATIC_DIR = Path(__file__).with_name("static")
+STATIC_URL = "app/static"
+
+_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_SPACE = re.compile(r"\s+")
+_PUNCT = re.compile(r"\s*([{};,>])\s*")
+_COLON = re.compile(r":\s+")
+
+LOADER_TEMPLATE = """<script>
+const doc = window.parent.document;
+const id = "nl-theme-%(fingerprint)s";
+if (!doc.getElementById(id)) {
+  doc.querySelectorAll("style[data-nl-theme]").forEach((el) => el.remove());
+  fetch("%(url)s")
+    .then((r) => (r.ok ? r.text() : Promise.reject(r.status)))
+    .then((css) => {
+      const el = doc.createElement("style");
+      el.id = id;
+      el.dataset.nlTheme = "1";
+      el.textContent = css;
+      doc.head.appendChild(el);
+    });
+}
+doc.documentElement.classList.toggle("theme-dark", %(dark)s);
+doc.documentElement.classList.toggle("theme-light", !%(dark)s);
+</script>"""
+
+
+def minify(css: str) -> str:
+    css = _COMMENT.sub("", css)
+    css = _SPACE.sub(" ", css)
+    css = _PUNCT.sub(r"\1", css)
+    # Nur Leerraum nach ":" entfernen – davor kann er Teil eines Selektors sein (a :hover)
+    css = _COLON.sub(":", css)
+    return css.replace(";}", "}").strip()
+
+
+def _split_selectors(header: str) -> list[str]:
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(header):
+        if ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(header[start:i])
+            start = i + 1
+    parts.append(header[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _block_end(css: str, open_pos: int) -> int:
+    depth = 0
+    for i in range(open_pos, len(css)):
+        if css[i] == "{":
+            depth += 1
+        elif css[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("CSS: nicht geschlossener Block")
+
+
+def scope(css: str, prefix: str) -> str:
+    """Setzt prefix vor jeden Selektor; @media-Blöcke werden rekursiv behandelt. Erwartet minifiziertes CSS."""
+    out, pos = [], 0
+    while True:
+        brace = css.find("{", pos)
+        if brace < 0:
+            break
+        header = css[pos:brace]
+        end = _block_end(css, brace)
+        if header.startswith("@"):
+            out.append(f"{header}{{{scope(css[brace + 1:end], prefix)}}}")
+        else:
+            selectors = ",".join(f"{prefix} {sel}" for sel in _split_selectors(header))
+            out.append(f"{selectors}{css[brace:end + 1]}")
+        pos = end + 1
+    return "".join(out)
+
+
+def source(name: str) -> str:
+    return (STYLES_DIR / f"{name}.css").read_text(encoding="utf-8")
+
+
+@lru_cache(maxsize=1)
+def bundle() -> tuple[str, str]:
+    """(CSS, Fingerprint) – beide Themes minifiziert und gescoped, einmal pro Prozess gebaut."""
+    css = "".join(scope(minify(source(name)), f"html.theme-{name}") for name in THEMES)
+    return css, hashlib.sha256(css.encode("utf-8")).hexdigest()[:12]
+
+
+@lru_cache(maxsize=1)
+def publish() -> str:
+    """Schreibt static/theme.<fingerprint>.css (falls noch nicht vorhanden) und gibt die URL zurück."""
+    css, fingerprint = bundle()
+    path = STATIC_DIR / f"theme.{fingerprint}.css"
+    if not path.exists():
+        STATIC_DIR.mkdir(exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(css, encoding="utf-8")
+        tmp.replace(path)
+        # Ältere Fingerprints aufräumen
+        for old in STATIC_DIR.glob("theme.*.css"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    return f"{STATIC_URL}/{path.name}"
+
+
+def loader(dark: bool) -> str:
+    """Das, was pro Rerun noch gesendet wird: Bundle einmalig nachladen, Klasse umschalten."""
+    _, fingerprint = bundle()
+    return LOADER_TEMPLATE % {"fingerprint": fingerprint, "url": publish(), "dark": "true" if dark else "false"}
+
+
+@lru_cache(maxsize=2)
+def inline(dark: bool) -> str:
+    """Fallback ohne statische Auslieferung: nur das aktive Theme, minifiziert, ungescoped."""
+    return f"<style>{minify(source('dark' if dark else 'light'))}</style>"
+
+
+def legacy(dark: bool) -> str:
+    """Der frühere Inline-Block von apply_theme() (ohne Einrückung) – nur als Vergleichsgröße."""
+    return f"<style>\n{source('dark' if dark else 'light')}</style>"
+
+
+def payload_bytes(dark: bool) -> dict[str, int]:
+    """Bytes pro Rerun je Auslieferungsart."""
+    return {
+        kind: len(fn(dark).encode("utf-8"))
+        for kind, fn in (("legacy", legacy), ("inline", inline), ("loader", loader))
+    }